@@ -18,9 +18,9 @@ from .models import (
     User, UserProfile, UserSocialLinks, UserPermissions, SocialIcon, CustomLinkTemplate, CustomLink, CollectInfoField, CollectInfoResponse, CTABanner, Subscription,
     ProfileView, LinkClick, BannerClick, Order,
     SocialMediaPlatform, SocialMediaConnection, SocialMediaPost, SocialMediaPostTemplate, PaymentEvent, Plan, PlanFeature, StripeCustomer,
-    Folder, Media, Comment, AutomationRule, AutomationSettings, CommentReply, DirectMessage, DirectMessageReply, AIConfiguration, MiloPrompt,
+    Folder, Media, Comment, AutomationRule, AutomationSettings, CommentReply, DirectMessage, DirectMessageReply, AutomationDailyStats, AIConfiguration, MiloPrompt,
     StripeConnectAccount, PaymentTransaction, ConnectWebhookEvent, FreebieFollowupEmail, ScheduledFollowupEmail, OptinFollowupEmail, ScheduledOptinEmail,
-    EmailAccount, EmailMessage, EmailAttachment, EmailDraft, IframeMenuItem, SystemConfig
+    EmailAccount, EmailMessage, EmailAttachment, EmailDraft, IframeMenuItem, SystemConfig, DataExport
 )
 from tinymce.widgets import TinyMCE
 from django import forms
@@ -750,6 +750,18 @@ class OrderAdmin(ModelAdmin, ImportExportModelAdmin):
         return super().get_queryset(request).select_related('custom_link')
 
 
+@admin.register(DataExport)
+class DataExportAdmin(ModelAdmin):
+    """Background order and lead exports; use these instead of exporting large sellers from the order list"""
+    list_display = ['user', 'export_type', 'file_format', 'status', 'exported_rows', 'total_rows', 'created_at', 'completed_at']
+    list_filter = ['export_type', 'file_format', 'status', 'created_at']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = [
+        'user', 'export_type', 'file_format', 'filters', 'status', 'total_rows',
+        'exported_rows', 'file', 'error_message', 'created_at', 'started_at', 'completed_at'
+    ]
+
+
 @admin.register(CTABanner)
 class CTABannerAdmin(ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
@@ -1274,7 +1286,7 @@ class AutomationRuleAdmin(ModelAdmin, ImportExportModelAdmin):
     list_display = ['rule_name', 'user', 'connection_page', 'message_type', 'keywords_preview', 'is_active', 'priority', 'times_triggered', 'created_at']
     list_filter = ['message_type', 'is_active', 'connection__platform', 'created_at', 'priority']
     search_fields = ['rule_name', 'user__username', 'connection__facebook_page_name', 'reply_template']
-    readonly_fields = ['times_triggered', 'created_at']
+    readonly_fields = ['times_triggered', 'times_succeeded', 'times_failed', 'last_triggered_at', 'created_at']
     
     fieldsets = (
         ('Rule Information', {
@@ -1284,7 +1296,7 @@ class AutomationRuleAdmin(ModelAdmin, ImportExportModelAdmin):
             'fields': ('keywords', 'reply_template')
         }),
         ('Statistics', {
-            'fields': ('times_triggered',)
+            'fields': ('times_triggered', 'times_succeeded', 'times_failed', 'last_triggered_at')
         }),
         ('Timestamps', {
             'fields': ('created_at',),
@@ -1467,6 +1479,21 @@ class DirectMessageReplyAdmin(ModelAdmin, ImportExportModelAdmin):
         return super().get_queryset(request).select_related('direct_message', 'rule')
 
 
+@admin.register(AutomationDailyStats)
+class AutomationDailyStatsAdmin(ModelAdmin):
+    list_display = ['date', 'connection_page', 'channel', 'messages_received', 'messages_replied', 'replies_sent', 'replies_failed', 'updated_at']
+    list_filter = ['channel', 'date']
+    search_fields = ['connection__facebook_page_name', 'connection__user__username']
+    readonly_fields = ['connection', 'date', 'channel', 'messages_received', 'messages_replied', 'replies_sent', 'replies_failed', 'updated_at']
+
+    def connection_page(self, obj):
+        return obj.connection.facebook_page_name or 'Unknown Page'
+    connection_page.short_description = 'Page/Account'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('connection')
+
+
 # AI Configuration Admin
 @admin.register(AIConfiguration)
 class AIConfigurationAdmin(ModelAdmin, ImportExportModelAdmin):
@@ -1620,7 +1647,7 @@ class ScheduledFollowupEmailAdmin(ModelAdmin, ImportExportModelAdmin):
     list_display = ['order', 'email_template', 'scheduled_for', 'sent', 'sent_at', 'created_at']
     list_filter = ['sent', 'scheduled_for', 'sent_at']
     search_fields = ['order__order_id', 'order__customer_email', 'order__customer_name']
-    readonly_fields = ['created_at', 'sent_at', 'error_message']
+    readonly_fields = ['created_at', 'sent_at', 'error_message', 'attempts']
     ordering = ['-scheduled_for']
 
     fieldsets = (
@@ -1631,7 +1658,7 @@ class ScheduledFollowupEmailAdmin(ModelAdmin, ImportExportModelAdmin):
             'fields': ('scheduled_for', 'sent', 'sent_at')
         }),
         ('Error Details', {
-            'fields': ('error_message',),
+            'fields': ('attempts', 'error_message'),
             'classes': ('collapse',)
         }),
     )
@@ -1680,7 +1707,7 @@ class ScheduledOptinEmailAdmin(ModelAdmin, ImportExportModelAdmin):
     list_display = ['order', 'email_template', 'scheduled_for', 'sent', 'sent_at', 'created_at']
     list_filter = ['sent', 'scheduled_for', 'sent_at']
     search_fields = ['order__order_id', 'order__customer_email', 'order__customer_name']
-    readonly_fields = ['created_at', 'sent_at', 'error_message']
+    readonly_fields = ['created_at', 'sent_at', 'error_message', 'attempts']
     ordering = ['-scheduled_for']
 
     fieldsets = (
@@ -1691,7 +1718,7 @@ class ScheduledOptinEmailAdmin(ModelAdmin, ImportExportModelAdmin):
             'fields': ('scheduled_for', 'sent', 'sent_at')
         }),
         ('Error Details', {
-            'fields': ('error_message',),
+            'fields': ('attempts', 'error_message'),
             'classes': ('collapse',)
         }),
     )
@@ -1901,6 +1928,7 @@ class ConnectWebhookEventAdmin(ModelAdmin, ImportExportModelAdmin):
     readonly_fields = [
         'stripe_event_id', 'event_type', 'account_id', 'connect_account',
         'payment_transaction', 'data', 'processed', 'error_message',
+        'object_key', 'stripe_created', 'attempts', 'payload',
         'created_at', 'processed_at'
     ]
     
@@ -1912,10 +1940,10 @@ class ConnectWebhookEventAdmin(ModelAdmin, ImportExportModelAdmin):
             'fields': ('connect_account', 'payment_transaction')
         }),
         (_('Processing'), {
-            'fields': ('error_message', 'processed_at')
+            'fields': ('object_key', 'stripe_created', 'attempts', 'error_message', 'processed_at')
         }),
         (_('Event Data'), {
-            'fields': ('data',),
+            'fields': ('data', 'payload'),
             'classes': ('collapse',)
         }),
         (_('Timestamps'), {
@@ -1966,7 +1994,10 @@ class EmailAccountAdmin(ModelAdmin, ImportExportModelAdmin):
     list_display = ['user', 'email_address', 'is_active', 'last_synced', 'created_at']
     list_filter = ['is_active', 'created_at', 'last_synced']
     search_fields = ['user__username', 'user__email', 'email_address']
-    readonly_fields = ['created_at', 'modified_at', 'last_synced', 'token_expiry']
+    readonly_fields = [
+        'created_at', 'modified_at', 'last_synced', 'history_id', 'token_expiry',
+        'sync_interval_minutes', 'next_sync_at', 'inbox_opened_at', 'watch_expires_at'
+    ]
     fieldsets = (
         ('Account Information', {
             'fields': ('user', 'email_address', 'is_active')
@@ -1976,7 +2007,7 @@ class EmailAccountAdmin(ModelAdmin, ImportExportModelAdmin):
             'description': 'OAuth tokens are encrypted and not displayed for security'
         }),
         ('Sync Information', {
-            'fields': ('last_synced',)
+            'fields': ('last_synced', 'history_id', 'sync_interval_minutes', 'next_sync_at', 'inbox_opened_at', 'watch_expires_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'modified_at'),
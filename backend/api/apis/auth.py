@@ -2,9 +2,12 @@ from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema
 from rest_framework import mixins, status, viewsets
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
@@ -12,6 +15,7 @@ from django.conf import settings
 
 from ..models import UserProfile, UserPermissions
 from ..services.email_service import send_email
+from ..services.session_snapshot import get_session_snapshot
 from ..serializers import (
     UserChangePasswordErrorSerializer,
     UserChangePasswordSerializer,
@@ -26,6 +30,7 @@ from ..serializers import (
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
     CustomTokenObtainPairSerializer,
+    SessionSnapshotSerializer,
 )
 
 User = get_user_model()
@@ -254,6 +259,34 @@ class UserViewSet(
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    @extend_schema(
+        responses={200: SessionSnapshotSerializer, 304: None},
+        summary="Get the current user's session snapshot",
+        description=(
+            "The current user, their permissions, their iframe menu items and the active plans "
+            "in one cached response. Send the ETag back in If-None-Match to get a 304 when "
+            "nothing changed."
+        )
+    )
+    @action(
+        ["get"], detail=False,
+        # The user id comes from the access token, so a warm snapshot is served without queries
+        authentication_classes=[JWTStatelessUserAuthentication, SessionAuthentication],
+    )
+    def session(self, request, *args, **kwargs):
+        snapshot = get_session_snapshot(request.user.id)
+        if snapshot is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        etag = f'"{snapshot["version"]}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
     @extend_schema(
         methods=["GET"],
         responses={200: UserPermissionsSerializer},
@@ -2,6 +2,8 @@
 Facebook Comment Management API endpoints
 """
 import logging
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
@@ -18,6 +20,8 @@ from ..serializers import (
     AutomationSettingsSerializer, AutomationSettingsCreateSerializer
 )
 from ..services.integrations.meta_service import MetaService
+from ..services.automation_stats import get_comment_automation_stats
+from ..pagination import CreatedTimeCursorPagination, SentAtCursorPagination
 
 logger = logging.getLogger(__name__)
 
@@ -303,6 +307,7 @@ class CommentListView(generics.ListAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = CommentListSerializer
+    pagination_class = CreatedTimeCursorPagination
     
     def get_queryset(self):
         """Return comments for user's Facebook connections"""
@@ -323,7 +328,11 @@ class CommentListView(generics.ListAPIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset
+        # Count replies in a correlated subquery so only the returned page is counted
+        replies = CommentReply.objects.filter(comment=OuterRef('pk')).order_by().values('comment')
+        return queryset.annotate(reply_total=Coalesce(
+            Subquery(replies.annotate(total=Count('id')).values('total')), 0
+        ))
 
 
 class CommentDetailView(generics.RetrieveAPIView):
@@ -544,6 +553,7 @@ class CommentReplyListView(generics.ListAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = CommentReplyListSerializer
+    pagination_class = SentAtCursorPagination
     
     def get_queryset(self):
         """Return replies for user's comments"""
@@ -603,60 +613,18 @@ def comment_replies_for_comment(request, comment_id):
 def automation_stats(request):
     """
     Get automation statistics for user's connections.
+    Supports ?days=N (max 90) for the daily breakdown and ?refresh=true to bypass the cache.
     """
     try:
-        user = request.user
-        
-        # Get basic counts
-        total_comments = Comment.objects.filter(
-            connection__user=user,
-            connection__platform__name='facebook'
-        ).count()
-        
-        replied_comments = Comment.objects.filter(
-            connection__user=user,
-            connection__platform__name='facebook',
-            status='replied'
-        ).count()
-        
-        total_rules = CommentAutomationRule.objects.filter(
-            user=user,
-            connection__platform__name='facebook'
-        ).count()
-        
-        active_rules = CommentAutomationRule.objects.filter(
-            user=user,
-            connection__platform__name='facebook',
-            is_active=True
-        ).count()
-        
-        total_replies = CommentReply.objects.filter(
-            comment__connection__user=user,
-            comment__connection__platform__name='facebook'
-        ).count()
-        
-        successful_replies = CommentReply.objects.filter(
-            comment__connection__user=user,
-            comment__connection__platform__name='facebook',
-            status='sent'
-        ).count()
-        
-        # Calculate percentages
-        reply_rate = (replied_comments / total_comments * 100) if total_comments > 0 else 0
-        success_rate = (successful_replies / total_replies * 100) if total_replies > 0 else 0
+        stats = get_comment_automation_stats(
+            request.user,
+            days=request.query_params.get('days', 30),
+            use_cache=request.query_params.get('refresh') != 'true'
+        )
         
         return Response({
             'success': True,
-            'stats': {
-                'total_comments': total_comments,
-                'replied_comments': replied_comments,
-                'reply_rate': round(reply_rate, 2),
-                'total_rules': total_rules,
-                'active_rules': active_rules,
-                'total_replies': total_replies,
-                'successful_replies': successful_replies,
-                'success_rate': round(success_rate, 2)
-            }
+            'stats': stats
         })
         
     except Exception as e:
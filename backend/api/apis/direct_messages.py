@@ -2,6 +2,8 @@
 Facebook/Instagram Direct Message Management API endpoints
 """
 import logging
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
@@ -17,6 +19,8 @@ from ..serializers import (
     DirectMessageReplySerializer, DirectMessageReplyListSerializer
 )
 from ..services.integrations.meta_service import MetaService
+from ..services.automation_stats import get_dm_automation_stats
+from ..pagination import CreatedTimeCursorPagination, SentAtCursorPagination
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +35,7 @@ class DirectMessageListView(generics.ListAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = DirectMessageListSerializer
+    pagination_class = CreatedTimeCursorPagination
     
     def get_queryset(self):
         """Return DMs for user's connections"""
@@ -55,7 +60,11 @@ class DirectMessageListView(generics.ListAPIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset
+        # Count replies in a correlated subquery so only the returned page is counted
+        replies = DirectMessageReply.objects.filter(direct_message=OuterRef('pk')).order_by().values('direct_message')
+        return queryset.annotate(reply_total=Coalesce(
+            Subquery(replies.annotate(total=Count('id')).values('total')), 0
+        ))
 
 
 class DirectMessageDetailView(generics.RetrieveAPIView):
@@ -218,6 +227,7 @@ class DirectMessageReplyListView(generics.ListAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = DirectMessageReplyListSerializer
+    pagination_class = SentAtCursorPagination
     
     def get_queryset(self):
         """Return DM replies for user's messages"""
@@ -285,71 +295,18 @@ def dm_replies_for_message(request, message_id):
 def dm_automation_stats(request):
     """
     Get DM automation statistics for user's connections.
+    Supports ?days=N (max 90) for the daily breakdown and ?refresh=true to bypass the cache.
     """
     try:
-        user = request.user
-        
-        # Get basic counts
-        total_dms = DirectMessage.objects.filter(
-            connection__user=user
-        ).count()
-        
-        replied_dms = DirectMessage.objects.filter(
-            connection__user=user,
-            status='replied'
-        ).count()
-        
-        total_dm_rules = AutomationRule.objects.filter(
-            user=user,
-            message_type__in=['dm', 'both']
-        ).count()
-        
-        active_dm_rules = AutomationRule.objects.filter(
-            user=user,
-            message_type__in=['dm', 'both'],
-            is_active=True
-        ).count()
-        
-        total_dm_replies = DirectMessageReply.objects.filter(
-            direct_message__connection__user=user
-        ).count()
-        
-        successful_dm_replies = DirectMessageReply.objects.filter(
-            direct_message__connection__user=user,
-            status='sent'
-        ).count()
-        
-        # Platform breakdown
-        facebook_dms = DirectMessage.objects.filter(
-            connection__user=user,
-            platform='facebook'
-        ).count()
-        
-        instagram_dms = DirectMessage.objects.filter(
-            connection__user=user,
-            platform='instagram'
-        ).count()
-        
-        # Calculate percentages
-        reply_rate = (replied_dms / total_dms * 100) if total_dms > 0 else 0
-        success_rate = (successful_dm_replies / total_dm_replies * 100) if total_dm_replies > 0 else 0
+        stats = get_dm_automation_stats(
+            request.user,
+            days=request.query_params.get('days', 30),
+            use_cache=request.query_params.get('refresh') != 'true'
+        )
         
         return Response({
             'success': True,
-            'stats': {
-                'total_dms': total_dms,
-                'replied_dms': replied_dms,
-                'reply_rate': round(reply_rate, 2),
-                'total_rules': total_dm_rules,
-                'active_rules': active_dm_rules,
-                'total_replies': total_dm_replies,
-                'successful_replies': successful_dm_replies,
-                'success_rate': round(success_rate, 2),
-                'platform_breakdown': {
-                    'facebook': facebook_dms,
-                    'instagram': instagram_dms
-                }
-            }
+            'stats': stats
         })
         
     except Exception as e:
@@ -357,4 +314,4 @@ def dm_automation_stats(request):
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
@@ -3,15 +3,22 @@ Email Integration API Views
 
 Handles Gmail OAuth connections and email management operations.
 """
+import base64
+import hmac
+import json
 import logging
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import redirect
 from django.conf import settings
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
@@ -20,6 +27,7 @@ from ..serializers import (
     EmailAccountSerializer,
     EmailMessageSerializer,
     EmailMessageListSerializer,
+    EmailSearchResultSerializer,
     EmailDraftSerializer,
     GmailAuthUrlSerializer,
     GmailConnectSerializer,
@@ -31,17 +39,12 @@ from ..serializers import (
     EmailMarkReadSerializer,
 )
 from ..services.integrations import GmailService
+from ..services.email_sync import mark_inbox_opened, handle_push_notification
+from ..pagination import EmailCursorPagination
 
 logger = logging.getLogger(__name__)
 
 
-class EmailPagination(PageNumberPagination):
-    """Pagination for email lists"""
-    page_size = 50
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class GmailAuthUrlView(APIView):
     """
     Get Gmail OAuth authorization URL for connecting accounts.
@@ -182,7 +185,7 @@ class EmailMessageListView(APIView):
     List email messages from connected accounts.
     """
     permission_classes = [IsAuthenticated]
-    pagination_class = EmailPagination
+    pagination_class = EmailCursorPagination
 
     @extend_schema(
         summary="List Email Messages",
@@ -190,22 +193,99 @@ class EmailMessageListView(APIView):
         responses={200: EmailMessageListSerializer(many=True)}
     )
     def get(self, request):
+        from ..tasks import sync_single_email_account
+
+        # Dormant inboxes are not polled; sync them now that the user is back
+        for account_id in mark_inbox_opened(request.user):
+            sync_single_email_account.delay(account_id)
+
         # Get user's email accounts
         accounts = EmailAccount.objects.filter(user=request.user, is_active=True)
 
         # Get all messages
         messages = EmailMessage.objects.filter(account__in=accounts)
-        # Order by received date
-        messages = messages.select_related('account').order_by('-received_at')
+        # The list only shows headers, so leave the bodies on disk
+        messages = messages.select_related('account').defer('body_text', 'body_html')
 
-        # Paginate
-        paginator = EmailPagination()
+        # Paginate (ordered by received date, newest first)
+        paginator = self.pagination_class()
         page = paginator.paginate_queryset(messages, request)
 
         serializer = EmailMessageListSerializer(page, many=True)
         return paginator.get_paginated_response(serializer.data)
 
 
+class EmailSearchView(APIView):
+    """
+    Full-text search over synced email messages.
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    @extend_schema(
+        summary="Search Email Messages",
+        description="Search synced messages by subject, sender, snippet and body, best matches first",
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, OpenApiParameter.QUERY, required=True,
+                             description='Search terms; supports quoted phrases, OR and -exclusions'),
+            OpenApiParameter('account_id', OpenApiTypes.INT, OpenApiParameter.QUERY),
+            OpenApiParameter('limit', OpenApiTypes.INT, OpenApiParameter.QUERY),
+        ],
+        responses={200: EmailSearchResultSerializer(many=True)}
+    )
+    def get(self, request):
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            return Response({
+                'error': 'Search query (q) is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        account_id = request.query_params.get('account_id')
+        if account_id:
+            try:
+                account_id = int(account_id)
+            except ValueError:
+                return Response({
+                    'error': 'account_id must be a number'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        query = SearchQuery(terms, search_type='websearch', config=EmailMessage.SEARCH_CONFIG)
+        messages = EmailMessage.objects.filter(
+            account__user=request.user,
+            account__is_active=True,
+            search_vector=query
+        )
+        if account_id:
+            messages = messages.filter(account_id=account_id)
+
+        # The headline is only computed for the returned rows
+        messages = messages.select_related('account').defer('body_html').annotate(
+            rank=SearchRank(F('search_vector'), query),
+            headline=SearchHeadline(
+                Coalesce(NullIf('body_text', Value('')), 'snippet'),
+                query,
+                config=EmailMessage.SEARCH_CONFIG,
+                start_sel='<mark>',
+                stop_sel='</mark>',
+                max_words=35,
+                min_words=15,
+            ),
+        ).order_by('-rank', '-received_at')[:limit]
+
+        serializer = EmailSearchResultSerializer(messages, many=True)
+        return Response({
+            'query': terms,
+            'count': len(serializer.data),
+            'results': serializer.data,
+        }, status=status.HTTP_200_OK)
+
+
 class EmailMessageDetailView(APIView):
     """
     Get email message detail.
@@ -219,10 +299,17 @@ class EmailMessageDetailView(APIView):
     )
     def get(self, request, message_id):
         try:
-            message = EmailMessage.objects.select_related('account').prefetch_related('attachments').get(
-                id=message_id,
-                account__user=request.user
-            )
+            messages = EmailMessage.objects.select_related('account').prefetch_related('attachments')
+            message = messages.get(id=message_id, account__user=request.user)
+
+            # Bodies are downloaded on first open and stored for later opens
+            if message.body_fetched_at is None:
+                try:
+                    GmailService(email_account=message.account).hydrate_message(message)
+                    message = messages.get(id=message.id)
+                except Exception as e:
+                    logger.error(f"Failed to fetch body for email {message.id}: {e}")
+
             serializer = EmailMessageSerializer(message)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -501,3 +588,40 @@ class EmailDraftDetailView(APIView):
             return Response({
                 'error': 'Email draft not found'
             }, status=status.HTTP_404_NOT_FOUND)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GmailPushView(APIView):
+    """
+    Receive Gmail push notifications delivered by a Pub/Sub push subscription.
+
+    The subscription URL carries ?token=<GMAIL_PUSH_VERIFICATION_TOKEN>. Any
+    HTTP client posting the same envelope (e.g. the simulate_gmail_push
+    command) can stand in for Pub/Sub locally.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @extend_schema(exclude=True)
+    def post(self, request):
+        expected_token = getattr(settings, 'GMAIL_PUSH_VERIFICATION_TOKEN', '')
+        token = request.query_params.get('token', '')
+        if not expected_token or not hmac.compare_digest(token, expected_token):
+            logger.warning("Gmail push notification rejected: invalid token")
+            return Response({'error': 'Invalid token'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Malformed messages are acknowledged, otherwise Pub/Sub keeps retrying them
+        try:
+            data = json.loads(base64.b64decode(request.data['message']['data']))
+            email_address = data['emailAddress']
+            history_id = data.get('historyId')
+            if history_id is not None:
+                history_id = int(history_id)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Invalid Gmail push notification: {e}")
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        queued = handle_push_notification(email_address, history_id)
+        logger.info(f"Gmail push for {email_address} (history {history_id}): queued {len(queued)} sync(s)")
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
@@ -0,0 +1,55 @@
+"""
+Data export API endpoints: background CSV/Parquet exports of orders and leads
+"""
+from django.db import transaction
+from django.http import FileResponse
+from drf_spectacular.utils import OpenApiResponse, extend_schema
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..models import DataExport
+from ..serializers import DataExportSerializer
+
+
+@extend_schema(tags=['Exports'])
+class DataExportViewSet(mixins.CreateModelMixin,
+                        mixins.ListModelMixin,
+                        mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Request exports of orders or collect info responses and follow their progress.
+    Exports are written by a background task; poll an export until its status
+    is 'completed', then fetch the file from its download_url.
+    """
+    serializer_class = DataExportSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return DataExport.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        from ..tasks import run_data_export
+
+        data_export = serializer.save(user=self.request.user)
+        transaction.on_commit(lambda: run_data_export.delay(data_export.id))
+
+    @extend_schema(
+        summary="Download an export",
+        responses={
+            200: OpenApiResponse(description="The export file"),
+            409: OpenApiResponse(description="Export is not finished")
+        }
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Stream the export file to its owner"""
+        data_export = self.get_object()
+        if data_export.status != 'completed' or not data_export.file:
+            return Response(
+                {'detail': 'Export is not finished'},
+                status=status.HTTP_409_CONFLICT
+            )
+        filename = f"{data_export.export_type}-{data_export.created_at:%Y%m%d}.{data_export.file_format}"
+        return FileResponse(data_export.file.open('rb'), as_attachment=True, filename=filename)
@@ -1,17 +1,16 @@
 """
 Orders API endpoints for managing product orders
 """
-from decimal import Decimal
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Count, Sum, Case, When, DecimalField, F
 from django.utils import timezone
-from datetime import timedelta
 
 from ..models import Order, CustomLink
 from ..serializers import OrderSerializer
+from ..services.bulk_orders import bulk_update_email_preference, bulk_update_status
+from ..services.order_stats import seller_order_stats
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -62,58 +61,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         Get order statistics for the current user's products.
         Returns counts by status, revenue, and recent orders.
         """
-        user = request.user
-
-        # Get orders for user's products with optimized query
-        orders = Order.objects.filter(
-            custom_link__user_profile__user=user
-        ).select_related('custom_link')
-
-        # Calculate statistics
-        total_orders = orders.count()
-        pending_orders = orders.filter(status='pending').count()
-        completed_orders = orders.filter(status='completed').count()
-        cancelled_orders = orders.filter(status='cancelled').count()
-
-        # Revenue calculation using database aggregation (optimized)
-        # Use discounted price if available, otherwise regular price
-        revenue_result = orders.filter(status='completed').aggregate(
-            total=Sum(
-                Case(
-                    When(
-                        custom_link__checkout_discounted_price__isnull=False,
-                        then=F('custom_link__checkout_discounted_price')
-                    ),
-                    default=F('custom_link__checkout_price'),
-                    output_field=DecimalField(max_digits=10, decimal_places=2)
-                )
-            )
-        )
-        total_revenue = revenue_result['total'] or Decimal('0.00')
-
-        # Orders by product
-        orders_by_product = orders.values(
-            'custom_link__id',
-            'custom_link__title'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
-
-        # Recent orders (last 30 days)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_orders_count = orders.filter(
-            created_at__gte=thirty_days_ago
-        ).count()
-
-        return Response({
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'completed_orders': completed_orders,
-            'cancelled_orders': cancelled_orders,
-            'total_revenue': float(total_revenue),
-            'recent_orders_30d': recent_orders_count,
-            'orders_by_product': list(orders_by_product),
-        })
+        # Read from the per-product counters instead of scanning the orders
+        return Response(seller_order_stats(request.user))
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -205,35 +154,48 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get orders owned by the user
-        orders = Order.objects.filter(
-            id__in=order_ids,
-            custom_link__user_profile__user=user
-        )
-
-        if not orders.exists():
+        result = bulk_update_email_preference(user, order_ids, bool(enabled))
+        if not result['updated_count']:
             return Response(
                 {'error': 'No valid orders found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Update all orders
-        updated_count = orders.update(
-            email_automation_enabled=bool(enabled),
-            updated_at=timezone.now()
-        )
-
-        # Count total pending emails across all orders (for informational purposes)
-        total_pending = 0
-        for order in orders:
-            total_pending += (
-                order.followup_emails.filter(sent=False).count() +
-                order.optin_followup_emails.filter(sent=False).count()
-            )
-
+        updated_count = result['updated_count']
+        total_pending = result['pending_emails']
         return Response({
             'success': True,
             'updated_count': updated_count,
             'pending_emails': total_pending,
             'message': f'Email automation {"enabled" if enabled else "disabled"} for {updated_count} order(s). {total_pending} scheduled emails will {"resume" if enabled else "be paused"}.'
-        })
\ No newline at end of file
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """
+        Bulk update the status of multiple orders.
+        Orders are updated in chunks; delivery emails and follow-up sequences
+        for newly completed orders are sent by one background task per chunk.
+        """
+        order_ids = request.data.get('order_ids', [])
+        new_status = request.data.get('status')
+
+        if not order_ids:
+            return Response(
+                {'error': 'order_ids field is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if new_status not in ['pending', 'completed', 'cancelled']:
+            return Response(
+                {'error': 'Invalid status. Must be one of: pending, completed, cancelled'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = bulk_update_status(request.user, order_ids, new_status)
+
+        return Response({
+            'success': True,
+            **result,
+            'message': f'{result["updated_count"]} order(s) marked as {new_status}.'
+        })
@@ -14,7 +14,7 @@ class PlanViewSet(
     Public API for listing subscription plans.
     No authentication required - used for pricing page.
     """
-    queryset = Plan.objects.filter(is_active=True).order_by('sort_order', 'price')
+    queryset = Plan.objects.filter(is_active=True).order_by('sort_order', 'price').prefetch_related('features')
     serializer_class = PlanSerializer
     permission_classes = [AllowAny]
     
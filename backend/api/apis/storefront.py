@@ -1,4 +1,5 @@
 import re
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.db import models
@@ -33,6 +34,10 @@ from ..permissions import (
     StorefrontPermission, PublicProfilePermission,
     MaxCustomLinksPermission
 )
+from ..services.checkout_context import (
+    checkout_links, get_checkout_context, platform_fee, readiness_error
+)
+from ..services.stripe_backend import configure_stripe
 
 User = get_user_model()
 
@@ -893,7 +898,7 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
         logger.info(f"DEBUG - Creating order for link ID: {pk}")
         logger.info(f"DEBUG - Request data: {request.data}")
         
-        link = get_object_or_404(CustomLink, pk=pk, is_active=True)
+        link = get_object_or_404(checkout_links(), pk=pk, is_active=True)
         logger.info(f"DEBUG - Found link: {link.title}, type: {link.type}, owner: {link.user_profile.user.username}")
 
         # Check if this is a freebie/free product
@@ -1058,7 +1063,7 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
         logger.info(f"DEBUG - Creating embedded checkout order for link ID: {pk}")
         logger.info(f"DEBUG - Request data: {request.data}")
 
-        link = get_object_or_404(CustomLink, pk=pk, is_active=True)
+        link = get_object_or_404(checkout_links(), pk=pk, is_active=True)
         logger.info(f"DEBUG - Found link: {link.title}, type: {link.type}, owner: {link.user_profile.user.username}")
 
         # Check if this is a freebie/free product
@@ -1208,7 +1213,7 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
         logger.info(f"Creating PaymentIntent for link ID: {pk}")
         logger.info(f"Request data: {request.data}")
 
-        link = get_object_or_404(CustomLink, pk=pk, is_active=True)
+        link = get_object_or_404(checkout_links(), pk=pk, is_active=True)
         logger.info(f"Found link: {link.title}, type: {link.type}")
 
         # Check if this is a freebie/free product
@@ -1369,13 +1374,13 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
 
         logger.info(f"Initializing PaymentIntent for link ID: {pk}")
 
-        link = get_object_or_404(CustomLink, pk=pk, is_active=True)
-        logger.info(f"Found link: {link.title}, type: {link.type}, price: {link.checkout_price}")
+        # Cached: page loads do not touch the database before calling Stripe
+        context = get_checkout_context(pk)
+        if context is None:
+            raise Http404
+        logger.info(f"Found link: {context['title']}, price: {context['price']}")
 
-        # Check if this is a free product
-        is_free_product = not link.checkout_price or link.checkout_price <= 0
-
-        if is_free_product:
+        if context['is_free']:
             logger.info("Free product - no PaymentIntent needed")
             return Response({
                 "success": True,
@@ -1383,57 +1388,36 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
                 "message": "No payment required for free products"
             }, status=status.HTTP_200_OK)
 
-        # Get the seller's Connect account
-        try:
-            from ..services.stripe_connect_service import StripeConnectService
-
-            seller_user = link.user_profile.user
-            logger.info(f"Seller user: {seller_user.username}")
-
-            connect_account = getattr(seller_user, 'connect_account', None)
-
-            if not connect_account:
-                logger.error("No Stripe Connect account found for seller")
-                return Response({
-                    "error": "Seller has not connected their Stripe account"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            if not connect_account.charges_enabled:
-                logger.error("Stripe account not ready for charges")
-                return Response({
-                    "error": "Seller's Stripe account is not yet ready to accept payments"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Calculate effective price
-            effective_price = link.checkout_price
-            if (link.checkout_discounted_price and
-                link.checkout_discounted_price > 0 and
-                link.checkout_discounted_price < link.checkout_price):
-                effective_price = link.checkout_discounted_price
+        error = readiness_error(context)
+        if error:
+            logger.error(f"Seller cannot take payments for link {pk}: {error}")
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            effective_price = context['effective_price']
             price_cents = int(effective_price * 100)
 
             # Calculate platform fee
-            platform_fee_cents = connect_account.calculate_platform_fee(price_cents)
+            platform_fee_cents = platform_fee(context, price_cents)
 
             # Create PaymentIntent WITHOUT order
             import stripe
-            stripe.api_key = settings.STRIPE_SECRET_KEY
+            configure_stripe()
 
             payment_intent = stripe.PaymentIntent.create(
                 amount=price_cents,
-                currency=connect_account.default_currency,
+                currency=context['currency'],
                 automatic_payment_methods={
                     'enabled': True,
                     'allow_redirects': 'always'
                 },
                 application_fee_amount=platform_fee_cents,
                 transfer_data={
-                    'destination': connect_account.stripe_account_id,
+                    'destination': context['stripe_account_id'],
                 },
                 metadata={
-                    'custom_link_id': str(link.id),
-                    'seller_user_id': str(seller_user.id),
+                    'custom_link_id': str(context['link_id']),
+                    'seller_user_id': str(context['seller_user_id']),
                     'platform_fee': str(platform_fee_cents),
                 }
             )
@@ -1445,7 +1429,7 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
                 "client_secret": payment_intent.client_secret,
                 "payment_intent_id": payment_intent.id,
                 "amount": effective_price,
-                "currency": connect_account.default_currency,
+                "currency": context['currency'],
                 "message": "Payment initialized successfully"
             }, status=status.HTTP_200_OK)
 
@@ -1472,7 +1456,7 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
         logger.info(f"Finalizing order for link ID: {pk}")
         logger.info(f"Request data: {request.data}")
 
-        link = get_object_or_404(CustomLink, pk=pk, is_active=True)
+        link = get_object_or_404(checkout_links(), pk=pk, is_active=True)
         payment_intent_id = request.data.get('payment_intent_id')
 
         if not payment_intent_id:
@@ -1516,13 +1500,14 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
             import stripe
             from ..services.stripe_connect_service import StripeConnectService
 
-            stripe.api_key = settings.STRIPE_SECRET_KEY
+            configure_stripe()
             seller_user = link.user_profile.user
             connect_account = seller_user.connect_account
 
             # Update PaymentIntent metadata
             # Note: receipt_email cannot be updated after creation, but we store customer info in metadata
-            stripe.PaymentIntent.modify(
+            # modify() returns the updated PaymentIntent, so no separate retrieve is needed
+            payment_intent = stripe.PaymentIntent.modify(
                 payment_intent_id,
                 metadata={
                     'order_id': order.order_id,
@@ -1534,7 +1519,6 @@ class CustomLinkViewSet(viewsets.ModelViewSet):
             # Create PaymentTransaction record
             from ..models import PaymentTransaction
 
-            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
             price_cents = payment_intent.amount
             platform_fee_cents = payment_intent.application_fee_amount or 0
             seller_amount_cents = price_cents - platform_fee_cents
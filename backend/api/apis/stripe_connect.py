@@ -1,6 +1,7 @@
 """
 Stripe Connect API endpoints for marketplace functionality
 """
+import json
 import logging
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
@@ -28,12 +29,15 @@ from ..serializers import (
     RefundRequestSerializer,
     RefundResponseSerializer,
     ConnectEarningsSerializer,
+    ConnectDailyEarningsSerializer,
     ConnectWebhookEventSerializer
 )
+from ..services.connect_webhook_inbox import store_event
+from ..services.earnings_ledger import daily_earnings, earnings_summary
 from ..services.stripe_connect_service import stripe_connect_service
 from ..services.webhook_handlers import (
     verify_connect_webhook_signature,
-    handle_connect_webhook_event
+    CONNECT_EVENT_HANDLERS
 )
 
 logger = logging.getLogger(__name__)
@@ -429,43 +433,24 @@ class ConnectEarningsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Calculate earnings from transactions
-        from django.db.models import Sum, Count
-        from decimal import Decimal
-
-        transactions = PaymentTransaction.objects.filter(seller_account=connect_account)
-        
-        # Aggregate data
-        aggregates = transactions.aggregate(
-            total_sales_cents=Sum('total_amount'),
-            total_platform_fee_cents=Sum('platform_fee'),
-            successful_count=Count('id', filter=transactions.filter(status='succeeded').query),
-            failed_count=Count('id', filter=transactions.filter(status='failed').query),
-            total_count=Count('id')
-        )
-
-        # Convert cents to dollars
-        total_sales = Decimal(aggregates['total_sales_cents'] or 0) / 100
-        total_earnings = Decimal(aggregates['total_platform_fee_cents'] or 0) / 100
-        
-        # Calculate pending payouts (successful transactions not yet transferred)
-        pending_transactions = transactions.filter(status='succeeded', transfer_id='')
-        pending_payout_cents = pending_transactions.aggregate(
-            pending=Sum('seller_amount')
-        )['pending'] or 0
-        pending_payouts = Decimal(pending_payout_cents) / 100
-
-        earnings_data = {
-            'total_sales': total_sales,
-            'total_earnings': total_earnings,
-            'pending_payouts': pending_payouts,
-            'transaction_count': aggregates['total_count'] or 0,
-            'successful_transactions': aggregates['successful_count'] or 0,
-            'failed_transactions': aggregates['failed_count'] or 0,
-        }
+        # Read from the seller's materialized ledger
+        earnings_data = earnings_summary(connect_account)
 
         serializer = ConnectEarningsSerializer(earnings_data)
-        return Response(serializer.data)
+        data = serializer.data
+
+        days = request.query_params.get('days')
+        if days:
+            try:
+                days = min(max(int(days), 1), 365)
+            except ValueError:
+                return Response(
+                    {"detail": "days must be a number"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data['daily'] = ConnectDailyEarningsSerializer(daily_earnings(connect_account, days), many=True).data
+
+        return Response(data)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -477,6 +462,9 @@ class ConnectWebhookView(APIView):
 
     def post(self, request):
         """Handle incoming Stripe Connect webhook events"""
+        from django.db import transaction
+        from ..tasks import process_connect_webhook_events
+
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
 
@@ -487,10 +475,12 @@ class ConnectWebhookView(APIView):
         try:
             # Verify webhook signature
             event = verify_connect_webhook_signature(payload.decode('utf-8'), sig_header)
-            
-            # Process the event
-            result = handle_connect_webhook_event(event)
-            
+
+            # Store the event; a worker handles it after this request returns
+            object_key = store_event(event, json.loads(payload))
+            if event.type in CONNECT_EVENT_HANDLERS:
+                transaction.on_commit(lambda: process_connect_webhook_events.delay(object_key))
+
             return HttpResponse(status=200)
             
         except ValueError as e:
@@ -587,6 +577,7 @@ def connect_dashboard_info(request):
         return Response({
             'account': StripeConnectAccountSerializer(connect_account).data,
             'recent_transactions': transaction_serializer.data,
+            'earnings': ConnectEarningsSerializer(earnings_summary(connect_account)).data,
         })
         
     except StripeConnectAccount.DoesNotExist:
@@ -240,7 +240,8 @@ class FacebookWebhookView(APIView):
                 logger.info(f"Saved new comment {comment_id} to database")
                 
                 # Queue Celery task for automation processing
-                from ..tasks import process_comment_automation
+                from ..services.automation_engine import schedule_batch
+                from ..tasks import process_comment_automation_batch
                 
                 # Get delay from settings if exists
                 try:
@@ -249,9 +250,11 @@ class FacebookWebhookView(APIView):
                 except AutomationSettings.DoesNotExist:
                     delay = 5  # Default delay
                 
-                # Queue the task
-                process_comment_automation.delay(comment.id, delay_seconds=delay)
-                logger.info(f"Queued automation task for comment {comment_id} with {delay}s delay")
+                # Comments arriving within the delay window share one batch task
+                if schedule_batch(process_comment_automation_batch, 'comment', connection.id, delay):
+                    logger.info(f"Queued automation batch for connection {connection.id} with {delay}s delay")
+                else:
+                    logger.info(f"Comment {comment_id} joins the pending automation batch for connection {connection.id}")
             else:
                 logger.info(f"Comment {comment_id} already exists in database")
             
@@ -320,7 +323,15 @@ class FacebookWebhookView(APIView):
             # Create conversation ID (Facebook Messenger uses sender ID as conversation ID)
             conversation_id = sender_id
             
-            # Save direct message to database
+            # Get delay from settings if exists
+            try:
+                settings = AutomationSettings.objects.get(connection=connection)
+                delay = settings.dm_reply_delay_seconds if settings.enable_dm_automation else None
+            except AutomationSettings.DoesNotExist:
+                delay = None
+
+            # Save direct message to database; with DM automation off it is never
+            # answered, so later batches must not pick it up either
             dm, created = DirectMessage.objects.get_or_create(
                 message_id=message_id,
                 defaults={
@@ -332,7 +343,7 @@ class FacebookWebhookView(APIView):
                     'message_attachments': attachments,
                     'connection': connection,
                     'created_time': message_created_time,
-                    'status': 'new',
+                    'status': 'new' if delay is not None else 'ignored',
                     'is_echo': is_echo
                 }
             )
@@ -341,19 +352,15 @@ class FacebookWebhookView(APIView):
                 logger.info(f"Saved new Facebook DM {message_id} to database")
                 
                 # Queue Celery task for DM automation processing
-                from ..tasks import process_dm_automation
-                
-                # Get delay from settings if exists
-                try:
-                    settings = AutomationSettings.objects.get(connection=connection)
-                    delay = settings.dm_reply_delay_seconds if settings.enable_dm_automation else None
-                except AutomationSettings.DoesNotExist:
-                    delay = None
+                from ..services.automation_engine import schedule_batch
+                from ..tasks import process_dm_automation_batch
                 
                 if delay is not None:
-                    # Queue the task
-                    process_dm_automation.delay(dm.id, delay_seconds=delay)
-                    logger.info(f"Queued DM automation task for message {message_id} with {delay}s delay")
+                    # Messages arriving within the delay window share one batch task
+                    if schedule_batch(process_dm_automation_batch, 'dm', connection.id, delay):
+                        logger.info(f"Queued DM automation batch for connection {connection.id} with {delay}s delay")
+                    else:
+                        logger.info(f"DM {message_id} joins the pending automation batch for connection {connection.id}")
                 else:
                     logger.info(f"DM automation disabled for connection {connection.id}")
             else:
@@ -0,0 +1,190 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import (
+    Comment,
+    CommentReply,
+    SocialMediaConnection,
+    SocialMediaPlatform,
+    User,
+)
+
+BENCHMARK_USERNAME = 'benchmark-comment-indexes'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large comment dataset and print query plans for the comment '
+        'automation and dashboard access paths. Use --compare to also show the '
+        'plans without the comment indexes (dropped inside a rolled-back '
+        'transaction). Only run against a benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=1_000_000,
+            help='Number of comments to seed (default: 1,000,000)'
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=20,
+            help='Number of page connections to spread comments over (default: 20)'
+        )
+        parser.add_argument(
+            '--skip-seed',
+            action='store_true',
+            help='Reuse previously seeded benchmark data'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also print plans with the comment indexes removed'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the benchmark user and all seeded data, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('This benchmark requires PostgreSQL')
+
+        if options['cleanup']:
+            deleted = User.objects.filter(username=BENCHMARK_USERNAME).delete()[0]
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} benchmark rows'))
+            return
+
+        if options['skip_seed']:
+            user = User.objects.filter(username=BENCHMARK_USERNAME).first()
+            if not user:
+                raise CommandError('No benchmark data found; run without --skip-seed first')
+        else:
+            user = self._seed(options['comments'], options['connections'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE comments')
+            cursor.execute('ANALYZE comment_replies')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Plans with current indexes ==='))
+        self._explain_all(user)
+
+        if options['compare']:
+            with transaction.atomic():
+                with connection.schema_editor() as editor:
+                    for model in (Comment, CommentReply):
+                        for index in model._meta.indexes:
+                            editor.remove_index(model, index)
+                self.stdout.write(self.style.MIGRATE_HEADING('\n=== Plans without comment indexes ==='))
+                self._explain_all(user)
+                transaction.set_rollback(True)
+
+    def _seed(self, comment_count, connection_count):
+        User.objects.filter(username=BENCHMARK_USERNAME).delete()
+        user = User.objects.create_user(
+            username=BENCHMARK_USERNAME,
+            email=f'{BENCHMARK_USERNAME}@example.com'
+        )
+        platform, _ = SocialMediaPlatform.objects.get_or_create(
+            name='facebook',
+            defaults={
+                'display_name': 'Facebook',
+                'client_id': 'benchmark',
+                'client_secret': 'benchmark',
+                'auth_url': 'https://www.facebook.com/dialog/oauth',
+                'token_url': 'https://graph.facebook.com/oauth/access_token',
+                'scope': 'pages_manage_engagement',
+            }
+        )
+        connections = SocialMediaConnection.objects.bulk_create([
+            SocialMediaConnection(
+                user=user,
+                platform=platform,
+                access_token='benchmark',
+                facebook_page_id=f'benchmark-page-{i}',
+                facebook_page_name=f'Benchmark Page {i}',
+            )
+            for i in range(connection_count)
+        ])
+        connection_ids = [conn.id for conn in connections]
+
+        self.stdout.write(f'Seeding {comment_count} comments over {connection_count} connections...')
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            # Statuses are skewed like a real inbox: mostly handled, a few new
+            cursor.execute(
+                """
+                INSERT INTO comments (
+                    comment_id, post_id, page_id, from_user_name, from_user_id,
+                    message, connection_id, status, created_time, received_at
+                )
+                SELECT
+                    'bench_' || %(user_id)s || '_' || g,
+                    'post_' || (g %% 500),
+                    'benchmark-page',
+                    'User ' || g,
+                    'user_' || g,
+                    CASE WHEN g %% 3 = 0 THEN 'What is the price?' ELSE 'Great post!' END,
+                    (%(connection_ids)s::bigint[])[1 + (g %% %(connection_count)s)],
+                    CASE
+                        WHEN g %% 100 = 0 THEN 'new'
+                        WHEN g %% 3 = 0 THEN 'replied'
+                        ELSE 'ignored'
+                    END,
+                    %(now)s - (g || ' seconds')::interval,
+                    %(now)s - (g || ' seconds')::interval
+                FROM generate_series(1, %(comment_count)s) AS g
+                """,
+                {
+                    'user_id': user.id,
+                    'connection_ids': connection_ids,
+                    'connection_count': connection_count,
+                    'comment_count': comment_count,
+                    'now': now,
+                }
+            )
+            cursor.execute(
+                """
+                INSERT INTO comment_replies (
+                    comment_id, reply_text, facebook_reply_id, status, error_message, sent_at
+                )
+                SELECT c.id, 'Check your DMs!', '', 'sent', '', c.created_time
+                FROM comments c
+                WHERE c.connection_id = ANY(%(connection_ids)s) AND c.status = 'replied'
+                """,
+                {'connection_ids': connection_ids}
+            )
+        self.stdout.write(self.style.SUCCESS('Seeding complete'))
+        return user
+
+    def _explain_all(self, user):
+        connection_id = (
+            SocialMediaConnection.objects.filter(user=user).values_list('id', flat=True).first()
+        )
+        comment_id = (
+            Comment.objects.filter(connection_id=connection_id).values_list('id', flat=True).first()
+        )
+        user_comments = Comment.objects.filter(
+            connection__user=user,
+            connection__platform__name='facebook',
+            connection__is_active=True
+        )
+        queries = [
+            ('Comment list (first page)',
+             user_comments.order_by('-created_time')[:20]),
+            ('Comment list filtered by connection and status',
+             user_comments.filter(connection_id=connection_id, status='replied').order_by('-created_time')[:20]),
+            ('Pending comments for automation batch',
+             Comment.objects.filter(connection_id=connection_id, status='new').order_by('created_time')[:500]),
+            ('automation_stats: replied comments',
+             Comment.objects.filter(connection__user=user, status='replied').values('id')),
+            ('Replies for a comment',
+             CommentReply.objects.filter(comment_id=comment_id).order_by('-sent_at')),
+        ]
+        for title, queryset in queries:
+            self.stdout.write(self.style.HTTP_INFO(f'\n-- {title}'))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
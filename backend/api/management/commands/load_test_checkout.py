@@ -0,0 +1,236 @@
+import json
+import math
+import queue
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.models import CustomLink, PaymentTransaction, StripeConnectAccount, User
+from api.services.stripe_backend import LocalStripeClient, configure_stripe
+
+LOADTEST_USERNAME = 'load-test-checkout'
+
+# Requests made by one checkout of each flow, in order
+FLOWS = {
+    'create_order': ['create-order'],
+    'create_payment_intent': ['create-payment-intent'],
+    'payment_element': ['initialize-payment', 'finalize-order'],
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the storefront checkout endpoints at a target rate and report '
+        'p50/p95/p99 latency and query counts per endpoint. Requests run '
+        'in-process through the Django test client against a seeded seller, '
+        'with Stripe calls going to the local stand-in or stripe-mock '
+        '(STRIPE_BACKEND=local or stripe-mock). Each checkout comes from its '
+        'own client IP, so the per-IP rate limit does not throttle the run. '
+        'Only run against a load-test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rps',
+            type=float,
+            default=20,
+            help='Checkouts started per second (default: 20)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Seconds to run for (default: 30)'
+        )
+        parser.add_argument(
+            '--checkouts',
+            type=int,
+            help='Number of checkouts to run, instead of --duration'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Worker threads, each with its own database connection (default: 8)'
+        )
+        parser.add_argument(
+            '--flows',
+            nargs='+',
+            choices=list(FLOWS),
+            default=list(FLOWS),
+            help='Checkout flows to run, in rotation (default: all)'
+        )
+        parser.add_argument(
+            '--stripe-latency-ms',
+            type=int,
+            help='Simulated Stripe round trip of the local backend (default: STRIPE_LOCAL_LATENCY_MS)'
+        )
+        parser.add_argument(
+            '--skip-seed',
+            action='store_true',
+            help='Reuse the previously seeded seller and product'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the load-test seller and all their orders, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            # Transactions protect the seller's Connect account, so they go first
+            deleted = PaymentTransaction.objects.filter(seller_account__user__username=LOADTEST_USERNAME).delete()[0]
+            deleted += User.objects.filter(username=LOADTEST_USERNAME).delete()[0]
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} load-test rows'))
+            return
+
+        if settings.STRIPE_BACKEND not in ('local', 'stripe-mock'):
+            raise CommandError('Set STRIPE_BACKEND=local or STRIPE_BACKEND=stripe-mock; this would call the live Stripe API')
+        if options['rps'] <= 0 or options['concurrency'] < 1:
+            raise CommandError('--rps must be positive and --concurrency at least 1')
+
+        configure_stripe()
+        if isinstance(stripe.default_http_client, LocalStripeClient) and options['stripe_latency_ms'] is not None:
+            stripe.default_http_client.latency_ms = options['stripe_latency_ms']
+
+        if options['skip_seed']:
+            link = CustomLink.objects.filter(user_profile__user__username=LOADTEST_USERNAME).first()
+            if not link:
+                raise CommandError('No load-test data found; run without --skip-seed first')
+        else:
+            link = self._seed()
+
+        checkouts = options['checkouts'] or max(1, int(options['rps'] * options['duration']))
+        self.stdout.write(
+            f"Running {checkouts} checkouts at {options['rps']:g}/s with {options['concurrency']} workers "
+            f"({settings.STRIPE_BACKEND} Stripe backend)..."
+        )
+        results, elapsed = self._run(link, checkouts, options['rps'], options['concurrency'], options['flows'])
+        self._report(results, checkouts, elapsed)
+
+    def _seed(self):
+        PaymentTransaction.objects.filter(seller_account__user__username=LOADTEST_USERNAME).delete()
+        User.objects.filter(username=LOADTEST_USERNAME).delete()
+        user = User.objects.create_user(username=LOADTEST_USERNAME, email=f'{LOADTEST_USERNAME}@example.com')
+        StripeConnectAccount.objects.create(
+            user=user,
+            stripe_account_id='acct_loadtest',
+            charges_enabled=True,
+            payouts_enabled=True
+        )
+        return CustomLink.objects.create(
+            user_profile=user.profile,
+            title='Load Test Course',
+            style='checkout',
+            type='digital_product',
+            checkout_price=Decimal('49.00'),
+            checkout_discounted_price=Decimal('29.00')
+        )
+
+    def _run(self, link, checkouts, rps, concurrency, flows):
+        pending = queue.Queue()
+        for index in range(checkouts):
+            pending.put(index)
+        results = []
+        started = time.perf_counter()
+
+        def work():
+            client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+            while True:
+                try:
+                    index = pending.get_nowait()
+                except queue.Empty:
+                    return
+                # Open loop: checkout n starts at n / rps whether or not earlier ones finished
+                delay = started + index / rps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self._checkout(client, link, index, flows[index % len(flows)], results)
+
+        def thread_work():
+            try:
+                work()
+            finally:
+                connection.close()
+
+        if concurrency == 1:
+            work()
+        else:
+            threads = [threading.Thread(target=thread_work) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return results, time.perf_counter() - started
+
+    def _checkout(self, client, link, index, flow, results):
+        base = f'/api/storefront/links/{link.id}'
+        # A distinct customer IP per checkout
+        ip = f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+        order = {
+            'customer_name': f'Load Test {index}',
+            'customer_email': f'load-test-{index}@example.com',
+            'form_responses': {},
+        }
+        payment_intent_id = None
+
+        for endpoint in FLOWS[flow]:
+            data = dict(order, payment_intent_id=payment_intent_id) if endpoint == 'finalize-order' else order
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.post(
+                    f'{base}/{endpoint}/', json.dumps(data),
+                    content_type='application/json', HTTP_X_FORWARDED_FOR=ip
+                )
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            ok = response.status_code < 400 and 'error' not in body
+            results.append((endpoint, elapsed_ms, len(queries), ok))
+            if not ok:
+                return
+            payment_intent_id = body.get('payment_intent_id', payment_intent_id)
+
+    def _report(self, results, checkouts, elapsed):
+        by_endpoint = defaultdict(list)
+        for endpoint, elapsed_ms, query_count, ok in results:
+            by_endpoint[endpoint].append((elapsed_ms, query_count, ok))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n{"Endpoint":<24}{"Requests":>9}{"Errors":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"Queries":>9}{"Max q":>7}'
+        ))
+        for endpoint in [endpoint for steps in FLOWS.values() for endpoint in steps]:
+            rows = by_endpoint.get(endpoint)
+            if not rows:
+                continue
+            latencies = [row[0] for row in rows]
+            query_counts = [row[1] for row in rows]
+            errors = sum(1 for row in rows if not row[2])
+            self.stdout.write(
+                f'{endpoint:<24}{len(rows):>9}{errors:>8}'
+                f'{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}'
+                f'{sum(query_counts) / len(query_counts):>9.1f}{max(query_counts):>7}'
+            )
+
+        failed = sum(1 for result in results if not result[3])
+        summary = f'\n{checkouts} checkouts in {elapsed:.1f}s ({checkouts / elapsed:.1f}/s achieved)'
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{summary}, {failed} failed requests'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
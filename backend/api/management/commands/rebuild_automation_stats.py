@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.automation_stats import rollup_daily_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the AutomationDailyStats rollup from the comment, DM and '
+        'reply tables. The periodic rollup only refreshes the last two days; '
+        'run this after changing older messages, or after deploying a change '
+        'to how buckets are counted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='First date to recompute (YYYY-MM-DD); defaults to the full history'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format') from None
+
+        bucket_count = rollup_daily_stats(since=since)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {bucket_count} automation stats buckets since {since or 'the beginning'}"
+        ))
@@ -0,0 +1,70 @@
+"""
+Django management command that stands in for Pub/Sub when testing Gmail push
+"""
+import base64
+import json
+import os
+import uuid
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import EmailAccount
+
+
+class Command(BaseCommand):
+    help = (
+        'Post a Pub/Sub-style Gmail push notification to the push endpoint, '
+        'so the push path can be exercised without Google Cloud Pub/Sub'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'email_address',
+            type=str,
+            help='Gmail address the notification is for',
+        )
+        parser.add_argument(
+            '--history-id',
+            type=int,
+            help='historyId to report (default: one past the stored history id)',
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            default=f"{os.environ.get('BACKEND_URL', 'http://localhost:8000')}/api/email/push/",
+            help='Push endpoint URL (default: BACKEND_URL/api/email/push/)',
+        )
+
+    def handle(self, *args, **options):
+        token = getattr(settings, 'GMAIL_PUSH_VERIFICATION_TOKEN', '')
+        if not token:
+            raise CommandError('GMAIL_PUSH_VERIFICATION_TOKEN is not set')
+
+        email_address = options['email_address']
+        history_id = options['history_id']
+        if history_id is None:
+            account = EmailAccount.objects.filter(email_address__iexact=email_address).first()
+            if not account:
+                raise CommandError(f'No email account found for {email_address}')
+            history_id = int(account.history_id or 0) + 1
+
+        data = json.dumps({'emailAddress': email_address, 'historyId': history_id})
+        envelope = {
+            'message': {
+                'data': base64.b64encode(data.encode()).decode(),
+                'messageId': str(uuid.uuid4()),
+                'publishTime': timezone.now().isoformat(),
+            },
+            'subscription': 'projects/local/subscriptions/gmail-push',
+        }
+
+        response = requests.post(options['url'], params={'token': token}, json=envelope, timeout=10)
+        if response.status_code >= 300:
+            raise CommandError(f'Push endpoint returned {response.status_code}: {response.text}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Delivered push for {email_address} (history {history_id}): HTTP {response.status_code}'
+        ))
@@ -73,6 +73,7 @@ class Command(BaseCommand):
                 # Create scheduled email
                 scheduled_email = ScheduledOptinEmail.objects.create(
                     order=order,
+                    customer_email=order.customer_email.lower(),
                     email_template=template,
                     scheduled_for=scheduled_datetime
                 )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0050_order_email_automation_enabled_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='automationrule',
+            name='last_triggered_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last triggered at'),
+        ),
+        migrations.AddField(
+            model_name='automationrule',
+            name='times_failed',
+            field=models.IntegerField(default=0, verbose_name='Times failed'),
+        ),
+        migrations.AddField(
+            model_name='automationrule',
+            name='times_succeeded',
+            field=models.IntegerField(default=0, verbose_name='Times succeeded'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0051_automationrule_outcome_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentreply',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='Error message'),
+        ),
+    ]
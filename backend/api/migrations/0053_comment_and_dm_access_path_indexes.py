@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build indexes without locking writes on large comment/DM tables
+    atomic = False
+
+    dependencies = [
+        ('api', '0052_commentreply_error_message'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='directmessage',
+            name='direct_mess_connect_e62744_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['connection', 'status', '-created_time'], name='comments_connect_3b1ac8_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['connection', '-created_time'], name='comments_connect_a971f9_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='commentreply',
+            index=models.Index(fields=['comment', '-sent_at'], name='comment_rep_comment_891714_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='commentreply',
+            index=models.Index(fields=['rule', 'status'], name='comment_rep_rule_id_308f35_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessage',
+            index=models.Index(fields=['connection', 'status', '-created_time'], name='direct_mess_connect_8ae71d_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessage',
+            index=models.Index(fields=['connection', '-created_time'], name='direct_mess_connect_96d2e1_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessagereply',
+            index=models.Index(fields=['direct_message', '-sent_at'], name='direct_mess_direct__0d9c56_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessagereply',
+            index=models.Index(fields=['rule', 'status'], name='direct_mess_rule_id_1c0de9_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0053_comment_and_dm_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('channel', models.CharField(choices=[('comment', 'Comment'), ('facebook_dm', 'Facebook Messenger'), ('instagram_dm', 'Instagram DM')], max_length=20, verbose_name='Channel')),
+                ('messages_received', models.PositiveIntegerField(default=0, verbose_name='Messages received')),
+                ('messages_replied', models.PositiveIntegerField(default=0, verbose_name='Messages replied')),
+                ('replies_sent', models.PositiveIntegerField(default=0, verbose_name='Replies sent')),
+                ('replies_failed', models.PositiveIntegerField(default=0, verbose_name='Replies failed')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('connection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='automation_daily_stats', to='api.socialmediaconnection')),
+            ],
+            options={
+                'db_table': 'automation_daily_stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['channel', '-date'], name='automation__channel_94e47c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('connection', 'date', 'channel'), name='unique_automation_daily_stats')],
+            },
+        ),
+    ]
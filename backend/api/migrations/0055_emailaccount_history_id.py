@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0054_automationdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailaccount',
+            name='history_id',
+            field=models.CharField(blank=True, help_text='Gmail historyId the mailbox was last synced to; empty until the first full sync', max_length=32, verbose_name='history ID'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_bodies_fetched(apps, schema_editor):
+    """Messages synced before lazy hydration already have their bodies stored."""
+    EmailMessage = apps.get_model('api', 'EmailMessage')
+    EmailMessage.objects.update(body_fetched_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0055_emailaccount_history_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailmessage',
+            name='body_fetched_at',
+            field=models.DateTimeField(blank=True, help_text='When the body and attachments were downloaded; sync only stores headers', null=True, verbose_name='body fetched at'),
+        ),
+        migrations.RunPython(mark_existing_bodies_fetched, reverse_code=migrations.RunPython.noop),
+    ]
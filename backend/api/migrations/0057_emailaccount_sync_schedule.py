@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0056_emailmessage_body_fetched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailaccount',
+            name='inbox_opened_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the user viewed the inbox; dormant inboxes are not polled', null=True, verbose_name='inbox opened at'),
+        ),
+        migrations.AddField(
+            model_name='emailaccount',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='next sync at'),
+        ),
+        migrations.AddField(
+            model_name='emailaccount',
+            name='sync_interval_minutes',
+            field=models.PositiveSmallIntegerField(default=5, help_text='Adapted to mailbox activity: shorter for busy inboxes, longer for quiet ones', verbose_name='sync interval (minutes)'),
+        ),
+        migrations.AddIndex(
+            model_name='emailaccount',
+            index=models.Index(fields=['is_active', 'next_sync_at'], name='email_accou_is_acti_0d62d6_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0057_emailaccount_sync_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailaccount',
+            name='watch_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Gmail push notifications (users.watch) are active until this time', null=True, verbose_name='push watch expires at'),
+        ),
+    ]
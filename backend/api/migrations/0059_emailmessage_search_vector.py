@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Max, Min
+
+# Messages indexed per statement; with atomic = False each batch commits on
+# its own, so row locks are only held on one batch at a time
+BACKFILL_BATCH_SIZE = 1000
+
+
+def populate_search_vectors(apps, schema_editor):
+    """Index messages synced before full-text search existed, in pk ranges."""
+    EmailMessage = apps.get_model('api', 'EmailMessage')
+    search_vector = (
+        SearchVector('subject', weight='A', config='english')
+        + SearchVector('from_name', 'from_email', weight='B', config='english')
+        + SearchVector('snippet', weight='C', config='english')
+        + SearchVector('body_text', weight='D', config='english')
+    )
+    bounds = EmailMessage.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+    for start in range(bounds['first'] - 1, bounds['last'], BACKFILL_BATCH_SIZE):
+        EmailMessage.objects.filter(
+            pk__gt=start, pk__lte=start + BACKFILL_BATCH_SIZE, search_vector__isnull=True
+        ).update(search_vector=search_vector)
+
+
+class Migration(migrations.Migration):
+    # Build the GIN index without locking writes on the email table
+    atomic = False
+
+    dependencies = [
+        ('api', '0058_emailaccount_watch_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailmessage',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='search vector'),
+        ),
+        migrations.RunPython(populate_search_vectors, reverse_code=migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='emailmessage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='email_messages_search_gin'),
+        ),
+    ]
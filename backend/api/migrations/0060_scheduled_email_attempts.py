@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0059_emailmessage_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledfollowupemail',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Failed send attempts so far', verbose_name='attempts'),
+        ),
+        migrations.AddField(
+            model_name='scheduledoptinemail',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Failed send attempts so far', verbose_name='attempts'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:54
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Lower
+
+
+def populate_customer_emails(apps, schema_editor):
+    """Copy each scheduled email's order address onto the row."""
+    Order = apps.get_model('api', 'Order')
+    for model_name in ('ScheduledFollowupEmail', 'ScheduledOptinEmail'):
+        model = apps.get_model('api', model_name)
+        model.objects.update(customer_email=Lower(Subquery(
+            Order.objects.filter(pk=OuterRef('order_id')).values('customer_email')[:1]
+        )))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0060_scheduled_email_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledfollowupemail',
+            name='customer_email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='customer email'),
+        ),
+        migrations.AddField(
+            model_name='scheduledoptinemail',
+            name='customer_email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='customer email'),
+        ),
+        migrations.RunPython(populate_customer_emails, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='scheduledfollowupemail',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['customer_email'], name='sched_followup_active_email'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledoptinemail',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['customer_email'], name='sched_optin_active_email'),
+        ),
+    ]
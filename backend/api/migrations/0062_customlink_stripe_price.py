@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0061_scheduled_email_customer_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customlink',
+            name='stripe_price_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Stripe price ID'),
+        ),
+        migrations.AddField(
+            model_name='customlink',
+            name='stripe_price_key',
+            field=models.CharField(blank=True, help_text='Fingerprint of the amount, currency and product details the Stripe price was created for', max_length=64, verbose_name='Stripe price key'),
+        ),
+        migrations.AddField(
+            model_name='customlink',
+            name='stripe_product_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Stripe product ID'),
+        ),
+    ]
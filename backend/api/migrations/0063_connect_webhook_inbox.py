@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0062_customlink_stripe_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connectwebhookevent',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='attempts'),
+        ),
+        migrations.AddField(
+            model_name='connectwebhookevent',
+            name='object_key',
+            field=models.CharField(blank=True, help_text='Stripe object the event is about; events for the same object are handled one at a time, in order', max_length=255, verbose_name='object key'),
+        ),
+        migrations.AddField(
+            model_name='connectwebhookevent',
+            name='payload',
+            field=models.JSONField(blank=True, help_text='Full event as delivered by Stripe', null=True, verbose_name='event payload'),
+        ),
+        migrations.AddField(
+            model_name='connectwebhookevent',
+            name='stripe_created',
+            field=models.BigIntegerField(blank=True, help_text='Event creation time (Unix seconds)', null=True, verbose_name='Stripe created'),
+        ),
+        migrations.AddIndex(
+            model_name='connectwebhookevent',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['object_key', 'stripe_created', 'id'], name='connect_event_inbox_pending'),
+        ),
+    ]
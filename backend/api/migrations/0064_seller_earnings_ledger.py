@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+
+def build_ledgers(apps, schema_editor):
+    """Materialize the earnings of existing transactions."""
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    SellerEarningsLedger = apps.get_model('api', 'SellerEarningsLedger')
+    SellerEarningsDay = apps.get_model('api', 'SellerEarningsDay')
+
+    succeeded = Q(status='succeeded')
+    refunded = Q(status__in=['partially_refunded', 'refunded'])
+    totals = PaymentTransaction.objects.values('seller_account_id').annotate(
+        transaction_count=Count('id'),
+        gross_amount=Coalesce(Sum('total_amount'), 0),
+        platform_fee_amount=Coalesce(Sum('platform_fee'), 0),
+        succeeded_count=Count('id', filter=succeeded),
+        succeeded_amount=Coalesce(Sum('total_amount', filter=succeeded), 0),
+        seller_earned_amount=Coalesce(Sum('seller_amount', filter=succeeded), 0),
+        failed_count=Count('id', filter=Q(status='failed')),
+        refunded_count=Count('id', filter=refunded),
+        refunded_amount=Coalesce(Sum('refunded_amount'), 0),
+        pending_payout_amount=Coalesce(Sum('seller_amount', filter=succeeded & Q(transfer_id='')), 0),
+    ).order_by()
+    SellerEarningsLedger.objects.bulk_create([
+        SellerEarningsLedger(connect_account_id=row.pop('seller_account_id'), **row) for row in totals
+    ], batch_size=500)
+
+    days = PaymentTransaction.objects.filter(succeeded | refunded).annotate(
+        date=TruncDate(Coalesce('paid_at', 'created_at'), tzinfo=timezone.get_current_timezone())
+    ).values('seller_account_id', 'date').annotate(
+        sales_count=Count('id'),
+        sales_amount=Sum('total_amount'),
+        platform_fee_amount=Sum('platform_fee'),
+        seller_amount=Sum('seller_amount'),
+        refunded_amount=Sum('refunded_amount'),
+    ).order_by()
+    SellerEarningsDay.objects.bulk_create([
+        SellerEarningsDay(connect_account_id=row.pop('seller_account_id'), **row) for row in days
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0063_connect_webhook_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerEarningsLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='transaction count')),
+                ('gross_amount', models.BigIntegerField(default=0, verbose_name='gross amount')),
+                ('platform_fee_amount', models.BigIntegerField(default=0, verbose_name='platform fee amount')),
+                ('succeeded_count', models.IntegerField(default=0, verbose_name='succeeded count')),
+                ('succeeded_amount', models.BigIntegerField(default=0, verbose_name='succeeded amount')),
+                ('seller_earned_amount', models.BigIntegerField(default=0, help_text='Seller share of succeeded transactions', verbose_name='seller earned amount')),
+                ('failed_count', models.IntegerField(default=0, verbose_name='failed count')),
+                ('refunded_count', models.IntegerField(default=0, help_text='Fully or partially refunded transactions', verbose_name='refunded count')),
+                ('refunded_amount', models.BigIntegerField(default=0, verbose_name='refunded amount')),
+                ('pending_payout_amount', models.BigIntegerField(default=0, help_text='Seller share of succeeded transactions not yet transferred', verbose_name='pending payout amount')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('connect_account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='earnings_ledger', to='api.stripeconnectaccount')),
+            ],
+            options={
+                'verbose_name': 'seller earnings ledger',
+                'verbose_name_plural': 'seller earnings ledgers',
+                'db_table': 'seller_earnings_ledgers',
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerEarningsDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('sales_count', models.IntegerField(default=0, verbose_name='sales count')),
+                ('sales_amount', models.BigIntegerField(default=0, verbose_name='sales amount')),
+                ('platform_fee_amount', models.BigIntegerField(default=0, verbose_name='platform fee amount')),
+                ('seller_amount', models.BigIntegerField(default=0, verbose_name='seller amount')),
+                ('refunded_amount', models.BigIntegerField(default=0, verbose_name='refunded amount')),
+                ('connect_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnings_days', to='api.stripeconnectaccount')),
+            ],
+            options={
+                'verbose_name': 'seller earnings day',
+                'verbose_name_plural': 'seller earnings days',
+                'db_table': 'seller_earnings_days',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('connect_account', 'date'), name='unique_earnings_day')],
+            },
+        ),
+        migrations.RunPython(build_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def build_order_stats(apps, schema_editor):
+    """Count existing orders into the new rollups."""
+    Order = apps.get_model('api', 'Order')
+    OrderStats = apps.get_model('api', 'OrderStats')
+    OrderDailyStats = apps.get_model('api', 'OrderDailyStats')
+
+    counts = Order.objects.values('custom_link_id', 'custom_link__user_profile__user_id').annotate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        completed_orders=Count('id', filter=Q(status='completed')),
+        cancelled_orders=Count('id', filter=Q(status='cancelled')),
+    ).order_by()
+    OrderStats.objects.bulk_create([
+        OrderStats(
+            custom_link_id=row['custom_link_id'],
+            user_id=row['custom_link__user_profile__user_id'],
+            total_orders=row['total_orders'],
+            pending_orders=row['pending_orders'],
+            completed_orders=row['completed_orders'],
+            cancelled_orders=row['cancelled_orders'],
+        )
+        for row in counts
+    ], batch_size=1000)
+
+    days = Order.objects.annotate(
+        date=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    ).values('custom_link_id', 'date').annotate(orders=Count('id')).order_by()
+    OrderDailyStats.objects.bulk_create([OrderDailyStats(**row) for row in days], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0064_seller_earnings_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_orders', models.IntegerField(default=0, verbose_name='total orders')),
+                ('pending_orders', models.IntegerField(default=0, verbose_name='pending orders')),
+                ('completed_orders', models.IntegerField(default=0, verbose_name='completed orders')),
+                ('cancelled_orders', models.IntegerField(default=0, verbose_name='cancelled orders')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('custom_link', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='order_stats', to='api.customlink')),
+                ('user', models.ForeignKey(help_text='Owner of the product', on_delete=django.db.models.deletion.CASCADE, related_name='order_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'order stats',
+                'verbose_name_plural': 'order stats',
+                'db_table': 'order_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('orders', models.IntegerField(default=0, verbose_name='orders')),
+                ('custom_link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_daily_stats', to='api.customlink')),
+            ],
+            options={
+                'verbose_name': 'order daily stats',
+                'verbose_name_plural': 'order daily stats',
+                'db_table': 'order_daily_stats',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('custom_link', 'date'), name='unique_order_daily_stats')],
+            },
+        ),
+        migrations.RunPython(build_order_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0065_order_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('orders', 'Orders'), ('collect_info_responses', 'Collect Info Responses')], max_length=30, verbose_name='export type')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('parquet', 'Parquet')], default='csv', max_length=10, verbose_name='file format')),
+                ('filters', models.JSONField(blank=True, default=dict, help_text='custom_link_id and, for orders, status', verbose_name='filters')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('total_rows', models.IntegerField(default=0, verbose_name='total rows')),
+                ('exported_rows', models.IntegerField(default=0, verbose_name='exported rows')),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='exports/', verbose_name='file')),
+                ('error_message', models.TextField(blank=True, verbose_name='error message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='completed at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'data export',
+                'verbose_name_plural': 'data exports',
+                'db_table': 'data_exports',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='data_export_user_id_49b43c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0066_data_export'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_order_i_88e57b_idx',
+        ),
+    ]
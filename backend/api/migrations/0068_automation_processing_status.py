@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0067_drop_redundant_order_id_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('processing', 'Processing'), ('replied', 'Replied'), ('ignored', 'Ignored'), ('error', 'Error')], default='new', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='directmessage',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('processing', 'Processing'), ('replied', 'Replied'), ('ignored', 'Ignored'), ('error', 'Error')], default='new', max_length=20, verbose_name='Status'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+import api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0068_automation_processing_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file',
+            field=models.FileField(blank=True, max_length=255, storage=api.models.get_export_storage, upload_to='exports/', verbose_name='file'),
+        ),
+    ]
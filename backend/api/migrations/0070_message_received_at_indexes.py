@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:37
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build indexes without locking writes on large comment/DM tables
+    atomic = False
+
+    dependencies = [
+        ('api', '0069_data_export_storage'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['received_at'], name='comments_receive_026aa1_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessage',
+            index=models.Index(fields=['received_at'], name='direct_mess_receive_db8737_idx'),
+        ),
+    ]
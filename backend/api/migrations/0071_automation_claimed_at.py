@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build indexes without locking writes on large comment/DM tables
+    atomic = False
+
+    dependencies = [
+        ('api', '0070_message_received_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When an automation batch claimed it', null=True, verbose_name='Claimed at'),
+        ),
+        migrations.AddField(
+            model_name='directmessage',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When an automation batch claimed it', null=True, verbose_name='Claimed at'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['claimed_at'], name='comments_claimed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='directmessage',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['claimed_at'], name='direct_mess_claimed_idx'),
+        ),
+    ]
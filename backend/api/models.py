@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.files.storage import storages
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from cloudinary.models import CloudinaryField
 from tinymce import models as tinymce_models
@@ -414,6 +417,16 @@ class CustomLink(models.Model):
     checkout_cta_button_text = models.CharField(_("checkout CTA button text"), max_length=50, blank=True)
     checkout_price = models.DecimalField(_("checkout price"), max_digits=10, decimal_places=2, blank=True, null=True)
     checkout_discounted_price = models.DecimalField(_("checkout discounted price"), max_digits=10, decimal_places=2, blank=True, null=True)
+
+    # Stripe Product/Price created ahead of checkout (STRIPE_PRECREATE_PRICES)
+    stripe_product_id = models.CharField(_("Stripe product ID"), max_length=255, blank=True)
+    stripe_price_id = models.CharField(_("Stripe price ID"), max_length=255, blank=True)
+    stripe_price_key = models.CharField(
+        _("Stripe price key"),
+        max_length=64,
+        blank=True,
+        help_text="Fingerprint of the amount, currency and product details the Stripe price was created for"
+    )
     
     # Additional product-specific information stored as JSON
     additional_info = models.JSONField(_("additional info"), blank=True, null=True, help_text="Product-specific information based on product type")
@@ -732,16 +745,25 @@ class Comment(models.Model):
     
     status = models.CharField("Status", max_length=20, default='new', choices=[
         ('new', 'New'),
+        ('processing', 'Processing'),
         ('replied', 'Replied'),
-        ('ignored', 'Ignored')
+        ('ignored', 'Ignored'),
+        ('error', 'Error')
     ])
     
     created_time = models.DateTimeField("Facebook created time")
     received_at = models.DateTimeField("Received at", auto_now_add=True)
+    claimed_at = models.DateTimeField("Claimed at", null=True, blank=True, help_text="When an automation batch claimed it")
     
     class Meta:
         db_table = 'comments'
         ordering = ['-created_time']
+        indexes = [
+            models.Index(fields=['connection', 'status', '-created_time']),
+            models.Index(fields=['connection', '-created_time']),
+            models.Index(fields=['received_at']),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='processing'), name='comments_claimed_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.from_user_name}: {self.message[:50]}"
@@ -767,6 +789,9 @@ class AutomationRule(models.Model):
     priority = models.IntegerField("Priority", default=0)
     
     times_triggered = models.IntegerField("Times triggered", default=0)
+    times_succeeded = models.IntegerField("Times succeeded", default=0)
+    times_failed = models.IntegerField("Times failed", default=0)
+    last_triggered_at = models.DateTimeField("Last triggered at", null=True, blank=True)
     created_at = models.DateTimeField("Created at", auto_now_add=True)
     
     class Meta:
@@ -774,9 +799,41 @@ class AutomationRule(models.Model):
         ordering = ['connection', '-priority']
         unique_together = [['user', 'connection', 'rule_name', 'message_type']]
 
+    # Written only by record_outcomes
+    STATISTICS_FIELDS = ('times_triggered', 'times_succeeded', 'times_failed', 'last_triggered_at')
+
     def __str__(self):
         return f"{self.rule_name} [{self.message_type}] ({self.connection.facebook_page_name})"
 
+    def save(self, *args, **kwargs):
+        # Saving a rule loaded before a batch recorded its outcomes must not
+        # write its stale statistics back
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STATISTICS_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def record_outcomes(cls, rule_id, succeeded=0, failed=0):
+        """
+        Atomically add reply outcomes to a rule's statistics.
+
+        Uses F() expressions so concurrent workers hitting the same rule
+        never lose counts and only the statistics columns are written.
+        times_triggered counts successful replies, as it always has;
+        failures are counted in times_failed.
+        """
+        if not rule_id or not (succeeded or failed):
+            return 0
+        return cls.objects.filter(pk=rule_id).update(
+            times_triggered=models.F('times_triggered') + succeeded,
+            times_succeeded=models.F('times_succeeded') + succeeded,
+            times_failed=models.F('times_failed') + failed,
+            last_triggered_at=timezone.now(),
+        )
+
 
 # Backwards compatibility alias
 CommentAutomationRule = AutomationRule
@@ -825,11 +882,16 @@ class CommentReply(models.Model):
         ('failed', 'Failed')
     ])
     
+    error_message = models.TextField("Error message", blank=True)
     sent_at = models.DateTimeField("Sent at", auto_now_add=True)
     
     class Meta:
         db_table = 'comment_replies'
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['comment', '-sent_at']),
+            models.Index(fields=['rule', 'status']),
+        ]
 
     def __str__(self):
         return f"Reply to {self.comment.comment_id}"
@@ -857,6 +919,7 @@ class DirectMessage(models.Model):
     
     status = models.CharField("Status", max_length=20, default='new', choices=[
         ('new', 'New'),
+        ('processing', 'Processing'),
         ('replied', 'Replied'),
         ('ignored', 'Ignored'),
         ('error', 'Error')
@@ -865,13 +928,17 @@ class DirectMessage(models.Model):
     is_echo = models.BooleanField("Is echo", default=False, help_text="Message sent by the page itself")
     created_time = models.DateTimeField("Platform created time")
     received_at = models.DateTimeField("Received at", auto_now_add=True)
+    claimed_at = models.DateTimeField("Claimed at", null=True, blank=True, help_text="When an automation batch claimed it")
     
     class Meta:
         db_table = 'direct_messages'
         ordering = ['-created_time']
         indexes = [
             models.Index(fields=['platform', 'conversation_id']),
-            models.Index(fields=['connection', 'status']),
+            models.Index(fields=['connection', 'status', '-created_time']),
+            models.Index(fields=['connection', '-created_time']),
+            models.Index(fields=['received_at']),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='processing'), name='direct_mess_claimed_idx'),
         ]
 
     def __str__(self):
@@ -899,11 +966,48 @@ class DirectMessageReply(models.Model):
     class Meta:
         db_table = 'direct_message_replies'
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['direct_message', '-sent_at']),
+            models.Index(fields=['rule', 'status']),
+        ]
 
     def __str__(self):
         return f"Reply to {self.direct_message.message_id}"
 
 
+class AutomationDailyStats(models.Model):
+    """Daily rollup of comment/DM automation activity per connection"""
+    CHANNEL_CHOICES = [
+        ('comment', 'Comment'),
+        ('facebook_dm', 'Facebook Messenger'),
+        ('instagram_dm', 'Instagram DM'),
+    ]
+
+    connection = models.ForeignKey(SocialMediaConnection, on_delete=models.CASCADE, related_name='automation_daily_stats')
+    date = models.DateField("Date")
+    channel = models.CharField("Channel", max_length=20, choices=CHANNEL_CHOICES)
+
+    messages_received = models.PositiveIntegerField("Messages received", default=0)
+    messages_replied = models.PositiveIntegerField("Messages replied", default=0)
+    replies_sent = models.PositiveIntegerField("Replies sent", default=0)
+    replies_failed = models.PositiveIntegerField("Replies failed", default=0)
+
+    updated_at = models.DateTimeField("Updated at", auto_now=True)
+
+    class Meta:
+        db_table = 'automation_daily_stats'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['connection', 'date', 'channel'], name='unique_automation_daily_stats')
+        ]
+        indexes = [
+            models.Index(fields=['channel', '-date']),
+        ]
+
+    def __str__(self):
+        return f"{self.connection_id} {self.channel} {self.date}"
+
+
 # STRIPE PLANS #
 
 class BillingPeriod(models.TextChoices):
@@ -960,6 +1064,66 @@ class PlanFeature(models.Model):
         return f"{self.plan.name}: {self.feature_name} = {self.feature_value}"
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_session_snapshot_on_user_change(sender, instance, **kwargs):
+    """Name fields or is_active may have changed."""
+    from django.db import transaction
+
+    from .services.session_snapshot import invalidate_user_snapshot
+
+    user_id = instance.id
+    transaction.on_commit(lambda: invalidate_user_snapshot(user_id))
+
+
+@receiver(post_save, sender=UserPermissions)
+@receiver(post_delete, sender=UserPermissions)
+def drop_session_snapshot_on_permissions_change(sender, instance, **kwargs):
+    from django.db import transaction
+
+    from .services.session_snapshot import invalidate_user_snapshot
+
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_snapshot(user_id))
+
+
+@receiver(m2m_changed, sender=UserPermissions.accessible_iframe_menu_items.through)
+def drop_session_snapshots_on_menu_access_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Menu access changed, from either side: permissions.accessible_iframe_menu_items
+    or item.users_with_access. Clears are handled before they run, while the
+    affected users can still be looked up.
+    """
+    from django.db import transaction
+
+    from .services.session_snapshot import invalidate_user_snapshots
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.user_id]
+    elif action == 'pre_clear':
+        user_ids = list(instance.users_with_access.values_list('user_id', flat=True))
+    else:
+        user_ids = list(UserPermissions.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    transaction.on_commit(lambda: invalidate_user_snapshots(user_ids))
+
+
+@receiver(post_save, sender=IframeMenuItem)
+@receiver(post_delete, sender=IframeMenuItem)
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+@receiver(post_save, sender=PlanFeature)
+@receiver(post_delete, sender=PlanFeature)
+def drop_shared_session_snapshot(sender, instance, **kwargs):
+    """The menu items and plans every session snapshot shares changed."""
+    from django.db import transaction
+
+    from .services.session_snapshot import invalidate_shared_snapshot
+
+    transaction.on_commit(invalidate_shared_snapshot)
+
+
 class SubscriptionStatus(models.TextChoices):
     INACTIVE = "INACTIVE", _("Inactive")
     ACTIVE = "ACTIVE", _("Active")
@@ -1211,21 +1375,34 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['custom_link', '-created_at']),
             models.Index(fields=['status']),
-            models.Index(fields=['order_id']),
         ]
 
     def __str__(self):
         return f"Order {self.order_id} - {self.custom_link.title or 'Product'} - {self.status}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so status changes can be detected on save
+        if 'status' in instance.__dict__:
+            instance._original_status = instance.status
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.order_id:
-            # Generate a unique order ID
-            import uuid
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            unique_id = str(uuid.uuid4())[:8].upper()
-            self.order_id = f"ORD-{timestamp}-{unique_id}"
-        super().save(*args, **kwargs)
+            # Time-ordered, so new orders are appended to the order_id index
+            from .utils import generate_order_id
+            self.order_id = generate_order_id()
+        from django.db import transaction
+        # The order stats counters are updated by post_save in this transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._original_status = self.status
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if 'status' in self.__dict__:
+            self._original_status = self.status
     
     def get_formatted_responses(self):
         """Return form responses in a readable format"""
@@ -1249,78 +1426,174 @@ class Order(models.Model):
 @receiver(post_save, sender=Order)
 def send_product_delivery_on_completion(sender, instance, created, **kwargs):
     """
-    Send product delivery email when order status changes to 'completed'.
-    Only sends email once per order to avoid duplicates.
+    Queue the product delivery email when order status changes to 'completed'.
+    Only queues once per order to avoid duplicates.
+
+    The email and follow-up sequences are sent by Celery tasks dispatched
+    after the transaction commits, so saving an order never waits on the
+    email provider.
     """
     # Import here to avoid circular imports
-    from .services.email_service import send_product_delivery_email
     import logging
 
+    from django.db import transaction
+
+    from .tasks import (
+        schedule_freebie_email_sequence,
+        schedule_optin_email_sequence,
+        send_order_delivery_email,
+    )
+
     logger = logging.getLogger(__name__)
-    logger.info(f"Order signal triggered for order {instance.order_id}: status={instance.status}, created={created}")
 
-    if instance.status == 'completed' and not created:  # Only for updates, not new orders
-        try:
-            # Check if we need to send email (avoid duplicates)
-            # We can track this by checking if the status changed to 'completed'
-            if hasattr(instance, '_original_status'):
-                logger.info(f"Order {instance.order_id} original status: {instance._original_status}, new status: {instance.status}")
-                if instance._original_status != 'completed':
-                    logger.info(f"Sending product delivery email for order {instance.order_id}")
-                    email_sent = send_product_delivery_email(instance)
-                    if email_sent:
-                        logger.info(f"Product delivery email sent successfully for order {instance.order_id}")
-                    else:
-                        logger.warning(f"Failed to send product delivery email for order {instance.order_id}")
-
-                    # Schedule follow-up email sequence for freebies
-                    if instance.custom_link.type == 'freebie':
-                        from .tasks import schedule_freebie_email_sequence
-                        logger.info(f"Scheduling freebie follow-up sequence for order {instance.order_id}")
-                        schedule_freebie_email_sequence.delay(instance.id)
-
-                    # Schedule follow-up email sequence for opt-ins
-                    if instance.custom_link.type == 'opt_in':
-                        from .tasks import schedule_optin_email_sequence
-                        logger.info(f"Scheduling opt-in follow-up sequence for order {instance.order_id}")
-                        schedule_optin_email_sequence.delay(instance.id)
-                else:
-                    logger.debug(f"Order {instance.order_id} was already completed, skipping email")
-            else:
-                # Fallback: send email if we can't track previous status
-                logger.info(f"No original status tracked, sending email for order {instance.order_id}")
-                email_sent = send_product_delivery_email(instance)
-                if email_sent:
-                    logger.info(f"Product delivery email sent successfully for order {instance.order_id}")
-                else:
-                    logger.warning(f"Failed to send product delivery email for order {instance.order_id}")
-
-        except Exception as email_error:
-            logger.error(f"Error sending product delivery email for order {instance.order_id}: {email_error}")
-    else:
-        logger.info(f"Order signal skipped for {instance.order_id}: status={instance.status}, created={created}")
+    if instance.status != 'completed' or created:  # Only for updates, not new orders
+        return
+
+    # Status loaded from the database, or written by this instance's last save
+    if not hasattr(instance, '_original_status'):
+        # Fallback: send email if we can't track previous status
+        logger.info(f"No original status tracked, queueing email for order {instance.order_id}")
+        transaction.on_commit(lambda: send_order_delivery_email.delay(instance.id))
+        return
+
+    if instance._original_status == 'completed':
+        logger.debug(f"Order {instance.order_id} was already completed, skipping email")
+        return
+
+    logger.info(f"Queueing product delivery email for order {instance.order_id}")
+    order_id = instance.id
+    link_type = instance.custom_link.type
+
+    def dispatch():
+        send_order_delivery_email.delay(order_id)
+        # Schedule follow-up email sequence for freebies and opt-ins
+        if link_type == 'freebie':
+            schedule_freebie_email_sequence.delay(order_id)
+        elif link_type == 'opt_in':
+            schedule_optin_email_sequence.delay(order_id)
 
+    transaction.on_commit(dispatch)
+
+
+@receiver(post_save, sender=Order)
+def count_order_in_stats(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the product's OrderStats counters in step with new orders and status changes."""
+    from .services.order_stats import record_order_created, record_status_change
+
+    if created:
+        record_order_created(instance)
+    elif update_fields is None or 'status' in update_fields:
+        previous_status = getattr(instance, '_original_status', None)
+        if previous_status is not None and previous_status != instance.status:
+            record_status_change(instance.custom_link_id, previous_status, instance.status)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_stats(sender, instance, **kwargs):
+    from .services.order_stats import record_order_deleted
+    record_order_deleted(instance)
+
+
+class OrderStats(models.Model):
+    """Order counters of one product (CustomLink), maintained as orders change."""
+    custom_link = models.OneToOneField(CustomLink, on_delete=models.CASCADE, related_name='order_stats')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_stats', help_text="Owner of the product")
+
+    total_orders = models.IntegerField(_("total orders"), default=0)
+    pending_orders = models.IntegerField(_("pending orders"), default=0)
+    completed_orders = models.IntegerField(_("completed orders"), default=0)
+    cancelled_orders = models.IntegerField(_("cancelled orders"), default=0)
+
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        db_table = "order_stats"
+        verbose_name = _("order stats")
+        verbose_name_plural = _("order stats")
+
+    def __str__(self):
+        return f"{self.custom_link_id}: {self.total_orders} orders"
+
+
+class OrderDailyStats(models.Model):
+    """Orders created per product and day"""
+    custom_link = models.ForeignKey(CustomLink, on_delete=models.CASCADE, related_name='order_daily_stats')
+    date = models.DateField(_("date"))
+    orders = models.IntegerField(_("orders"), default=0)
+
+    class Meta:
+        db_table = "order_daily_stats"
+        verbose_name = _("order daily stats")
+        verbose_name_plural = _("order daily stats")
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['custom_link', 'date'], name='unique_order_daily_stats')
+        ]
+
+    def __str__(self):
+        return f"{self.custom_link_id} {self.date}: {self.orders} orders"
 
-# Add status tracking for Order model
-@receiver(models.signals.pre_save, sender=Order)
-def track_order_status_change(sender, instance, **kwargs):
+
+def get_export_storage():
+    """The 'exports' storage of settings.STORAGES, shared by the API and the worker."""
+    return storages['exports']
+
+
+class DataExport(models.Model):
     """
-    Track the original status before saving to detect status changes.
+    A background export of a user's orders or collect info responses to a
+    CSV or Parquet file.
     """
-    import logging
-    logger = logging.getLogger(__name__)
+    EXPORT_TYPE_CHOICES = [
+        ('orders', 'Orders'),
+        ('collect_info_responses', 'Collect Info Responses'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
 
-    if instance.pk:
-        try:
-            original_order = sender.objects.get(pk=instance.pk)
-            instance._original_status = original_order.status
-            logger.info(f"Order {instance.order_id} pre_save: original_status={original_order.status}, new_status={instance.status}")
-        except sender.DoesNotExist:
-            instance._original_status = None
-            logger.info(f"Order {instance.order_id} pre_save: original order not found")
-    else:
-        instance._original_status = None
-        logger.info(f"Order {instance.order_id} pre_save: new order, no original status")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    export_type = models.CharField(_("export type"), max_length=30, choices=EXPORT_TYPE_CHOICES)
+    file_format = models.CharField(_("file format"), max_length=10, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(_("filters"), default=dict, blank=True, help_text="custom_link_id and, for orders, status")
+
+    status = models.CharField(_("status"), max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.IntegerField(_("total rows"), default=0)
+    exported_rows = models.IntegerField(_("exported rows"), default=0)
+    file = models.FileField(_("file"), upload_to='exports/', storage=get_export_storage, blank=True, max_length=255)
+    error_message = models.TextField(_("error message"), blank=True)
+
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    started_at = models.DateTimeField(_("started at"), null=True, blank=True)
+    completed_at = models.DateTimeField(_("completed at"), null=True, blank=True)
+
+    class Meta:
+        db_table = "data_exports"
+        verbose_name = _("data export")
+        verbose_name_plural = _("data exports")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.export_type} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of rows written"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.exported_rows * 100 / self.total_rows))
 
 
 class AIConfiguration(models.Model):
@@ -1523,6 +1796,47 @@ class StripeConnectAccount(models.Model):
         return int(fee_decimal.quantize(Decimal('1'), rounding=ROUND_UP))
 
 
+@receiver(post_save, sender=CustomLink)
+def refresh_checkout_context_on_link_save(sender, instance, **kwargs):
+    """
+    Drop the link's cached checkout context, and queue a refresh of its
+    pre-created Stripe price when that is enabled.
+    """
+    from django.conf import settings
+    from django.db import transaction
+
+    from .services.checkout_context import invalidate_checkout_context
+
+    link_id = instance.id
+    transaction.on_commit(lambda: invalidate_checkout_context(link_id))
+
+    if getattr(settings, 'STRIPE_PRECREATE_PRICES', False) and instance.checkout_price and instance.checkout_price > 0:
+        from .tasks import sync_custom_link_stripe_price
+        transaction.on_commit(lambda: sync_custom_link_stripe_price.delay(instance.id))
+
+
+@receiver(post_delete, sender=CustomLink)
+def drop_checkout_context_on_link_delete(sender, instance, **kwargs):
+    from django.db import transaction
+
+    from .services.checkout_context import invalidate_checkout_context
+
+    link_id = instance.id
+    transaction.on_commit(lambda: invalidate_checkout_context(link_id))
+
+
+@receiver(post_save, sender=StripeConnectAccount)
+@receiver(post_delete, sender=StripeConnectAccount)
+def drop_checkout_contexts_on_account_change(sender, instance, **kwargs):
+    """Charges status, currency or fee may have changed for every link of the seller."""
+    from django.db import transaction
+
+    from .services.checkout_context import invalidate_seller_checkout_contexts
+
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_seller_checkout_contexts(user_id))
+
+
 class PaymentTransaction(models.Model):
     """
     Records payment transactions for products sold through the platform.
@@ -1605,6 +1919,85 @@ class PaymentTransaction(models.Model):
         """Get formatted platform earnings"""
         return f"${self.platform_fee / 100:.2f} {self.currency.upper()}"
 
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+
+        from .services.earnings_ledger import (
+            locked_transaction_state,
+            record_transaction_change,
+        )
+
+        # The seller's earnings ledger moves in the same transaction as the row
+        with transaction.atomic():
+            previous = locked_transaction_state(self.pk) if self.pk else None
+            super().save(*args, **kwargs)
+            record_transaction_change(previous, locked_transaction_state(self.pk))
+
+
+@receiver(post_delete, sender=PaymentTransaction)
+def remove_transaction_from_earnings_ledger(sender, instance, **kwargs):
+    from .services.earnings_ledger import record_transaction_change, transaction_state
+    record_transaction_change(transaction_state(instance), None)
+
+
+class SellerEarningsLedger(models.Model):
+    """
+    Running earnings totals of a Connect account, maintained incrementally
+    from its PaymentTransactions. All amounts are in cents.
+    """
+    connect_account = models.OneToOneField(StripeConnectAccount, on_delete=models.CASCADE, related_name='earnings_ledger')
+
+    # Every transaction, whatever its status
+    transaction_count = models.IntegerField(_("transaction count"), default=0)
+    gross_amount = models.BigIntegerField(_("gross amount"), default=0)
+    platform_fee_amount = models.BigIntegerField(_("platform fee amount"), default=0)
+
+    # Totals by status
+    succeeded_count = models.IntegerField(_("succeeded count"), default=0)
+    succeeded_amount = models.BigIntegerField(_("succeeded amount"), default=0)
+    seller_earned_amount = models.BigIntegerField(_("seller earned amount"), default=0, help_text="Seller share of succeeded transactions")
+    failed_count = models.IntegerField(_("failed count"), default=0)
+    refunded_count = models.IntegerField(_("refunded count"), default=0, help_text="Fully or partially refunded transactions")
+    refunded_amount = models.BigIntegerField(_("refunded amount"), default=0)
+    pending_payout_amount = models.BigIntegerField(_("pending payout amount"), default=0, help_text="Seller share of succeeded transactions not yet transferred")
+
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        db_table = "seller_earnings_ledgers"
+        verbose_name = _("seller earnings ledger")
+        verbose_name_plural = _("seller earnings ledgers")
+
+    def __str__(self):
+        return f"Earnings of {self.connect_account_id}: {self.succeeded_count} sales"
+
+
+class SellerEarningsDay(models.Model):
+    """
+    Paid sales of a Connect account for one day (the day of payment).
+    All amounts are in cents.
+    """
+    connect_account = models.ForeignKey(StripeConnectAccount, on_delete=models.CASCADE, related_name='earnings_days')
+    date = models.DateField(_("date"))
+
+    sales_count = models.IntegerField(_("sales count"), default=0)
+    sales_amount = models.BigIntegerField(_("sales amount"), default=0)
+    platform_fee_amount = models.BigIntegerField(_("platform fee amount"), default=0)
+    seller_amount = models.BigIntegerField(_("seller amount"), default=0)
+    refunded_amount = models.BigIntegerField(_("refunded amount"), default=0)
+
+    class Meta:
+        db_table = "seller_earnings_days"
+        verbose_name = _("seller earnings day")
+        verbose_name_plural = _("seller earnings days")
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['connect_account', 'date'], name='unique_earnings_day')
+        ]
+
+    def __str__(self):
+        return f"{self.connect_account_id} {self.date}: {self.sales_count} sales"
+
 
 class ConnectWebhookEvent(models.Model):
     """
@@ -1635,6 +2028,17 @@ class ConnectWebhookEvent(models.Model):
     data = models.JSONField(_("event data"))
     processed = models.BooleanField(_("processed"), default=False)
     error_message = models.TextField(_("error message"), blank=True)
+
+    # Inbox: events are stored on receipt and handled by a worker
+    payload = models.JSONField(_("event payload"), null=True, blank=True, help_text="Full event as delivered by Stripe")
+    object_key = models.CharField(
+        _("object key"),
+        max_length=255,
+        blank=True,
+        help_text="Stripe object the event is about; events for the same object are handled one at a time, in order"
+    )
+    stripe_created = models.BigIntegerField(_("Stripe created"), null=True, blank=True, help_text="Event creation time (Unix seconds)")
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0)
     
     # Timestamps
     created_at = models.DateTimeField(_("created at"), auto_now_add=True)
@@ -1649,6 +2053,11 @@ class ConnectWebhookEvent(models.Model):
             models.Index(fields=['stripe_event_id']),
             models.Index(fields=['event_type']),
             models.Index(fields=['processed', '-created_at']),
+            models.Index(
+                fields=['object_key', 'stripe_created', 'id'],
+                condition=models.Q(processed=False),
+                name='connect_event_inbox_pending',
+            ),
         ]
     
     def __str__(self):
@@ -1706,11 +2115,14 @@ class ScheduledFollowupEmail(models.Model):
     Track scheduled follow-up emails for freebie orders.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='followup_emails')
+    # Copied from the order, lowercased, so enrollment checks hit an index instead of joining orders
+    customer_email = models.EmailField(_("customer email"), blank=True)
     email_template = models.ForeignKey(FreebieFollowupEmail, on_delete=models.CASCADE)
     scheduled_for = models.DateTimeField(_("scheduled for"), help_text="Exact datetime to send email")
     sent = models.BooleanField(_("sent"), default=False)
     sent_at = models.DateTimeField(_("sent at"), null=True, blank=True)
     error_message = models.TextField(_("error message"), blank=True)
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0, help_text="Failed send attempts so far")
     created_at = models.DateTimeField(_("created at"), auto_now_add=True)
 
     class Meta:
@@ -1721,6 +2133,11 @@ class ScheduledFollowupEmail(models.Model):
         indexes = [
             models.Index(fields=['sent', 'scheduled_for']),
             models.Index(fields=['order']),
+            models.Index(
+                fields=['customer_email'],
+                condition=models.Q(sent=False),
+                name='sched_followup_active_email',
+            ),
         ]
 
     def __str__(self):
@@ -1756,11 +2173,14 @@ class ScheduledOptinEmail(models.Model):
     Track scheduled follow-up emails for opt-in orders.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='optin_followup_emails')
+    # Copied from the order, lowercased, so enrollment checks hit an index instead of joining orders
+    customer_email = models.EmailField(_("customer email"), blank=True)
     email_template = models.ForeignKey(OptinFollowupEmail, on_delete=models.CASCADE)
     scheduled_for = models.DateTimeField(_("scheduled for"), help_text="Exact datetime to send email")
     sent = models.BooleanField(_("sent"), default=False)
     sent_at = models.DateTimeField(_("sent at"), null=True, blank=True)
     error_message = models.TextField(_("error message"), blank=True)
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0, help_text="Failed send attempts so far")
     created_at = models.DateTimeField(_("created at"), auto_now_add=True)
 
     class Meta:
@@ -1771,6 +2191,11 @@ class ScheduledOptinEmail(models.Model):
         indexes = [
             models.Index(fields=['sent', 'scheduled_for']),
             models.Index(fields=['order']),
+            models.Index(
+                fields=['customer_email'],
+                condition=models.Q(sent=False),
+                name='sched_optin_active_email',
+            ),
         ]
 
     def __str__(self):
@@ -1793,6 +2218,30 @@ class EmailAccount(models.Model):
     token_expiry = models.DateTimeField(_("token expiry"), null=True, blank=True)
     is_active = models.BooleanField(_("is active"), default=True)
     last_synced = models.DateTimeField(_("last synced"), null=True, blank=True)
+    history_id = models.CharField(
+        _("history ID"),
+        max_length=32,
+        blank=True,
+        help_text="Gmail historyId the mailbox was last synced to; empty until the first full sync"
+    )
+    sync_interval_minutes = models.PositiveSmallIntegerField(
+        _("sync interval (minutes)"),
+        default=5,
+        help_text="Adapted to mailbox activity: shorter for busy inboxes, longer for quiet ones"
+    )
+    next_sync_at = models.DateTimeField(_("next sync at"), null=True, blank=True)
+    inbox_opened_at = models.DateTimeField(
+        _("inbox opened at"),
+        null=True,
+        blank=True,
+        help_text="Last time the user viewed the inbox; dormant inboxes are not polled"
+    )
+    watch_expires_at = models.DateTimeField(
+        _("push watch expires at"),
+        null=True,
+        blank=True,
+        help_text="Gmail push notifications (users.watch) are active until this time"
+    )
     created_at = models.DateTimeField(_("created at"), auto_now_add=True)
     modified_at = models.DateTimeField(_("modified at"), auto_now=True)
 
@@ -1802,6 +2251,9 @@ class EmailAccount(models.Model):
         verbose_name_plural = _("Email Accounts")
         unique_together = [['user', 'email_address']]
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'next_sync_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.email_address}"
@@ -1827,8 +2279,18 @@ class EmailMessage(models.Model):
     is_starred = models.BooleanField(_("is starred"), default=False)
     has_attachments = models.BooleanField(_("has attachments"), default=False)
     labels = models.JSONField(_("labels"), default=list, blank=True)
+    body_fetched_at = models.DateTimeField(
+        _("body fetched at"),
+        null=True,
+        blank=True,
+        help_text="When the body and attachments were downloaded; sync only stores headers"
+    )
+    search_vector = SearchVectorField(_("search vector"), null=True, editable=False)
     created_at = models.DateTimeField(_("created at"), auto_now_add=True)
 
+    # Text search configuration used for indexing and querying
+    SEARCH_CONFIG = 'english'
+
     class Meta:
         db_table = "email_messages"
         verbose_name = _("Email Message")
@@ -1840,11 +2302,27 @@ class EmailMessage(models.Model):
             models.Index(fields=['message_id']),
             models.Index(fields=['thread_id']),
             models.Index(fields=['is_read']),
+            GinIndex(fields=['search_vector'], name='email_messages_search_gin'),
         ]
 
     def __str__(self):
         return f"{self.subject[:50]} - {self.from_email}"
 
+    @classmethod
+    def refresh_search_vectors(cls, queryset) -> int:
+        """
+        Recompute the search vector of the given messages in one UPDATE.
+
+        Subject ranks highest, then sender, snippet and body.
+        """
+        config = cls.SEARCH_CONFIG
+        return queryset.update(search_vector=(
+            SearchVector('subject', weight='A', config=config)
+            + SearchVector('from_name', 'from_email', weight='B', config=config)
+            + SearchVector('snippet', weight='C', config=config)
+            + SearchVector('body_text', weight='D', config=config)
+        ))
+
 
 class EmailAttachment(models.Model):
     """
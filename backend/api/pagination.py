@@ -0,0 +1,34 @@
+"""
+Cursor pagination for time-ordered listings.
+
+Page number pagination runs a COUNT(*) and an OFFSET scan for every page,
+so deep pages of a large inbox get slower as it grows. These classes page
+by position on the time column instead: each page is a `WHERE time < cursor
+ORDER BY time DESC, id DESC LIMIT n`, served by the (owner, -time) indexes,
+and no total count is computed. The id tie-breaker keeps the order stable;
+an offset is only used to step over rows sharing the cursor's exact timestamp.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class TimeCursorPagination(CursorPagination):
+    """Base cursor pagination, newest first."""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class CreatedTimeCursorPagination(TimeCursorPagination):
+    """Comments and direct messages, by platform created time."""
+    ordering = ('-created_time', '-id')
+
+
+class SentAtCursorPagination(TimeCursorPagination):
+    """Comment and DM replies, by send time."""
+    ordering = ('-sent_at', '-id')
+
+
+class EmailCursorPagination(TimeCursorPagination):
+    """Email messages, by received time."""
+    page_size = 50
+    ordering = ('-received_at', '-id')
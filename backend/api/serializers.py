@@ -7,7 +7,7 @@ from rest_framework import exceptions, serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.db.models import Q
 
-from .models import UserProfile, UserSocialLinks, UserPermissions, SocialIcon, IframeMenuItem, CustomLink, CollectInfoField, CollectInfoResponse, CTABanner, SocialMediaPlatform, SocialMediaConnection, SocialMediaPost, SocialMediaPostTemplate, Plan, PlanFeature, Subscription, Folder, Media, ProfileView, LinkClick, Comment, AutomationRule, AutomationSettings, CommentReply, DirectMessage, DirectMessageReply, Order, StripeConnectAccount, PaymentTransaction, ConnectWebhookEvent, MiloPrompt, EmailAccount, EmailMessage, EmailAttachment, EmailDraft, SystemConfig
+from .models import UserProfile, UserSocialLinks, UserPermissions, SocialIcon, IframeMenuItem, CustomLink, CollectInfoField, CollectInfoResponse, CTABanner, SocialMediaPlatform, SocialMediaConnection, SocialMediaPost, SocialMediaPostTemplate, Plan, PlanFeature, Subscription, Folder, Media, ProfileView, LinkClick, Comment, AutomationRule, AutomationSettings, CommentReply, DirectMessage, DirectMessageReply, Order, StripeConnectAccount, PaymentTransaction, ConnectWebhookEvent, MiloPrompt, EmailAccount, EmailMessage, EmailAttachment, EmailDraft, SystemConfig, DataExport
 
 # Backwards compatibility aliases
 CommentAutomationRule = AutomationRule
@@ -1478,6 +1478,8 @@ class CommentListSerializer(serializers.ModelSerializer):
         ]
     
     def get_replies_count(self, obj):
+        if hasattr(obj, 'reply_total'):
+            return obj.reply_total
         return obj.replies.count()
 
 
@@ -1499,9 +1501,12 @@ class CommentAutomationRuleSerializer(serializers.ModelSerializer):
             'priority',
             'connection_name',
             'times_triggered',
+            'times_succeeded',
+            'times_failed',
+            'last_triggered_at',
             'created_at'
         ]
-        read_only_fields = ['id', 'times_triggered', 'created_at']
+        read_only_fields = ['id', 'times_triggered', 'times_succeeded', 'times_failed', 'last_triggered_at', 'created_at']
     
     def validate_keywords(self, value):
         """Validate that keywords is a list of strings"""
@@ -1693,6 +1698,7 @@ class CommentReplySerializer(serializers.ModelSerializer):
             'reply_text',
             'facebook_reply_id',
             'status',
+            'error_message',
             'sent_at',
             'comment_message',
             'comment_from',
@@ -1783,6 +1789,8 @@ class DirectMessageListSerializer(serializers.ModelSerializer):
     
     def get_replies_count(self, obj):
         """Get count of replies for this direct message."""
+        if hasattr(obj, 'reply_total'):
+            return obj.reply_total
         return obj.replies.count()
 
 
@@ -1860,12 +1868,15 @@ class AutomationRuleSerializer(serializers.ModelSerializer):
             'is_active',
             'priority',
             'times_triggered',
+            'times_succeeded',
+            'times_failed',
+            'last_triggered_at',
             'created_at',
             'connection',
             'connection_name',
             'platform_name'
         ]
-        read_only_fields = ['id', 'times_triggered', 'created_at']
+        read_only_fields = ['id', 'times_triggered', 'times_succeeded', 'times_failed', 'last_triggered_at', 'created_at']
 
 
 class AutomationRuleCreateSerializer(serializers.ModelSerializer):
@@ -2269,6 +2280,15 @@ class ConnectEarningsSerializer(serializers.Serializer):
     failed_transactions = serializers.IntegerField(help_text="Number of failed transactions")
 
 
+class ConnectDailyEarningsSerializer(serializers.Serializer):
+    """Serializer for one day of Connect earnings"""
+    date = serializers.DateField()
+    sales_count = serializers.IntegerField(help_text="Number of paid sales")
+    sales = serializers.DecimalField(max_digits=12, decimal_places=2, help_text="Amount paid by customers")
+    seller_earnings = serializers.DecimalField(max_digits=12, decimal_places=2, help_text="Seller share of the sales")
+    refunded = serializers.DecimalField(max_digits=12, decimal_places=2, help_text="Amount refunded")
+
+
 class ConnectWebhookEventSerializer(serializers.ModelSerializer):
     """Serializer for Connect webhook events"""
     account_username = serializers.CharField(source='connect_account.user.username', read_only=True, allow_null=True)
@@ -2361,6 +2381,15 @@ class EmailMessageListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'message_id', 'received_at']
 
 
+class EmailSearchResultSerializer(EmailMessageListSerializer):
+    """Email search hit with its rank and a highlighted excerpt"""
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(EmailMessageListSerializer.Meta):
+        fields = EmailMessageListSerializer.Meta.fields + ['rank', 'headline']
+
+
 class EmailDraftSerializer(serializers.ModelSerializer):
     """Serializer for email drafts"""
     account_email = serializers.EmailField(source='account.email_address', read_only=True)
@@ -2467,9 +2496,79 @@ class IframeMenuItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'modified_at']
 
 
+class SessionSnapshotUserSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+
+
+class SessionSnapshotSerializer(serializers.Serializer):
+    """Schema of the cached dashboard session snapshot"""
+    version = serializers.CharField(help_text="Changes whenever any part of the snapshot changes; also sent as the ETag")
+    me = SessionSnapshotUserSerializer()
+    permissions = UserPermissionsSerializer(allow_null=True)
+    iframe_menu_items = IframeMenuItemSerializer(many=True)
+    plans = PlanSerializer(many=True)
+
+
 class SystemConfigSerializer(serializers.ModelSerializer):
     """Serializer for system configuration"""
     class Meta:
         model = SystemConfig
         fields = ['id', 'checkout_url', 'created_at', 'modified_at']
         read_only_fields = ['id', 'created_at', 'modified_at']
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    """Serializer for background order and lead exports"""
+    progress = serializers.IntegerField(read_only=True, help_text="Percentage of rows written")
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DataExport
+        fields = [
+            'id', 'export_type', 'file_format', 'filters', 'status',
+            'total_rows', 'exported_rows', 'progress', 'download_url',
+            'error_message', 'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'total_rows', 'exported_rows', 'error_message',
+            'created_at', 'started_at', 'completed_at'
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.file:
+            return None
+        from django.urls import reverse
+        url = reverse('api-exports-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_file_format(self, value):
+        from .services.data_export import parquet_available
+        if value == 'parquet' and not parquet_available():
+            raise serializers.ValidationError("Parquet exports are not available on this server")
+        return value
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Filters must be an object")
+        unknown = set(value) - {'custom_link_id', 'status'}
+        if unknown:
+            raise serializers.ValidationError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        status = value.get('status')
+        if status and status not in dict(Order.ORDER_STATUS_CHOICES):
+            raise serializers.ValidationError("Invalid order status")
+
+        custom_link_id = value.get('custom_link_id')
+        if custom_link_id is not None and not isinstance(custom_link_id, int):
+            raise serializers.ValidationError("custom_link_id must be a number")
+        if custom_link_id:
+            user = self.context['request'].user
+            links = CustomLink.objects.filter(pk=custom_link_id)
+            if not user.is_staff:
+                links = links.filter(user_profile__user=user)
+            if not links.exists():
+                raise serializers.ValidationError("Product not found")
+        return value
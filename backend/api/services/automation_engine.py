@@ -0,0 +1,386 @@
+"""
+Automation Engine for processing comment and DM bursts in micro-batches
+
+A batch first claims its messages: it locks the connection's pending rows
+with SELECT ... FOR UPDATE SKIP LOCKED and moves them to 'processing' (with
+claimed_at) in one transaction, so no other batch can pick them up. Replies
+and message statuses are buffered and written with one bulk insert and a
+few updates every FLUSH_EVERY sends. If a worker dies mid-batch, at most
+FLUSH_EVERY sent replies go unrecorded and nothing is sent twice: claimed
+rows are never reclaimed, and expire_stale_claims() (run by Celery Beat)
+marks rows left 'processing' for CLAIM_TIMEOUT as 'error'.
+
+Claims hold at most BATCH_SIZE messages, so a batch paced at
+REPLIES_PER_SECOND keeps its worker for seconds rather than minutes; the
+batch task re-queues itself while the burst fills whole claims.
+
+Only messages received within AUTOMATION_PENDING_MAX_AGE are answered.
+Older pending rows (for example DMs stored while automation was off) are
+marked 'ignored' instead of getting a late reply.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (
+    AutomationRule,
+    AutomationSettings,
+    Comment,
+    CommentReply,
+    DirectMessage,
+    DirectMessageReply,
+    SocialMediaConnection,
+)
+from .integrations.meta_service import MetaService
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'AUTOMATION_BATCH_SIZE', 100)
+REPLIES_PER_SECOND = getattr(settings, 'AUTOMATION_REPLIES_PER_SECOND', 10)
+PENDING_MAX_AGE = getattr(settings, 'AUTOMATION_PENDING_MAX_AGE', 3600)
+CLAIM_TIMEOUT = getattr(settings, 'AUTOMATION_CLAIM_TIMEOUT', 600)
+
+# Sends between writes of buffered replies and statuses
+FLUSH_EVERY = 50
+
+
+class CompiledRuleMatcher:
+    """
+    Matches message text against a connection's rules in priority order.
+
+    Keywords of each rule are compiled once into a single case-insensitive
+    pattern, so matching a whole batch does not rebuild them per message.
+    """
+
+    def __init__(self, rules: list[AutomationRule]):
+        self._compiled = []
+        for rule in rules:
+            keywords = [str(keyword).lower() for keyword in (rule.keywords or []) if keyword]
+            if not keywords:
+                continue
+            pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+            self._compiled.append((rule, pattern))
+
+    def match(self, text: str) -> AutomationRule | None:
+        """
+        Return the first rule (by priority) with a keyword contained in text.
+        """
+        if not text:
+            return None
+        text = text.lower()
+        for rule, pattern in self._compiled:
+            if pattern.search(text):
+                return rule
+        return None
+
+
+class RateLimitedSender:
+    """
+    Sends replies through one MetaService instance, paced to a maximum rate.
+    """
+
+    def __init__(self, connection: SocialMediaConnection, per_second: int | None = None):
+        if per_second is None:
+            per_second = REPLIES_PER_SECOND
+        self.connection = connection
+        self.meta_service = MetaService(connection)
+        self.min_interval = 1.0 / per_second if per_second else 0
+        self._last_sent = 0.0
+
+    def _wait(self):
+        if self.min_interval:
+            elapsed = time.monotonic() - self._last_sent
+            if elapsed < self.min_interval:
+                time.sleep(self.min_interval - elapsed)
+        self._last_sent = time.monotonic()
+
+    def reply_to_comment(self, comment: Comment, reply_text: str) -> dict[str, Any]:
+        self._wait()
+        try:
+            return self.meta_service.reply_to_comment(comment.comment_id, reply_text, self.connection)
+        except Exception as e:
+            logger.error(f"Error sending reply to comment {comment.comment_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def reply_to_dm(self, dm: DirectMessage, reply_text: str) -> dict[str, Any]:
+        self._wait()
+        try:
+            if dm.platform == 'facebook':
+                return self.meta_service.reply_to_facebook_dm(dm.conversation_id, reply_text, self.connection)
+            if dm.platform == 'instagram':
+                return self.meta_service.reply_to_instagram_dm(dm.conversation_id, reply_text, self.connection)
+            return {'success': False, 'error': f'Unsupported platform: {dm.platform}'}
+        except Exception as e:
+            logger.error(f"Error sending DM reply to {dm.message_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+
+def _batch_cache_key(kind: str, connection_id: int) -> str:
+    return f"automation_batch:{kind}:{connection_id}"
+
+
+def schedule_batch(task, kind: str, connection_id: int, window_seconds: int) -> bool:
+    """
+    Schedule one batch task per connection for the current window.
+
+    The first message of a window enqueues the batch task with a countdown
+    equal to the window; later messages in the same window are picked up
+    by that task because it selects every pending message when it runs.
+
+    Returns:
+        bool: True if a new batch task was enqueued
+    """
+    window_seconds = max(int(window_seconds or 0), 1)
+    if not cache.add(_batch_cache_key(kind, connection_id), True, window_seconds):
+        return False
+    task.apply_async(args=[connection_id], countdown=window_seconds)
+    return True
+
+
+def acquire_batch_lock(kind: str, connection_id: int, timeout: int = 600) -> bool:
+    """Prevent two batch tasks from processing the same connection at once."""
+    return cache.add(f"{_batch_cache_key(kind, connection_id)}:lock", True, timeout)
+
+
+def release_batch_lock(kind: str, connection_id: int):
+    cache.delete(f"{_batch_cache_key(kind, connection_id)}:lock")
+
+
+def _apply_status_updates(model, status_by_id: dict[int, str]):
+    ids_by_status: dict[str, list[int]] = {}
+    for object_id, status in status_by_id.items():
+        ids_by_status.setdefault(status, []).append(object_id)
+    for status, ids in ids_by_status.items():
+        model.objects.filter(id__in=ids).update(status=status)
+
+
+class BatchResults:
+    """
+    Replies, message statuses and rule outcomes of a batch, written in bulk
+    every FLUSH_EVERY sends and once more at the end.
+    """
+
+    def __init__(self, model, reply_model):
+        self.model = model
+        self.reply_model = reply_model
+        self.counts = Counter()
+        self._replies = []
+        self._statuses: dict[int, str] = {}
+        self._outcomes: dict[int, Counter] = {}
+
+    def ignore(self, message):
+        self._set_status(message, 'ignored')
+
+    def add_reply(self, message, reply, rule):
+        self._replies.append(reply)
+        self._set_status(message, 'replied' if reply.status == 'sent' else 'error')
+        if rule:
+            self._outcomes.setdefault(rule.id, Counter())[reply.status] += 1
+        if len(self._replies) >= FLUSH_EVERY:
+            self.flush()
+
+    def _set_status(self, message, status):
+        self._statuses[message.id] = status
+        self.counts[status] += 1
+
+    def flush(self):
+        if self._replies:
+            self.reply_model.objects.bulk_create(self._replies)
+        _apply_status_updates(self.model, self._statuses)
+        for rule_id, counts in self._outcomes.items():
+            AutomationRule.record_outcomes(rule_id, succeeded=counts['sent'], failed=counts['failed'])
+        self._replies, self._statuses, self._outcomes = [], {}, {}
+
+
+def _claim_pending(model, connection_id: int, batch_size: int) -> list[Any]:
+    """
+    Claim up to batch_size pending messages of a connection for this batch.
+
+    Rows locked by a concurrent batch are skipped, and pending rows older
+    than PENDING_MAX_AGE are marked 'ignored'.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        model.objects.filter(
+            connection_id=connection_id, status='new', received_at__lt=now - timedelta(seconds=PENDING_MAX_AGE)
+        ).update(status='ignored')
+        claimed = list(
+            model.objects.filter(connection_id=connection_id, status='new')
+            .select_related('connection').select_for_update(skip_locked=True, of=('self',))
+            .order_by('created_time')[:batch_size]
+        )
+        model.objects.filter(id__in=[obj.id for obj in claimed]).update(status='processing', claimed_at=now)
+    return claimed
+
+
+def expire_stale_claims() -> int:
+    """
+    Mark messages left 'processing' for CLAIM_TIMEOUT by a batch that never
+    finished as 'error'. They are not returned to 'new', as their reply may
+    have been sent before the worker died.
+
+    Returns:
+        int: Number of messages expired
+    """
+    cutoff = timezone.now() - timedelta(seconds=CLAIM_TIMEOUT)
+    expired = 0
+    for model in (Comment, DirectMessage):
+        expired += model.objects.filter(status='processing', claimed_at__lt=cutoff).update(status='error')
+    if expired:
+        logger.warning(f"Expired {expired} automation messages left processing by an unfinished batch")
+    return expired
+
+
+def _summary(kind: str, connection_id: int, processed: int, results: BatchResults) -> dict[str, Any]:
+    logger.info(f"Processed {kind} batch for connection {connection_id}: {dict(results.counts)}")
+    return {
+        'processed': processed,
+        'replied': results.counts['replied'],
+        'ignored': results.counts['ignored'],
+        'failed': results.counts['error'],
+    }
+
+
+def process_comment_batch(connection_id: int, batch_size: int = BATCH_SIZE) -> dict[str, Any]:
+    """
+    Process the pending comments of a connection as one batch.
+
+    Args:
+        connection_id: ID of the SocialMediaConnection
+        batch_size: Maximum number of comments to process
+
+    Returns:
+        dict: Counts of replied, ignored and failed comments
+    """
+    comments = _claim_pending(Comment, connection_id, batch_size)
+    if not comments:
+        return {'processed': 0, 'replied': 0, 'ignored': 0, 'failed': 0}
+
+    results = BatchResults(Comment, CommentReply)
+    settings_obj = AutomationSettings.objects.filter(connection_id=connection_id).first()
+    if not settings_obj or not settings_obj.is_enabled:
+        for comment in comments:
+            results.ignore(comment)
+        results.flush()
+        return _summary('comment', connection_id, len(comments), results)
+
+    # Comment rules are matched whatever their message type, as they always were
+    matcher = CompiledRuleMatcher(list(
+        AutomationRule.objects.filter(
+            connection_id=connection_id,
+            is_active=True
+        ).order_by('-priority', 'rule_name')
+    ))
+    sender = RateLimitedSender(comments[0].connection)
+
+    try:
+        for comment in comments:
+            # Skip comments from the page itself
+            if comment.from_user_id and comment.page_id == comment.from_user_id:
+                results.ignore(comment)
+                continue
+
+            rule = matcher.match(comment.message)
+            reply_text = rule.reply_template if rule else settings_obj.default_reply
+            if not reply_text:
+                results.ignore(comment)
+                continue
+
+            result = sender.reply_to_comment(comment, reply_text)
+            if result.get('success'):
+                reply = CommentReply(
+                    comment=comment,
+                    rule=rule,
+                    reply_text=reply_text,
+                    facebook_reply_id=result.get('reply_id', '') or '',
+                    status='sent'
+                )
+            else:
+                reply = CommentReply(
+                    comment=comment,
+                    rule=rule,
+                    reply_text=reply_text,
+                    status='failed',
+                    error_message=result.get('error', 'Unknown error')
+                )
+            results.add_reply(comment, reply, rule)
+    finally:
+        results.flush()
+
+    return _summary('comment', connection_id, len(comments), results)
+
+
+def process_dm_batch(connection_id: int, batch_size: int = BATCH_SIZE) -> dict[str, Any]:
+    """
+    Process the pending direct messages of a connection as one batch.
+
+    Args:
+        connection_id: ID of the SocialMediaConnection
+        batch_size: Maximum number of messages to process
+
+    Returns:
+        dict: Counts of replied, ignored and failed messages
+    """
+    messages = _claim_pending(DirectMessage, connection_id, batch_size)
+    if not messages:
+        return {'processed': 0, 'replied': 0, 'ignored': 0, 'failed': 0}
+
+    results = BatchResults(DirectMessage, DirectMessageReply)
+    settings_obj = AutomationSettings.objects.filter(connection_id=connection_id).first()
+    if not settings_obj or not settings_obj.enable_dm_automation:
+        for dm in messages:
+            results.ignore(dm)
+        results.flush()
+        return _summary('DM', connection_id, len(messages), results)
+
+    matcher = CompiledRuleMatcher(list(
+        AutomationRule.objects.filter(
+            connection_id=connection_id,
+            is_active=True,
+            message_type__in=['dm', 'both']
+        ).order_by('-priority')
+    ))
+    sender = RateLimitedSender(messages[0].connection)
+
+    try:
+        for dm in messages:
+            if dm.is_echo:
+                results.ignore(dm)
+                continue
+
+            rule = matcher.match(dm.message_text)
+            reply_text = rule.reply_template if rule else settings_obj.dm_default_reply
+            if not reply_text:
+                results.ignore(dm)
+                continue
+
+            result = sender.reply_to_dm(dm, reply_text)
+            if result.get('success'):
+                reply = DirectMessageReply(
+                    direct_message=dm,
+                    rule=rule,
+                    reply_text=reply_text,
+                    platform_reply_id=result.get('reply_id', '') or '',
+                    status='sent'
+                )
+            else:
+                reply = DirectMessageReply(
+                    direct_message=dm,
+                    rule=rule,
+                    reply_text=reply_text,
+                    status='failed',
+                    error_message=result.get('error', 'Unknown error')
+                )
+            results.add_reply(dm, reply, rule)
+    finally:
+        results.flush()
+
+    return _summary('DM', connection_id, len(messages), results)
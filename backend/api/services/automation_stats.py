@@ -0,0 +1,323 @@
+"""
+Automation statistics for the comment and DM dashboards.
+
+Completed days are read from the AutomationDailyStats rollup; only the
+last two days are aggregated live, so the cost of a dashboard load does
+not grow with the comment history.
+
+Messages are bucketed by the day they were received (received_at) and
+replies by the day they were sent, so a message delivered late by the
+webhook still lands in a day the rollup recomputes. The periodic rollup
+only recomputes the last two days: a status change on an older message
+(for example a manual reply days later) is not reflected until the
+history is rebuilt with `manage.py rebuild_automation_stats`.
+"""
+import logging
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import (
+    AutomationDailyStats,
+    AutomationRule,
+    Comment,
+    CommentReply,
+    DirectMessage,
+    DirectMessageReply,
+)
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_TTL = getattr(settings, 'AUTOMATION_STATS_CACHE_TTL', 60)
+MAX_DAYS = 90
+
+DM_CHANNELS = {
+    'facebook': 'facebook_dm',
+    'instagram': 'instagram_dm',
+}
+
+COUNTER_FIELDS = ['messages_received', 'messages_replied', 'replies_sent', 'replies_failed']
+
+
+def _day_start(day) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _live_window_start() -> datetime:
+    """
+    Start of yesterday. The rollup task recomputes the last two days on
+    every run, so older buckets are final and everything newer is live.
+    """
+    return _day_start(timezone.localdate() - timedelta(days=1))
+
+
+def rollup_daily_stats(since=None) -> int:
+    """
+    Recompute AutomationDailyStats buckets from the message and reply tables.
+    Existing buckets from the first recomputed date on are replaced, so
+    days that no longer have any activity are cleared.
+
+    Args:
+        since: First date to recompute, or None for the full history
+
+    Returns:
+        int: Number of buckets written
+    """
+    start = _day_start(since) if since else None
+    buckets: dict[tuple, AutomationDailyStats] = {}
+
+    def bucket(connection_id, day, channel):
+        key = (connection_id, day, channel)
+        if key not in buckets:
+            buckets[key] = AutomationDailyStats(connection_id=connection_id, date=day, channel=channel)
+        return buckets[key]
+
+    comments = Comment.objects.all()
+    comment_replies = CommentReply.objects.all()
+    messages = DirectMessage.objects.all()
+    message_replies = DirectMessageReply.objects.all()
+    if start:
+        comments = comments.filter(received_at__gte=start)
+        comment_replies = comment_replies.filter(sent_at__gte=start)
+        messages = messages.filter(received_at__gte=start)
+        message_replies = message_replies.filter(sent_at__gte=start)
+
+    for row in comments.annotate(day=TruncDate('received_at')).values('connection_id', 'day').annotate(
+        received=Count('id'),
+        replied=Count('id', filter=Q(status='replied')),
+    ):
+        stats = bucket(row['connection_id'], row['day'], 'comment')
+        stats.messages_received = row['received']
+        stats.messages_replied = row['replied']
+
+    for row in comment_replies.annotate(day=TruncDate('sent_at')).values('comment__connection_id', 'day').annotate(
+        sent=Count('id', filter=Q(status='sent')),
+        failed=Count('id', filter=Q(status='failed')),
+    ):
+        stats = bucket(row['comment__connection_id'], row['day'], 'comment')
+        stats.replies_sent = row['sent']
+        stats.replies_failed = row['failed']
+
+    for row in messages.annotate(day=TruncDate('received_at')).values('connection_id', 'platform', 'day').annotate(
+        received=Count('id'),
+        replied=Count('id', filter=Q(status='replied')),
+    ):
+        stats = bucket(row['connection_id'], row['day'], DM_CHANNELS.get(row['platform'], 'facebook_dm'))
+        stats.messages_received += row['received']
+        stats.messages_replied += row['replied']
+
+    for row in message_replies.annotate(day=TruncDate('sent_at')).values(
+        'direct_message__connection_id', 'direct_message__platform', 'day'
+    ).annotate(
+        sent=Count('id', filter=Q(status='sent')),
+        failed=Count('id', filter=Q(status__in=['failed', 'error'])),
+    ):
+        channel = DM_CHANNELS.get(row['direct_message__platform'], 'facebook_dm')
+        stats = bucket(row['direct_message__connection_id'], row['day'], channel)
+        stats.replies_sent += row['sent']
+        stats.replies_failed += row['failed']
+
+    with transaction.atomic():
+        stale = AutomationDailyStats.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        AutomationDailyStats.objects.bulk_create(
+            buckets.values(),
+            update_conflicts=True,
+            unique_fields=['connection', 'date', 'channel'],
+            update_fields=COUNTER_FIELDS + ['updated_at'],
+            batch_size=1000,
+        )
+    return len(buckets)
+
+
+def _activity(rollup_qs, message_qs, reply_qs, days: int, channel_of) -> dict[str, Any]:
+    """
+    Combine rolled-up and live counts into totals, per-channel totals and a
+    per-day breakdown of the last `days` days.
+
+    Args:
+        rollup_qs: AutomationDailyStats rows of the user and channel(s)
+        message_qs: Comment or DirectMessage rows of the user
+        reply_qs: CommentReply or DirectMessageReply rows of the user
+        days: Number of days in the daily breakdown
+        channel_of: Maps a live row to its channel name
+    """
+    window_start = _live_window_start()
+    window_date = window_start.date()
+    first_day = timezone.localdate() - timedelta(days=days - 1)
+
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    channels: dict[str, dict[str, int]] = {}
+    daily: dict[Any, dict[str, int]] = {
+        first_day + timedelta(days=offset): dict.fromkeys(COUNTER_FIELDS, 0)
+        for offset in range(days)
+    }
+
+    def add(channel, day, counts):
+        channel_totals = channels.setdefault(channel, dict.fromkeys(COUNTER_FIELDS, 0))
+        for field, value in counts.items():
+            totals[field] += value or 0
+            channel_totals[field] += value or 0
+            if day is not None and day in daily:
+                daily[day][field] += value or 0
+
+    sums = {field: Sum(field) for field in COUNTER_FIELDS}
+    for row in rollup_qs.filter(date__lt=window_date).values('channel').annotate(**sums):
+        add(row['channel'], None, {field: row[field] for field in COUNTER_FIELDS})
+    for row in rollup_qs.filter(date__gte=first_day, date__lt=window_date).values('date').annotate(**sums):
+        for field in COUNTER_FIELDS:
+            daily[row['date']][field] += row[field] or 0
+
+    message_group = ['day'] + (['platform'] if message_qs.model is DirectMessage else [])
+    for row in message_qs.filter(received_at__gte=window_start).annotate(
+        day=TruncDate('received_at')
+    ).values(*message_group).annotate(
+        messages_received=Count('id'),
+        messages_replied=Count('id', filter=Q(status='replied')),
+    ):
+        add(channel_of(row.get('platform')), row['day'], {
+            'messages_received': row['messages_received'],
+            'messages_replied': row['messages_replied'],
+        })
+
+    reply_group = ['day'] + (['direct_message__platform'] if reply_qs.model is DirectMessageReply else [])
+    for row in reply_qs.filter(sent_at__gte=window_start).annotate(
+        day=TruncDate('sent_at')
+    ).values(*reply_group).annotate(
+        replies_sent=Count('id', filter=Q(status='sent')),
+        replies_failed=Count('id', filter=Q(status__in=['failed', 'error'])),
+    ):
+        add(channel_of(row.get('direct_message__platform')), row['day'], {
+            'replies_sent': row['replies_sent'],
+            'replies_failed': row['replies_failed'],
+        })
+
+    return {
+        'totals': totals,
+        'channels': channels,
+        'daily': [
+            {'date': day.isoformat(), **counts}
+            for day, counts in sorted(daily.items())
+        ],
+    }
+
+
+def _rates(replied, received, sent, total_replies) -> dict[str, float]:
+    reply_rate = (replied / received * 100) if received > 0 else 0
+    success_rate = (sent / total_replies * 100) if total_replies > 0 else 0
+    return {'reply_rate': round(reply_rate, 2), 'success_rate': round(success_rate, 2)}
+
+
+def _cached(key: str, compute, use_cache: bool):
+    if not use_cache or not STATS_CACHE_TTL:
+        return compute()
+    return cache.get_or_set(key, compute, STATS_CACHE_TTL)
+
+
+def _clamp_days(days: int | None) -> int:
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        days = 30
+    return min(max(days, 1), MAX_DAYS)
+
+
+def get_comment_automation_stats(user, days: int | None = 30, use_cache: bool = True) -> dict[str, Any]:
+    """
+    Comment automation statistics for the user's Facebook connections.
+
+    Returns the existing summary keys plus a `daily` breakdown.
+    """
+    days = _clamp_days(days)
+
+    def compute():
+        rules = AutomationRule.objects.filter(
+            user=user,
+            connection__platform__name='facebook'
+        ).aggregate(
+            total_rules=Count('id'),
+            active_rules=Count('id', filter=Q(is_active=True)),
+        )
+        activity = _activity(
+            AutomationDailyStats.objects.filter(
+                connection__user=user,
+                connection__platform__name='facebook',
+                channel='comment'
+            ),
+            Comment.objects.filter(connection__user=user, connection__platform__name='facebook'),
+            CommentReply.objects.filter(
+                comment__connection__user=user,
+                comment__connection__platform__name='facebook'
+            ),
+            days,
+            lambda platform: 'comment',
+        )
+        totals = activity['totals']
+        total_replies = totals['replies_sent'] + totals['replies_failed']
+        return {
+            'total_comments': totals['messages_received'],
+            'replied_comments': totals['messages_replied'],
+            'total_rules': rules['total_rules'],
+            'active_rules': rules['active_rules'],
+            'total_replies': total_replies,
+            'successful_replies': totals['replies_sent'],
+            **_rates(totals['messages_replied'], totals['messages_received'], totals['replies_sent'], total_replies),
+            'daily': activity['daily'],
+        }
+
+    return _cached(f"automation_stats:comment:{user.id}:{days}", compute, use_cache)
+
+
+def get_dm_automation_stats(user, days: int | None = 30, use_cache: bool = True) -> dict[str, Any]:
+    """
+    DM automation statistics for the user's connections.
+
+    Returns the existing summary keys plus a `daily` breakdown.
+    """
+    days = _clamp_days(days)
+
+    def compute():
+        rules = AutomationRule.objects.filter(
+            user=user,
+            message_type__in=['dm', 'both']
+        ).aggregate(
+            total_rules=Count('id'),
+            active_rules=Count('id', filter=Q(is_active=True)),
+        )
+        activity = _activity(
+            AutomationDailyStats.objects.filter(
+                connection__user=user,
+                channel__in=list(DM_CHANNELS.values())
+            ),
+            DirectMessage.objects.filter(connection__user=user),
+            DirectMessageReply.objects.filter(direct_message__connection__user=user),
+            days,
+            lambda platform: DM_CHANNELS.get(platform, 'facebook_dm'),
+        )
+        totals = activity['totals']
+        channels = activity['channels']
+        total_replies = totals['replies_sent'] + totals['replies_failed']
+        return {
+            'total_dms': totals['messages_received'],
+            'replied_dms': totals['messages_replied'],
+            'total_rules': rules['total_rules'],
+            'active_rules': rules['active_rules'],
+            'total_replies': total_replies,
+            'successful_replies': totals['replies_sent'],
+            **_rates(totals['messages_replied'], totals['messages_received'], totals['replies_sent'], total_replies),
+            'platform_breakdown': {
+                platform: channels.get(channel, {}).get('messages_received', 0)
+                for platform, channel in DM_CHANNELS.items()
+            },
+            'daily': activity['daily'],
+        }
+
+    return _cached(f"automation_stats:dm:{user.id}:{days}", compute, use_cache)
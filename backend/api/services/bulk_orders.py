@@ -0,0 +1,95 @@
+"""
+Bulk status and email preference updates of a seller's orders.
+
+Orders are updated with QuerySet.update() in chunks of BULK_CHUNK_SIZE,
+so no per-row save() or signal runs. What the Order signals would have
+done is done per chunk instead, in the chunk's transaction: the order stats
+counters are moved in one UPDATE per product, and orders that became
+completed are handed to a single process_completed_orders task, queued on
+commit, that sends their delivery emails and enrolls them in the follow-up
+sequences as a batch.
+"""
+import logging
+from collections import Counter
+from typing import Any
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Order, ScheduledFollowupEmail, ScheduledOptinEmail
+from .order_stats import record_status_changes
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunks(ids: list[int]):
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        yield ids[start:start + BULK_CHUNK_SIZE]
+
+
+def seller_orders(user):
+    return Order.objects.filter(custom_link__user_profile__user=user)
+
+
+def bulk_update_status(user, order_ids: list[int], status: str) -> dict[str, Any]:
+    """
+    Set the status of the user's orders among order_ids.
+
+    Returns:
+        dict: {'updated_count': int, 'completed_count': int}
+    """
+    from ..tasks import process_completed_orders
+
+    updated_count = 0
+    completed_count = 0
+    for chunk in _chunks(sorted(set(order_ids))):
+        with transaction.atomic():
+            rows = list(
+                seller_orders(user)
+                .filter(id__in=chunk)
+                .exclude(status=status)
+                # Lock in id order so overlapping bulk updates cannot deadlock
+                .order_by('id')
+                .select_for_update(of=('self',))
+                .values_list('id', 'custom_link_id', 'status')
+            )
+            if not rows:
+                continue
+            changed_ids = [order_id for order_id, _, _ in rows]
+            Order.objects.filter(id__in=changed_ids).update(status=status, updated_at=timezone.now())
+            record_status_changes(Counter((link_id, previous) for _, link_id, previous in rows), status)
+
+            updated_count += len(changed_ids)
+            if status == 'completed':
+                completed_count += len(changed_ids)
+                transaction.on_commit(lambda ids=changed_ids: process_completed_orders.delay(ids))
+
+    logger.info(f"Bulk status update to {status} by user {user.id}: {updated_count} orders")
+    return {'updated_count': updated_count, 'completed_count': completed_count}
+
+
+def bulk_update_email_preference(user, order_ids: list[int], enabled: bool) -> dict[str, int]:
+    """
+    Enable or pause email automation for the user's orders among order_ids.
+
+    Returns:
+        dict: {'updated_count': int, 'pending_emails': int}
+    """
+    updated_count = 0
+    pending_emails = 0
+    now = timezone.now()
+    for chunk in _chunks(sorted(set(order_ids))):
+        owned_ids = list(seller_orders(user).filter(id__in=chunk).values_list('id', flat=True))
+        if not owned_ids:
+            continue
+        updated_count += Order.objects.filter(id__in=owned_ids).update(
+            email_automation_enabled=enabled,
+            updated_at=now
+        )
+        pending_emails += (
+            ScheduledFollowupEmail.objects.filter(order_id__in=owned_ids, sent=False).count() +
+            ScheduledOptinEmail.objects.filter(order_id__in=owned_ids, sent=False).count()
+        )
+    return {'updated_count': updated_count, 'pending_emails': pending_emails}
@@ -0,0 +1,103 @@
+"""
+Cached checkout context per CustomLink.
+
+Every checkout request needs the link's price and whether the seller's
+Stripe Connect account can take charges. Loading that through
+link.user_profile.user.connect_account costs three lazy queries, so the
+checkout views load links with checkout_links() (one joined query), and the
+page-load path (initialize_payment) reads a small cached dict instead of
+touching the database at all.
+
+The cached context is dropped when the link is saved or deleted and when
+the seller's Connect account changes (including account.updated webhooks).
+"""
+import logging
+from decimal import Decimal
+from typing import Any
+
+from django.core.cache import cache
+
+from ..models import CustomLink, StripeConnectAccount
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 600
+
+
+def _cache_key(link_id) -> str:
+    return f"checkout_context:{link_id}"
+
+
+def checkout_links():
+    """CustomLinks with the seller and their Connect account joined in."""
+    return CustomLink.objects.select_related('user_profile__user__connect_account')
+
+
+def effective_price(link) -> Decimal | None:
+    """The discounted price when it is a real discount, otherwise the list price."""
+    if (link.checkout_discounted_price and
+            link.checkout_discounted_price > 0 and
+            link.checkout_discounted_price < link.checkout_price):
+        return link.checkout_discounted_price
+    return link.checkout_price
+
+
+def build_checkout_context(link) -> dict[str, Any]:
+    """Checkout context for a link loaded through checkout_links()."""
+    seller_user = link.user_profile.user
+    connect_account = getattr(seller_user, 'connect_account', None)
+    return {
+        'link_id': link.id,
+        'title': link.title,
+        'seller_user_id': seller_user.id,
+        'price': link.checkout_price,
+        'effective_price': effective_price(link),
+        'is_free': not link.checkout_price or link.checkout_price <= 0,
+        'stripe_account_id': connect_account.stripe_account_id if connect_account else None,
+        'charges_enabled': bool(connect_account and connect_account.charges_enabled),
+        'currency': connect_account.default_currency if connect_account else None,
+        'platform_fee_percentage': connect_account.platform_fee_percentage if connect_account else None,
+    }
+
+
+def get_checkout_context(link_id) -> dict[str, Any] | None:
+    """
+    Cached checkout context of an active link.
+
+    Returns:
+        dict, or None if there is no active link with that id
+    """
+    key = _cache_key(link_id)
+    context = cache.get(key)
+    if context is None:
+        link = checkout_links().filter(pk=link_id, is_active=True).first()
+        if link is None:
+            return None
+        context = build_checkout_context(link)
+        cache.set(key, context, CACHE_TIMEOUT)
+    return context
+
+
+def readiness_error(context: dict[str, Any]) -> str | None:
+    """Why the seller cannot take payments yet, or None if they can."""
+    if not context['stripe_account_id']:
+        return "Seller has not connected their Stripe account"
+    if not context['charges_enabled']:
+        return "Seller's Stripe account is not yet ready to accept payments"
+    return None
+
+
+def platform_fee(context: dict[str, Any], amount: int) -> int:
+    """Platform fee in cents, as StripeConnectAccount.calculate_platform_fee."""
+    account = StripeConnectAccount(platform_fee_percentage=context['platform_fee_percentage'])
+    return account.calculate_platform_fee(amount)
+
+
+def invalidate_checkout_context(link_id) -> None:
+    cache.delete(_cache_key(link_id))
+
+
+def invalidate_seller_checkout_contexts(user_id) -> None:
+    """Drop the cached context of every link of a seller."""
+    link_ids = CustomLink.objects.filter(user_profile__user_id=user_id).values_list('id', flat=True)
+    cache.delete_many([_cache_key(link_id) for link_id in link_ids])
@@ -0,0 +1,161 @@
+"""
+Inbox for Stripe Connect webhook events.
+
+The webhook request only verifies the signature and inserts the event into
+ConnectWebhookEvent with INSERT ... ON CONFLICT (stripe_event_id) DO
+NOTHING, so it answers Stripe in constant time and a redelivered event can
+never be stored, or handled, twice. A Celery worker then handles the
+events.
+
+Events are grouped by the Stripe object they are about (a payment intent,
+an account, a transfer...). The worker takes a transaction-scoped advisory
+lock on that object and handles its pending events in the order Stripe
+created them, so two events for one payment are never handled concurrently
+or out of order. A failing event stops its object's queue until it is
+retried; events of other objects are unaffected. An event that fails
+MAX_ATTEMPTS times is logged as critical and keeps its object's queue
+stopped until it is dealt with by hand (fixed and retried, or marked
+processed), so later events are never applied without it.
+"""
+import logging
+from typing import Any
+
+import stripe
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import ConnectWebhookEvent
+from .webhook_handlers import (
+    CONNECT_EVENT_HANDLERS,
+    connect_event_account_id,
+    connect_event_relations,
+    handle_connect_webhook_event,
+)
+
+logger = logging.getLogger(__name__)
+
+# Failed events are retried by the beat task up to this many times
+MAX_ATTEMPTS = 5
+
+
+def object_key(event_data: dict[str, Any]) -> str:
+    """
+    The Stripe object an event is serialized on, from the event's raw data
+    object. Charges and checkout sessions share their payment intent's queue.
+    """
+    if event_data.get('object') == 'payment_intent':
+        return f"payment_intent:{event_data.get('id')}"
+    payment_intent = event_data.get('payment_intent')
+    if isinstance(payment_intent, str) and payment_intent:
+        return f"payment_intent:{payment_intent}"
+    return f"{event_data.get('object')}:{event_data.get('id')}"
+
+
+def store_event(event: stripe.Event, payload: dict[str, Any]) -> str:
+    """
+    Insert a verified event into the inbox. Duplicates are ignored.
+
+    Args:
+        event: The verified Stripe event
+        payload: The event as delivered, kept for the worker
+
+    Returns:
+        str: The event's object key
+    """
+    key = object_key(payload['data']['object'])
+    error_message = ''
+    if event.type not in CONNECT_EVENT_HANDLERS:
+        error_message = f"Unhandled event type: {event.type}"
+
+    ConnectWebhookEvent.objects.bulk_create([
+        ConnectWebhookEvent(
+            stripe_event_id=event.id,
+            event_type=event.type,
+            account_id=connect_event_account_id(event.data.object),
+            data=payload['data']['object'],
+            payload=payload,
+            object_key=key,
+            stripe_created=event.created,
+            error_message=error_message,
+        )
+    ], ignore_conflicts=True)
+    return key
+
+
+def pending_events():
+    """Stored events of handled types that still need to be processed."""
+    return ConnectWebhookEvent.objects.filter(
+        processed=False,
+        payload__isnull=False,
+        event_type__in=list(CONNECT_EVENT_HANDLERS),
+    )
+
+
+def exhausted_events():
+    """Pending events that failed MAX_ATTEMPTS times and block their object."""
+    return pending_events().filter(attempts__gte=MAX_ATTEMPTS)
+
+
+def pending_object_keys(limit: int = 500) -> list[str]:
+    """Objects with events waiting and not blocked by an exhausted event, for the retry sweep."""
+    return list(
+        pending_events()
+        .exclude(object_key__in=exhausted_events().values('object_key'))
+        .order_by().values_list('object_key', flat=True).distinct()[:limit]
+    )
+
+
+def process_object_events(key: str) -> dict[str, int]:
+    """
+    Handle the pending events of one Stripe object, oldest first.
+
+    Returns:
+        dict: {'processed': int, 'failed': int}
+    """
+    processed_count = 0
+    failed_count = 0
+
+    with transaction.atomic():
+        # Held until commit: other workers for this object wait here
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+
+        inbox_events = pending_events().filter(object_key=key).order_by('stripe_created', 'id')
+        for inbox_event in inbox_events:
+            if inbox_event.attempts >= MAX_ATTEMPTS:
+                logger.warning(
+                    f"Connect events for {key} are held back by event {inbox_event.stripe_event_id}, "
+                    f"which failed {inbox_event.attempts} times"
+                )
+                break
+
+            event = stripe.Event.construct_from(inbox_event.payload, stripe.api_key)
+            try:
+                with transaction.atomic():
+                    handle_connect_webhook_event(event)
+            except Exception as e:
+                logger.error(f"Error processing Connect {inbox_event.event_type} event {inbox_event.stripe_event_id}: {e}")
+                inbox_event.attempts += 1
+                inbox_event.error_message = str(e)
+                inbox_event.save(update_fields=['attempts', 'error_message'])
+                failed_count += 1
+                if inbox_event.attempts >= MAX_ATTEMPTS:
+                    logger.critical(
+                        f"Connect {inbox_event.event_type} event {inbox_event.stripe_event_id} failed "
+                        f"{MAX_ATTEMPTS} times; events for {key} are blocked until it is resolved"
+                    )
+                # Later events for this object wait, so they are not applied out of order
+                break
+
+            relations = connect_event_relations(event.data.object)
+            inbox_event.connect_account = relations['connect_account']
+            inbox_event.payment_transaction = relations['payment_transaction']
+            inbox_event.processed = True
+            inbox_event.processed_at = timezone.now()
+            inbox_event.error_message = ''
+            inbox_event.save(update_fields=[
+                'connect_account', 'payment_transaction', 'processed', 'processed_at', 'error_message'
+            ])
+            processed_count += 1
+
+    return {'processed': processed_count, 'failed': failed_count}
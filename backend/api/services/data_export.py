@@ -0,0 +1,265 @@
+"""
+Background exports of orders and collect info responses.
+
+A DataExport row is created by the API and filled in by the run_data_export
+Celery task, so no web request ever holds a seller's leads in memory. Rows
+are read with values_list(...).iterator(chunk_size=CHUNK_SIZE), which uses a
+server-side cursor on PostgreSQL, and written one chunk at a time to a
+temporary file, so memory use does not grow with the number of rows.
+Progress (exported_rows of total_rows) is saved after every chunk.
+
+The JSON form answers become one column per question. The question set is
+read up front with SELECT DISTINCT jsonb_object_keys(...), so the file
+header is known before the first row is streamed.
+
+Files go to the 'exports' storage (settings.STORAGES), which the worker
+writing them and the API serving downloads must share. The file names carry
+a random token, as Cloudinary serves raw files from public URLs.
+
+Parquet files are written with pyarrow, which is optional: Parquet exports
+are only offered when it is installed.
+"""
+import csv
+import io
+import json
+import logging
+import secrets
+import tempfile
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import Any
+
+from django.core.files import File
+from django.db.models import CharField, F, Func, Q
+from django.utils import timezone
+
+from ..models import CollectInfoField, CollectInfoResponse, DataExport, Order
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip and written per progress update
+CHUNK_SIZE = 2000
+
+# Finished exports are deleted after this many days
+EXPORT_RETENTION_DAYS = 7
+
+# Columns of each export type before the form answers: (header, values_list field)
+BASE_COLUMNS = {
+    'orders': [
+        ('Order ID', 'order_id'),
+        ('Product', 'custom_link__title'),
+        ('Status', 'status'),
+        ('Customer Name', 'customer_name'),
+        ('Customer Email', 'customer_email'),
+        ('Email Automation', 'email_automation_enabled'),
+        ('Created At', 'created_at'),
+    ],
+    'collect_info_responses': [
+        ('Response ID', 'id'),
+        ('Product', 'custom_link__title'),
+        ('Submitted At', 'submitted_at'),
+        ('IP Address', 'ip_address'),
+        ('User Agent', 'user_agent'),
+    ],
+}
+
+# JSON field holding the form answers of each export type
+RESPONSES_FIELD = {
+    'orders': 'form_responses',
+    'collect_info_responses': 'responses',
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_queryset(data_export: DataExport):
+    """The rows an export covers: the user's own products, or any product for staff."""
+    if data_export.export_type == 'orders':
+        queryset = Order.objects.all()
+        status = data_export.filters.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+    else:
+        queryset = CollectInfoResponse.objects.all()
+
+    if not data_export.user.is_staff:
+        queryset = queryset.filter(custom_link__user_profile__user=data_export.user)
+    custom_link_id = data_export.filters.get('custom_link_id')
+    if custom_link_id:
+        queryset = queryset.filter(custom_link_id=custom_link_id)
+    return queryset.order_by('pk')
+
+
+def response_keys(queryset, field: str) -> list[str]:
+    """Every question answered in the rows, in a stable order."""
+    keys = (
+        queryset.order_by()
+        .annotate(json_type=Func(F(field), function='jsonb_typeof', output_field=CharField()))
+        .filter(json_type='object')
+        .annotate(key=Func(F(field), function='jsonb_object_keys', output_field=CharField()))
+        .values_list('key', flat=True)
+        .distinct()
+    )
+    return sorted(keys)
+
+
+def _response_headers(export_type: str, keys: list[str]) -> list[str]:
+    """Collect info answers are keyed by field id; show the field's label instead."""
+    if export_type != 'collect_info_responses':
+        return list(keys)
+    field_ids = [int(key) for key in keys if key.isdigit()]
+    labels = dict(CollectInfoField.objects.filter(id__in=field_ids).values_list('id', 'label'))
+    return [labels.get(int(key), key) if key.isdigit() else key for key in keys]
+
+
+def _unique(headers: list[str]) -> list[str]:
+    seen = {}
+    unique = []
+    for header in headers:
+        count = seen.get(header, 0)
+        seen[header] = count + 1
+        unique.append(f"{header} ({count + 1})" if count else header)
+    return unique
+
+
+def format_value(value: Any) -> str:
+    """A cell as text: lists joined like the admin shows them, objects as JSON."""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def flatten_rows(rows: Iterable[tuple], keys: list[str]) -> Iterable[list[str]]:
+    """values_list rows whose last item is the JSON answers, as flat text rows."""
+    for row in rows:
+        answers = row[-1] if isinstance(row[-1], dict) else {}
+        yield [format_value(value) for value in row[:-1]] + [format_value(answers.get(key)) for key in keys]
+
+
+class CsvExportWriter:
+    extension = 'csv'
+
+    def __init__(self, fileobj, header: list[str]):
+        self.text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(header)
+
+    def write_rows(self, rows: list[list[str]]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.text.flush()
+        # Leave the binary file open for upload
+        self.text.detach()
+
+
+class ParquetExportWriter:
+    extension = 'parquet'
+
+    def __init__(self, fileobj, header: list[str]):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.string()) for name in header])
+        self.writer = pyarrow.parquet.ParquetWriter(fileobj, self.schema)
+
+    def write_rows(self, rows: list[list[str]]) -> None:
+        columns = [self.pyarrow.array(column, self.pyarrow.string()) for column in zip(*rows, strict=True)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def run_export(data_export: DataExport) -> dict[str, Any]:
+    """
+    Write the export's rows to a file and attach it to the export.
+
+    Returns:
+        dict: {'success': bool, 'rows': int}
+    """
+    export_type = data_export.export_type
+    queryset = export_queryset(data_export)
+    fields = [field for _, field in BASE_COLUMNS[export_type]] + [RESPONSES_FIELD[export_type]]
+
+    data_export.status = 'running'
+    data_export.started_at = timezone.now()
+    data_export.total_rows = queryset.count()
+    data_export.exported_rows = 0
+    data_export.save(update_fields=['status', 'started_at', 'total_rows', 'exported_rows'])
+
+    exported = 0
+    try:
+        keys = response_keys(queryset, RESPONSES_FIELD[export_type])
+        header = _unique([name for name, _ in BASE_COLUMNS[export_type]] + _response_headers(export_type, keys))
+
+        with tempfile.TemporaryFile() as fileobj:
+            writer = WRITERS[data_export.file_format](fileobj, header)
+            chunk = []
+            rows = queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+            for row in flatten_rows(rows, keys):
+                chunk.append(row)
+                if len(chunk) == CHUNK_SIZE:
+                    writer.write_rows(chunk)
+                    exported += len(chunk)
+                    chunk = []
+                    DataExport.objects.filter(pk=data_export.pk).update(exported_rows=exported)
+            if chunk:
+                writer.write_rows(chunk)
+                exported += len(chunk)
+            writer.close()
+
+            fileobj.seek(0)
+            filename = (
+                f"{export_type}-{data_export.pk}-{timezone.now():%Y%m%d%H%M%S}-"
+                f"{secrets.token_hex(8)}.{writer.extension}"
+            )
+            data_export.file.save(filename, File(fileobj), save=False)
+    except Exception as e:
+        logger.error(f"Data export {data_export.pk} failed: {e}")
+        data_export.status = 'failed'
+        data_export.error_message = str(e)
+        data_export.completed_at = timezone.now()
+        data_export.save(update_fields=['status', 'error_message', 'completed_at'])
+        return {'success': False, 'rows': exported}
+
+    data_export.status = 'completed'
+    data_export.exported_rows = exported
+    data_export.completed_at = timezone.now()
+    data_export.save(update_fields=['status', 'exported_rows', 'file', 'completed_at'])
+    logger.info(f"Data export {data_export.pk} wrote {exported} rows")
+    return {'success': True, 'rows': exported}
+
+
+def delete_expired_exports() -> int:
+    """Delete exports, and their files, finished more than EXPORT_RETENTION_DAYS ago."""
+    cutoff = timezone.now() - timedelta(days=EXPORT_RETENTION_DAYS)
+    expired = DataExport.objects.filter(
+        Q(completed_at__lt=cutoff) | Q(completed_at__isnull=True, created_at__lt=cutoff)
+    )
+    deleted = 0
+    for data_export in expired.iterator(chunk_size=CHUNK_SIZE):
+        if data_export.file:
+            data_export.file.delete(save=False)
+        data_export.delete()
+        deleted += 1
+    return deleted
@@ -0,0 +1,189 @@
+"""
+Materialized earnings of Connect sellers.
+
+SellerEarningsLedger keeps one row of running totals per Connect account and
+SellerEarningsDay one row per account and day of payment, so the earnings
+endpoints read a row instead of aggregating the seller's whole transaction
+history.
+
+PaymentTransaction.save() locks the transaction row, reads its stored state,
+saves, and hands the before and after states to record_transaction_change(),
+all in one database transaction. The change is applied as the difference of
+the two states' contributions with UPDATE ... SET x = x + delta, so the
+ledger moves together with the transaction whichever code path (webhook
+handler, service, view) changed it, and concurrent updates of different
+transactions of one seller never overwrite each other.
+
+rebuild_ledger() recomputes a seller's rows from their transactions, for
+repair.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import PaymentTransaction, SellerEarningsDay, SellerEarningsLedger
+
+logger = logging.getLogger(__name__)
+
+# Transaction fields that affect the ledger
+STATE_FIELDS = [
+    'seller_account_id', 'status', 'total_amount', 'platform_fee', 'seller_amount',
+    'refunded_amount', 'transfer_id', 'paid_at', 'created_at',
+]
+
+# Statuses of transactions the customer paid, counted in the daily buckets
+PAID_STATUSES = ('succeeded', 'partially_refunded', 'refunded')
+REFUNDED_STATUSES = ('partially_refunded', 'refunded')
+
+
+def transaction_state(payment_transaction) -> dict[str, Any]:
+    """The ledger-relevant fields of a PaymentTransaction instance."""
+    return {field: getattr(payment_transaction, field) for field in STATE_FIELDS}
+
+
+def locked_transaction_state(pk) -> dict[str, Any] | None:
+    """The stored state of a transaction, locking its row until commit."""
+    return PaymentTransaction.objects.select_for_update().filter(pk=pk).values(*STATE_FIELDS).first()
+
+
+def _ledger_contribution(state: dict[str, Any]) -> dict[str, int]:
+    succeeded = state['status'] == 'succeeded'
+    seller_amount = state['seller_amount'] or 0
+    return {
+        'transaction_count': 1,
+        'gross_amount': state['total_amount'] or 0,
+        'platform_fee_amount': state['platform_fee'] or 0,
+        'succeeded_count': int(succeeded),
+        'succeeded_amount': (state['total_amount'] or 0) if succeeded else 0,
+        'seller_earned_amount': seller_amount if succeeded else 0,
+        'failed_count': int(state['status'] == 'failed'),
+        'refunded_count': int(state['status'] in REFUNDED_STATUSES),
+        'refunded_amount': state['refunded_amount'] or 0,
+        'pending_payout_amount': seller_amount if succeeded and not state['transfer_id'] else 0,
+    }
+
+
+def _day_contribution(state: dict[str, Any]) -> dict[str, int]:
+    return {
+        'sales_count': 1,
+        'sales_amount': state['total_amount'] or 0,
+        'platform_fee_amount': state['platform_fee'] or 0,
+        'seller_amount': state['seller_amount'] or 0,
+        'refunded_amount': state['refunded_amount'] or 0,
+    }
+
+
+def _payment_date(state: dict[str, Any]):
+    return timezone.localdate(state['paid_at'] or state['created_at'])
+
+
+def _apply(model, lookup: dict[str, Any], deltas: dict[str, int]) -> None:
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+    model.objects.filter(**lookup).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def record_transaction_change(previous: dict[str, Any] | None, current: dict[str, Any] | None) -> None:
+    """
+    Move the ledger from a transaction's previous state to its current one.
+    Either state may be None (the transaction was created or deleted).
+    Call inside the transaction that changed the PaymentTransaction.
+    """
+    ledger_deltas = defaultdict(lambda: defaultdict(int))
+    day_deltas = defaultdict(lambda: defaultdict(int))
+
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is None:
+            continue
+        account_id = state['seller_account_id']
+        for field, value in _ledger_contribution(state).items():
+            ledger_deltas[account_id][field] += sign * value
+        if state['status'] in PAID_STATUSES:
+            for field, value in _day_contribution(state).items():
+                day_deltas[(account_id, _payment_date(state))][field] += sign * value
+
+    for account_id, deltas in ledger_deltas.items():
+        _apply(SellerEarningsLedger, {'connect_account_id': account_id}, deltas)
+    for (account_id, day), deltas in day_deltas.items():
+        _apply(SellerEarningsDay, {'connect_account_id': account_id, 'date': day}, deltas)
+
+
+def _cents(amount: int) -> Decimal:
+    return Decimal(amount or 0) / 100
+
+
+def earnings_summary(connect_account) -> dict[str, Any]:
+    """Earnings of a seller for ConnectEarningsSerializer, from their ledger row."""
+    ledger = SellerEarningsLedger.objects.filter(connect_account=connect_account).first()
+    ledger = ledger or SellerEarningsLedger(connect_account=connect_account)
+    return {
+        'total_sales': _cents(ledger.gross_amount),
+        'total_earnings': _cents(ledger.platform_fee_amount),
+        'pending_payouts': _cents(ledger.pending_payout_amount),
+        'transaction_count': ledger.transaction_count,
+        'successful_transactions': ledger.succeeded_count,
+        'failed_transactions': ledger.failed_count,
+    }
+
+
+def daily_earnings(connect_account, days: int) -> list[dict[str, Any]]:
+    """Paid sales per day over the last `days` days, oldest first, days without sales omitted."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = SellerEarningsDay.objects.filter(connect_account=connect_account, date__gte=since).order_by('date')
+    return [
+        {
+            'date': row.date,
+            'sales_count': row.sales_count,
+            'sales': _cents(row.sales_amount),
+            'seller_earnings': _cents(row.seller_amount),
+            'refunded': _cents(row.refunded_amount),
+        }
+        for row in rows
+    ]
+
+
+def rebuild_ledger(connect_account) -> SellerEarningsLedger:
+    """Recompute a seller's ledger and daily rows from their transactions."""
+    transactions = PaymentTransaction.objects.filter(seller_account=connect_account)
+    succeeded = Q(status='succeeded')
+    totals = transactions.aggregate(
+        transaction_count=Count('id'),
+        gross_amount=Coalesce(Sum('total_amount'), 0),
+        platform_fee_amount=Coalesce(Sum('platform_fee'), 0),
+        succeeded_count=Count('id', filter=succeeded),
+        succeeded_amount=Coalesce(Sum('total_amount', filter=succeeded), 0),
+        seller_earned_amount=Coalesce(Sum('seller_amount', filter=succeeded), 0),
+        failed_count=Count('id', filter=Q(status='failed')),
+        refunded_count=Count('id', filter=Q(status__in=REFUNDED_STATUSES)),
+        refunded_amount=Coalesce(Sum('refunded_amount'), 0),
+        pending_payout_amount=Coalesce(Sum('seller_amount', filter=succeeded & Q(transfer_id='')), 0),
+    )
+    days = (
+        transactions.filter(status__in=PAID_STATUSES)
+        .annotate(date=TruncDate(Coalesce('paid_at', 'created_at'), tzinfo=timezone.get_current_timezone()))
+        .values('date')
+        .annotate(
+            sales_count=Count('id'),
+            sales_amount=Sum('total_amount'),
+            platform_fee_amount=Sum('platform_fee'),
+            seller_amount=Sum('seller_amount'),
+            refunded_amount=Sum('refunded_amount'),
+        )
+    )
+
+    with transaction.atomic():
+        ledger, _ = SellerEarningsLedger.objects.update_or_create(connect_account=connect_account, defaults=totals)
+        SellerEarningsDay.objects.filter(connect_account=connect_account).delete()
+        SellerEarningsDay.objects.bulk_create([
+            SellerEarningsDay(connect_account=connect_account, **day) for day in days
+        ])
+    return ledger
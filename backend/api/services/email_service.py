@@ -3,7 +3,8 @@ Email Service for sending subscription-related and product delivery emails using
 """
 import logging
 import os
-from typing import Optional, Dict, Any
+import re
+from typing import Any
 
 import resend
 from django.template.loader import render_to_string
@@ -18,13 +19,37 @@ logger = logging.getLogger(__name__)
 # Configure Resend with API key from Django settings
 resend.api_key = getattr(settings, 'RESEND_API_KEY', '')
 
+DEFAULT_FROM_EMAIL = 'contact@elevate.social'
+
+# Resend accepts at most 100 emails per batch request
+RESEND_BATCH_SIZE = 100
+
+# Variables of follow-up subjects and bodies. Templates are written by
+# sellers, so only these exact placeholders are substituted and any other
+# braces are left as written.
+FOLLOWUP_VARIABLES = ('first_name', 'sender_name', 'affiliate_link', 'personal_email')
+_FOLLOWUP_PLACEHOLDER = re.compile(r'\{\{ (' + '|'.join(FOLLOWUP_VARIABLES) + r') \}\}')
+
+# Follow-up subjects and bodies split on their placeholders, by template.
+# An entry is replaced when its template's modified_at changes.
+_compiled_followups = {}
+
+
+def _render_email(template_name: str, context: dict[str, Any]) -> str:
+    """Render an email template with the common context variables added."""
+    context.update({
+        'frontend_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:3000'),
+        'support_email': 'contact@elevate.social',
+    })
+    return render_to_string(f'emails/{template_name}.html', context)
+
 
 def send_email(
     template_name: str,
     subject: str,
     to_email: str,
-    context: Dict[str, Any],
-    from_email: Optional[str] = None
+    context: dict[str, Any],
+    from_email: str | None = None
 ) -> bool:
     """
     Send an HTML email using a template via Resend.
@@ -40,17 +65,11 @@ def send_email(
         bool: True if email sent successfully, False otherwise
     """
     try:
-        # Add common context variables
-        context.update({
-            'frontend_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:3000'),
-            'support_email': 'contact@elevate.social',
-        })
-
         # Render the HTML template
-        html_content = render_to_string(f'emails/{template_name}.html', context)
+        html_content = _render_email(template_name, context)
 
         # Use Resend to send email
-        from_email = from_email or 'contact@elevate.social'
+        from_email = from_email or DEFAULT_FROM_EMAIL
 
         params = {
             "from": from_email,
@@ -439,91 +458,150 @@ def send_generic_product_email(order: Order) -> bool:
     )
 
 
-def send_optin_followup_email(scheduled_email) -> bool:
-    """
-    Send a follow-up email from the opt-in sequence.
+def _compile_followup(template):
     """
-    order = scheduled_email.order
-    template = scheduled_email.email_template
-    custom_link = order.custom_link
-    seller_profile = custom_link.user_profile
-    seller_user = seller_profile.user
+    Split a follow-up template's subject and body on their placeholders, once
+    per version of the template.
 
-    # Extract first name from customer name
-    first_name = order.customer_name.split()[0] if order.customer_name else ""
+    Returns:
+        tuple: (subject parts, body parts); literal text at even indexes and
+        variable names at odd ones. Body line breaks are already HTML.
+    """
+    key = (template._meta.label, template.pk)
+    cached = _compiled_followups.get(key)
+    if cached and cached[0] == template.modified_at:
+        return cached[1]
+    compiled = (
+        _FOLLOWUP_PLACEHOLDER.split(template.subject),
+        _FOLLOWUP_PLACEHOLDER.split(template.body.replace('\n', '<br>')),
+    )
+    _compiled_followups[key] = (template.modified_at, compiled)
+    return compiled
 
-    # Replace template variables in subject
-    email_subject = template.subject
-    email_subject = email_subject.replace('{{ first_name }}', first_name)
-    email_subject = email_subject.replace('{{ sender_name }}', seller_profile.display_name or seller_user.get_full_name() or seller_user.username)
-    email_subject = email_subject.replace('{{ affiliate_link }}', seller_profile.affiliate_link or '')
-    email_subject = email_subject.replace('{{ personal_email }}', seller_profile.contact_email or '')
 
-    # Replace template variables in body
-    email_body = template.body
-    email_body = email_body.replace('{{ first_name }}', first_name)
-    email_body = email_body.replace('{{ sender_name }}', seller_profile.display_name or seller_user.get_full_name() or seller_user.username)
-    email_body = email_body.replace('{{ affiliate_link }}', seller_profile.affiliate_link or '')
-    email_body = email_body.replace('{{ personal_email }}', seller_profile.contact_email or '')
+def _fill_followup_variables(parts: list[str], variables: dict[str, str]) -> str:
+    """Join compiled follow-up parts, filling in the variables."""
+    return ''.join(
+        variables[part] if index % 2 else part
+        for index, part in enumerate(parts)
+    )
 
-    # Convert line breaks to HTML
-    email_body = email_body.replace('\n', '<br>')
 
+def _seller_context(seller_profile, seller_cache=None) -> dict[str, str]:
+    """Template variables that depend only on the seller."""
+    if seller_cache is not None and seller_profile.pk in seller_cache:
+        return seller_cache[seller_profile.pk]
+    seller_user = seller_profile.user
     context = {
-        'customer_name': order.customer_name,
-        'first_name': first_name,
-        'email_body': email_body,
         'sender_name': seller_profile.display_name or seller_user.get_full_name() or seller_user.username,
+        'affiliate_link': seller_profile.affiliate_link or '',
+        'personal_email': seller_profile.contact_email or '',
     }
-
-    return send_email(
-        template_name='optin_followup',
-        subject=email_subject,
-        to_email=order.customer_email,
-        context=context
-    )
+    if seller_cache is not None:
+        seller_cache[seller_profile.pk] = context
+    return context
 
 
-def send_freebie_followup_email(scheduled_email) -> bool:
+def _followup_subject_and_context(scheduled_email, seller_cache=None):
     """
-    Send a follow-up email from the freebie sequence.
+    Fill in the template variables of a scheduled follow-up email.
+
+    Args:
+        scheduled_email: ScheduledFollowupEmail or ScheduledOptinEmail
+        seller_cache: Optional dict reused across a batch, so each seller's
+            variables are worked out once
+
+    Returns:
+        tuple: (subject, template context)
     """
     order = scheduled_email.order
-    template = scheduled_email.email_template
-    custom_link = order.custom_link
-    seller_profile = custom_link.user_profile
-    seller_user = seller_profile.user
+    seller = _seller_context(order.custom_link.user_profile, seller_cache)
 
     # Extract first name from customer name
     first_name = order.customer_name.split()[0] if order.customer_name else ""
 
-    # Replace template variables in subject
-    email_subject = template.subject
-    email_subject = email_subject.replace('{{ first_name }}', first_name)
-    email_subject = email_subject.replace('{{ sender_name }}', seller_profile.display_name or seller_user.get_full_name() or seller_user.username)
-    email_subject = email_subject.replace('{{ affiliate_link }}', seller_profile.affiliate_link or '')
-    email_subject = email_subject.replace('{{ personal_email }}', seller_profile.contact_email or '')
-
-    # Replace template variables in body
-    email_body = template.body
-    email_body = email_body.replace('{{ first_name }}', first_name)
-    email_body = email_body.replace('{{ sender_name }}', seller_profile.display_name or seller_user.get_full_name() or seller_user.username)
-    email_body = email_body.replace('{{ affiliate_link }}', seller_profile.affiliate_link or '')
-    email_body = email_body.replace('{{ personal_email }}', seller_profile.contact_email or '')
-
-    # Convert line breaks to HTML
-    email_body = email_body.replace('\n', '<br>')
+    subject_parts, body_parts = _compile_followup(scheduled_email.email_template)
+    variables = {**seller, 'first_name': first_name}
+    email_subject = _fill_followup_variables(subject_parts, variables)
+    email_body = _fill_followup_variables(
+        body_parts, {name: value.replace('\n', '<br>') for name, value in variables.items()}
+    )
 
     context = {
         'customer_name': order.customer_name,
         'first_name': first_name,
         'email_body': email_body,
-        'sender_name': seller_profile.display_name or seller_user.get_full_name() or seller_user.username,
+        'sender_name': seller['sender_name'],
+    }
+    return email_subject, context
+
+
+def build_followup_email(scheduled_email, template_name: str, seller_cache=None) -> dict[str, Any]:
+    """
+    Build the Resend params for a scheduled follow-up email, for sending
+    through the batch endpoint.
+    """
+    subject, context = _followup_subject_and_context(scheduled_email, seller_cache)
+    return {
+        "from": DEFAULT_FROM_EMAIL,
+        "to": [scheduled_email.order.customer_email],
+        "subject": subject,
+        "html": _render_email(template_name, context),
     }
 
+
+def send_batch_emails(params: list[dict[str, Any]]) -> list[str | None]:
+    """
+    Send emails through Resend's batch endpoint, RESEND_BATCH_SIZE at a time.
+
+    A chunk is accepted or rejected as a whole, so a failed request marks
+    every email in it as failed.
+
+    Returns:
+        One entry per email: None if Resend accepted it, otherwise the error
+    """
+    errors = []
+    for start in range(0, len(params), RESEND_BATCH_SIZE):
+        chunk = params[start:start + RESEND_BATCH_SIZE]
+        try:
+            response = resend.Batch.send(chunk)
+        except Exception as e:
+            logger.error(f"Failed to send batch of {len(chunk)} emails via Resend: {e}")
+            errors.extend([str(e)] * len(chunk))
+            continue
+
+        data = response.get('data') or []
+        if len(data) != len(chunk):
+            # Ids are matched to emails by position, which only holds when none are missing
+            logger.error(f"Resend returned {len(data)} ids for a batch of {len(chunk)} emails")
+            errors.extend([f"Resend returned {len(data)} ids for {len(chunk)} emails: {response}"] * len(chunk))
+            continue
+        for item in data:
+            errors.append(None if item.get('id') else f"Resend returned no id: {response}")
+    return errors
+
+
+def send_optin_followup_email(scheduled_email) -> bool:
+    """
+    Send a follow-up email from the opt-in sequence.
+    """
+    subject, context = _followup_subject_and_context(scheduled_email)
+    return send_email(
+        template_name='optin_followup',
+        subject=subject,
+        to_email=scheduled_email.order.customer_email,
+        context=context
+    )
+
+
+def send_freebie_followup_email(scheduled_email) -> bool:
+    """
+    Send a follow-up email from the freebie sequence.
+    """
+    subject, context = _followup_subject_and_context(scheduled_email)
     return send_email(
         template_name='freebie_followup',
-        subject=email_subject,
-        to_email=order.customer_email,
+        subject=subject,
+        to_email=scheduled_email.order.customer_email,
         context=context
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,189 @@
+"""
+Gmail sync scheduling.
+
+Instead of syncing every account at the same instant, each account has its
+own next_sync_at. Accounts are phased across their interval by a hash of
+their id, the interval adapts to how much the mailbox changes, and inboxes
+nobody has opened recently are not polled at all.
+
+Accounts with an active Gmail push watch are synced when a notification
+arrives; polling them only remains as a slow fallback.
+"""
+import logging
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import EmailAccount
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL_MINUTES = getattr(settings, 'EMAIL_SYNC_MIN_INTERVAL_MINUTES', 1)
+MAX_INTERVAL_MINUTES = getattr(settings, 'EMAIL_SYNC_MAX_INTERVAL_MINUTES', 30)
+INACTIVE_AFTER_DAYS = getattr(settings, 'EMAIL_SYNC_INACTIVE_AFTER_DAYS', 7)
+PUSH_FALLBACK_MINUTES = getattr(settings, 'EMAIL_SYNC_PUSH_FALLBACK_MINUTES', 120)
+
+# Notifications for the same account within this window share one sync
+PUSH_COALESCE_SECONDS = 5
+
+# Watches expire after 7 days; renew those expiring within this window
+WATCH_RENEW_BEFORE = timedelta(days=1)
+
+# How often the scheduler task runs; due accounts are spread over one tick
+SCHEDULER_TICK_SECONDS = 60
+
+
+def hash_offset(account_id: int, period_seconds: int) -> int:
+    """Stable per-account offset in [0, period_seconds)."""
+    if period_seconds <= 0:
+        return 0
+    return zlib.crc32(str(account_id).encode()) % period_seconds
+
+
+def inbox_active_q(now=None) -> Q:
+    """Accounts whose inbox was opened recently, or that were connected recently."""
+    cutoff = (now or timezone.now()) - timedelta(days=INACTIVE_AFTER_DAYS)
+    return Q(inbox_opened_at__gte=cutoff) | Q(inbox_opened_at__isnull=True, created_at__gte=cutoff)
+
+
+def assign_initial_phases(now=None) -> int:
+    """
+    Give accounts that have never been scheduled a next_sync_at spread
+    over their interval, so they do not all come due on the same tick.
+
+    Returns:
+        int: Number of accounts scheduled
+    """
+    now = now or timezone.now()
+    accounts = list(EmailAccount.objects.filter(is_active=True, next_sync_at__isnull=True).only(
+        'id', 'sync_interval_minutes'
+    ))
+    for account in accounts:
+        period = account.sync_interval_minutes * 60
+        account.next_sync_at = now + timedelta(seconds=hash_offset(account.id, period))
+    EmailAccount.objects.bulk_update(accounts, ['next_sync_at'], batch_size=500)
+    return len(accounts)
+
+
+def claim_due_accounts(now=None) -> list[int]:
+    """
+    Return the ids of active, recently used accounts whose sync is due, and
+    push their next_sync_at one interval ahead so the next tick does not
+    pick them up again while their sync is still queued.
+    """
+    now = now or timezone.now()
+    due = list(
+        EmailAccount.objects.filter(is_active=True, next_sync_at__lte=now)
+        .filter(inbox_active_q(now))
+        .values_list('id', 'sync_interval_minutes')
+    )
+    by_interval = {}
+    for account_id, interval in due:
+        by_interval.setdefault(interval, []).append(account_id)
+    for interval, ids in by_interval.items():
+        EmailAccount.objects.filter(id__in=ids).update(next_sync_at=now + timedelta(minutes=interval))
+    return [account_id for account_id, _ in due]
+
+
+def next_interval(current: int, changes: int) -> int:
+    """
+    Halve the interval after a sync that found changes, double it after an
+    idle one, within the configured bounds.
+    """
+    if changes > 0:
+        interval = current // 2
+    else:
+        interval = current * 2
+    return max(MIN_INTERVAL_MINUTES, min(MAX_INTERVAL_MINUTES, interval))
+
+
+def schedule_next_sync(account: EmailAccount, changes: int) -> int:
+    """
+    Adapt the account's interval to the result of a sync and schedule the
+    next one.
+
+    Args:
+        account: The synced EmailAccount
+        changes: Messages added, updated or deleted by the sync
+
+    Returns:
+        int: The new interval in minutes
+    """
+    now = timezone.now()
+    interval = next_interval(account.sync_interval_minutes, changes)
+    delay = interval
+    if account.watch_expires_at and account.watch_expires_at > now:
+        # Push notifications trigger syncs; polling is only a safety net
+        delay = max(interval, PUSH_FALLBACK_MINUTES)
+    account.sync_interval_minutes = interval
+    account.next_sync_at = now + timedelta(minutes=delay)
+    EmailAccount.objects.filter(pk=account.pk).update(
+        sync_interval_minutes=interval,
+        next_sync_at=account.next_sync_at,
+    )
+    return interval
+
+
+def mark_inbox_opened(user) -> list[int]:
+    """
+    Record that the user opened the inbox.
+
+    Accounts that were dormant (and therefore not polled) are made due
+    immediately with the shortest interval.
+
+    Returns:
+        List of account ids that were woken up
+    """
+    now = timezone.now()
+    accounts = EmailAccount.objects.filter(user=user, is_active=True)
+    woken = list(accounts.exclude(inbox_active_q(now)).values_list('id', flat=True))
+    if woken:
+        EmailAccount.objects.filter(id__in=woken).update(
+            next_sync_at=now,
+            sync_interval_minutes=MIN_INTERVAL_MINUTES,
+        )
+    # Written at most once a minute per account, not on every list request
+    accounts.filter(
+        Q(inbox_opened_at__isnull=True) | Q(inbox_opened_at__lt=now - timedelta(minutes=1))
+    ).update(inbox_opened_at=now)
+    return woken
+
+
+def handle_push_notification(email_address: str, history_id) -> list[int]:
+    """
+    Queue a history sync for the accounts a Gmail push notification is for.
+
+    Notifications that do not move past the stored history id are ignored,
+    and bursts for the same account within PUSH_COALESCE_SECONDS share a
+    single sync.
+
+    Returns:
+        List of account ids a sync was queued for
+    """
+    from ..tasks import sync_single_email_account
+
+    queued = []
+    accounts = EmailAccount.objects.filter(
+        email_address__iexact=email_address,
+        is_active=True
+    ).values_list('id', 'history_id')
+    for account_id, stored_history_id in accounts:
+        if stored_history_id and history_id and int(history_id) <= int(stored_history_id):
+            continue
+        if not cache.add(f"gmail_push:{account_id}", True, PUSH_COALESCE_SECONDS):
+            continue
+        sync_single_email_account.apply_async(args=[account_id], countdown=PUSH_COALESCE_SECONDS)
+        queued.append(account_id)
+    return queued
+
+
+def accounts_needing_watch(now=None):
+    """Active, recently used accounts whose push watch is missing or about to expire."""
+    now = now or timezone.now()
+    return EmailAccount.objects.filter(is_active=True).filter(inbox_active_q(now)).filter(
+        Q(watch_expires_at__isnull=True) | Q(watch_expires_at__lt=now + WATCH_RENEW_BEFORE)
+    )
@@ -0,0 +1,194 @@
+"""
+Scheduling and sending of the follow-up email sequences.
+
+Due rows are claimed in chunks with SELECT ... FOR UPDATE SKIP LOCKED, so
+overlapping runs of the beat task never send the same email twice, and each
+chunk goes to Resend as a single batch request. A row stays pending until
+it is sent, has failed MAX_ATTEMPTS times, or is more than MAX_SEND_DELAY
+past its send time, so a late run catches up on recent emails without
+sending a backlog of stale ones.
+
+A customer is enrolled in a sequence while they have pending emails in
+either one. Scheduled rows carry the customer's address so that check is a
+probe of a partial index rather than a join against orders.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import ScheduledFollowupEmail, ScheduledOptinEmail
+from .email_service import RESEND_BATCH_SIZE, build_followup_email, send_batch_emails
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed and sent per transaction
+SEND_CHUNK_SIZE = RESEND_BATCH_SIZE
+
+# Failed sends are retried on later runs up to this many times
+MAX_ATTEMPTS = 5
+
+# Emails still unsent this long after their send time are dropped
+MAX_SEND_DELAY = timedelta(days=2)
+
+
+def pending_followups(model, now=None):
+    """Follow-up emails of `model` that may still be sent, now or later."""
+    now = now or timezone.now()
+    return model.objects.filter(
+        sent=False,
+        attempts__lt=MAX_ATTEMPTS,
+        scheduled_for__gte=now - MAX_SEND_DELAY,
+    )
+
+
+def is_enrolled(customer_email: str) -> bool:
+    """Whether the address still has pending emails in the freebie or opt-in sequence."""
+    customer_email = customer_email.lower()
+    return (
+        pending_followups(ScheduledFollowupEmail).filter(customer_email=customer_email).exists()
+        or pending_followups(ScheduledOptinEmail).filter(customer_email=customer_email).exists()
+    )
+
+
+def _scheduled_steps(order, templates, scheduled_model) -> list:
+    customer_email = order.customer_email.lower()
+    scheduled = []
+    for template in templates:
+        scheduled_for = (order.created_at + timedelta(days=template.delay_days)).replace(
+            hour=template.send_time.hour,
+            minute=template.send_time.minute,
+            second=0,
+            microsecond=0
+        )
+        scheduled.append(scheduled_model(
+            order=order,
+            customer_email=customer_email,
+            email_template=template,
+            scheduled_for=scheduled_for
+        ))
+    return scheduled
+
+
+def enroll(order, template_model, scheduled_model) -> int:
+    """
+    Schedule every active step of a sequence for an order in one insert.
+
+    Args:
+        order: The completed Order
+        template_model: FreebieFollowupEmail or OptinFollowupEmail
+        scheduled_model: The matching ScheduledFollowupEmail or ScheduledOptinEmail
+
+    Returns:
+        int: Number of emails scheduled
+    """
+    templates = template_model.objects.filter(is_active=True).order_by('step_number')
+    scheduled = _scheduled_steps(order, templates, scheduled_model)
+    scheduled_model.objects.bulk_create(scheduled)
+    return len(scheduled)
+
+
+def enroll_orders(orders, template_model, scheduled_model) -> int:
+    """
+    Enroll a batch of completed orders in a sequence: one lookup of already
+    enrolled addresses, one read of the steps and one insert for the batch.
+    Each address is enrolled once, by its first order in the batch.
+
+    Returns:
+        int: Number of orders enrolled
+    """
+    emails = {order.customer_email.lower() for order in orders if order.customer_email}
+    enrolled = set()
+    for model in (ScheduledFollowupEmail, ScheduledOptinEmail):
+        enrolled.update(
+            pending_followups(model).filter(customer_email__in=emails).values_list('customer_email', flat=True)
+        )
+
+    templates = list(template_model.objects.filter(is_active=True).order_by('step_number'))
+    scheduled = []
+    enrolled_count = 0
+    for order in orders:
+        customer_email = order.customer_email.lower()
+        if not customer_email or customer_email in enrolled:
+            continue
+        enrolled.add(customer_email)
+        scheduled.extend(_scheduled_steps(order, templates, scheduled_model))
+        enrolled_count += 1
+    scheduled_model.objects.bulk_create(scheduled)
+    return enrolled_count
+
+
+def due_followups(model, now=None):
+    """Pending follow-up emails of `model` whose send time has passed."""
+    now = now or timezone.now()
+    return pending_followups(model, now).filter(scheduled_for__lte=now)
+
+
+def send_due_followups(model, template_name: str, now=None) -> dict:
+    """
+    Send every due follow-up email of `model` (ScheduledFollowupEmail or
+    ScheduledOptinEmail) with the given email template.
+
+    Returns:
+        dict: {'sent': int, 'failed': int}
+    """
+    now = now or timezone.now()
+    sent_count = 0
+    failed_count = 0
+    # Rows that failed in this run are left for the next one
+    failed_ids = []
+    # Seller template variables, shared by every email of a seller in this run
+    seller_cache = {}
+
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                due_followups(model, now)
+                .exclude(id__in=failed_ids)
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related(
+                    'order', 'email_template', 'order__custom_link',
+                    'order__custom_link__user_profile', 'order__custom_link__user_profile__user'
+                )
+                .order_by('scheduled_for', 'id')[:SEND_CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+
+            to_send = []
+            params = []
+            for scheduled_email in chunk:
+                try:
+                    params.append(build_followup_email(scheduled_email, template_name, seller_cache))
+                    to_send.append(scheduled_email)
+                except Exception as e:
+                    logger.error(f"Failed to build scheduled email {scheduled_email.id}: {e}")
+                    scheduled_email.error_message = str(e)
+                    scheduled_email.attempts += 1
+
+            results = send_batch_emails(params)
+            try:
+                errors = dict(zip((email.id for email in to_send), results, strict=True))
+            except ValueError:
+                # Results cannot be matched to emails, so none of them count as sent
+                error = f"Expected {len(to_send)} send results, got {len(results)}"
+                logger.error(f"Follow-up chunk of {len(to_send)} emails failed: {error}")
+                errors = dict.fromkeys((email.id for email in to_send), error)
+            sent_at = timezone.now()
+            for scheduled_email in chunk:
+                if scheduled_email.id in errors and errors[scheduled_email.id] is None:
+                    scheduled_email.sent = True
+                    scheduled_email.sent_at = sent_at
+                    scheduled_email.error_message = ''
+                    sent_count += 1
+                    continue
+                if scheduled_email.id in errors:
+                    scheduled_email.error_message = errors[scheduled_email.id]
+                    scheduled_email.attempts += 1
+                failed_ids.append(scheduled_email.id)
+                failed_count += 1
+
+            model.objects.bulk_update(chunk, ['sent', 'sent_at', 'error_message', 'attempts'])
+
+    return {'sent': sent_count, 'failed': failed_count}
@@ -6,8 +6,12 @@ for Gmail accounts.
 """
 import base64
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any
+from datetime import UTC, datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -16,9 +20,12 @@ import json
 
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from cryptography.fernet import Fernet
 
@@ -26,6 +33,43 @@ from ...models import EmailAccount, EmailMessage, EmailAttachment, User
 
 logger = logging.getLogger(__name__)
 
+# Built service objects are reused across calls. httplib2 connections are not
+# thread safe, so the cache is per thread (and therefore per worker process),
+# and it keeps only the most recently used accounts.
+_clients = threading.local()
+CLIENT_CACHE_SIZE = 200
+_discovery_document = None
+
+# Token refreshes are serialized per account within the process; the lock
+# for an account goes away once no thread is refreshing it.
+_refresh_locks = weakref.WeakValueDictionary()
+_refresh_locks_guard = threading.Lock()
+
+
+def build_gmail_client(credentials):
+    """
+    Build a Gmail API client from the discovery document bundled with
+    google-api-python-client, instead of fetching it over HTTP each time.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        _discovery_document = get_static_doc('gmail', 'v1')
+    return build_from_document(_discovery_document, credentials=credentials)
+
+
+def _client_cache() -> OrderedDict:
+    if not hasattr(_clients, 'by_account'):
+        _clients.by_account = OrderedDict()
+    return _clients.by_account
+
+
+def _refresh_lock(account_pk: int) -> threading.Lock:
+    with _refresh_locks_guard:
+        lock = _refresh_locks.get(account_pk)
+        if lock is None:
+            lock = _refresh_locks[account_pk] = threading.Lock()
+        return lock
+
 
 class GmailService:
     """
@@ -45,6 +89,28 @@ class GmailService:
         'https://www.googleapis.com/auth/gmail.modify',
     ]
 
+    # Labels mirrored locally, and labels that remove a message from the local mailbox
+    SYNC_LABELS = {'INBOX', 'SENT'}
+    HIDDEN_LABELS = {'TRASH', 'SPAM'}
+
+    # Gmail accepts up to 100 calls per batch request
+    FETCH_BATCH_SIZE = 100
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+    # Token refresh coordination between workers
+    REFRESH_LOCK_TIMEOUT = 30
+    REFRESH_WAIT_ATTEMPTS = 10
+
+    # Sync only downloads headers; bodies are fetched when a message is opened
+    METADATA_HEADERS = ['From', 'To', 'Cc', 'Subject', 'Date']
+
+    # Columns overwritten when a synced message already exists. Bodies are
+    # left alone so a re-sync does not discard an already hydrated message.
+    MESSAGE_SYNC_FIELDS = [
+        'thread_id', 'from_email', 'from_name', 'to_emails', 'cc_emails', 'subject',
+        'snippet', 'received_at', 'is_read', 'is_starred', 'has_attachments', 'labels',
+    ]
+
     def __init__(self, email_account: EmailAccount = None):
         self.email_account = email_account
         self.client_id = getattr(settings, 'GOOGLE_EMAIL_CLIENT_ID', '')
@@ -94,7 +160,7 @@ class GmailService:
 
         return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
 
-    def exchange_code_for_token(self, auth_code: str) -> Dict[str, Any]:
+    def exchange_code_for_token(self, auth_code: str) -> dict[str, Any]:
         """
         Exchange authorization code for access and refresh tokens.
 
@@ -130,7 +196,7 @@ class GmailService:
                 scopes=self.SCOPES
             )
 
-            service = build('gmail', 'v1', credentials=creds)
+            service = build_gmail_client(creds)
             profile = service.users().getProfile(userId='me').execute()
 
             return {
@@ -198,21 +264,97 @@ class GmailService:
             token_uri='https://oauth2.googleapis.com/token',
             client_id=self.client_id,
             client_secret=self.client_secret,
-            scopes=self.SCOPES
+            scopes=self.SCOPES,
+            expiry=self._naive_utc(self.email_account.token_expiry),
         )
 
         # Refresh if expired
         if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-
-            # Update stored tokens
-            self.email_account.access_token = self._encrypt_token(creds.token)
-            self.email_account.token_expiry = timezone.now() + timedelta(seconds=3600)
-            self.email_account.save()
+            self._refresh_credentials(creds)
 
         return creds
 
-    def fetch_messages(self, max_results: int = 50, query: str = None) -> List[EmailMessage]:
+    def _get_service(self):
+        """
+        Get the Gmail API client for the account, reusing one built earlier
+        in this worker.
+
+        Clients are keyed by account and dropped when the stored access
+        token changes (e.g. after a reconnect or a refresh elsewhere).
+        """
+        if not self.email_account:
+            raise ValueError("EmailAccount not set")
+
+        clients = _client_cache()
+        cached = clients.get(self.email_account.pk)
+        if cached and cached[0] == self.email_account.access_token:
+            _, creds, service = cached
+            if creds.expired and creds.refresh_token:
+                self._refresh_credentials(creds)
+        else:
+            creds = self._get_credentials()
+            service = build_gmail_client(creds)
+        clients[self.email_account.pk] = (self.email_account.access_token, creds, service)
+        clients.move_to_end(self.email_account.pk)
+        while len(clients) > CLIENT_CACHE_SIZE:
+            clients.popitem(last=False)
+        return service
+
+    def _refresh_credentials(self, creds: Credentials):
+        """
+        Refresh an expired access token, once across all workers.
+
+        The worker that takes the lock refreshes and stores the token; the
+        others wait for it and reuse the stored token instead of refreshing
+        the same account in parallel.
+        """
+        lock_key = f"gmail_token_refresh:{self.email_account.pk}"
+        with _refresh_lock(self.email_account.pk):
+            acquired = False
+            for _ in range(self.REFRESH_WAIT_ATTEMPTS):
+                if self._load_stored_token(creds):
+                    return
+                acquired = cache.add(lock_key, True, self.REFRESH_LOCK_TIMEOUT)
+                if acquired:
+                    break
+                time.sleep(0.5)
+
+            # If the other worker did not finish in time, refresh anyway
+            try:
+                creds.refresh(Request())
+                self.email_account.access_token = self._encrypt_token(creds.token)
+                self.email_account.token_expiry = timezone.now() + timedelta(seconds=3600)
+                EmailAccount.objects.filter(pk=self.email_account.pk).update(
+                    access_token=self.email_account.access_token,
+                    token_expiry=self.email_account.token_expiry,
+                )
+            finally:
+                if acquired:
+                    cache.delete(lock_key)
+
+    def _load_stored_token(self, creds: Credentials) -> bool:
+        """Use a token another worker has refreshed, if the stored one is still valid."""
+        stored = EmailAccount.objects.filter(pk=self.email_account.pk).values(
+            'access_token', 'token_expiry'
+        ).first()
+        if not stored or not stored['token_expiry']:
+            return False
+        if stored['token_expiry'] <= timezone.now() + timedelta(seconds=60):
+            return False
+        self.email_account.access_token = stored['access_token']
+        self.email_account.token_expiry = stored['token_expiry']
+        creds.token = self._decrypt_token(stored['access_token'])
+        creds.expiry = self._naive_utc(stored['token_expiry'])
+        return True
+
+    @staticmethod
+    def _naive_utc(value: datetime | None) -> datetime | None:
+        """google-auth compares expiry against a naive UTC timestamp."""
+        if value is None:
+            return None
+        return timezone.make_naive(value, UTC) if timezone.is_aware(value) else value
+
+    def fetch_messages(self, max_results: int = 50, query: str = None) -> list[EmailMessage]:
         """
         Fetch messages from Gmail and store in database.
 
@@ -224,8 +366,7 @@ class GmailService:
             List of EmailMessage instances
         """
         try:
-            creds = self._get_credentials()
-            service = build('gmail', 'v1', credentials=creds)
+            service = self._get_service()
 
             email_messages = []
 
@@ -249,17 +390,10 @@ class GmailService:
                 results = service.users().messages().list(**params).execute()
                 messages = results.get('messages', [])
 
-            for msg in messages:
-                # Get full message details
-                message = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-
-                # Parse message
-                email_msg = self._parse_message(message)
-                if email_msg:
-                    email_messages.append(email_msg)
+            email_messages = self._fetch_and_store(service, [msg['id'] for msg in messages])
 
             self.email_account.last_synced = timezone.now()
-            self.email_account.save()
+            self.email_account.save(update_fields=['last_synced', 'modified_at'])
 
             logger.info(f"Fetched {len(email_messages)} messages for {self.email_account.email_address}")
             return email_messages
@@ -268,8 +402,196 @@ class GmailService:
             logger.error(f"Failed to fetch messages: {e}")
             raise
 
-    def _parse_message(self, message: Dict) -> Optional[EmailMessage]:
-        """Parse Gmail API message response to EmailMessage model."""
+    def _fetch_and_store(self, service, message_ids: list[str]) -> list[EmailMessage]:
+        """
+        Download messages by id in HTTP batches and upsert them in one statement.
+
+        Messages that fail individually (e.g. deleted since they were listed)
+        are logged and skipped; rate-limited or server errors are retried
+        once in a follow-up batch.
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        parsed = {}
+        failed = self._fetch_batched(service, message_ids, parsed)
+        if failed:
+            logger.info(f"Retrying {len(failed)} Gmail message fetches")
+            failed = self._fetch_batched(service, failed, parsed)
+        for message_id in failed:
+            logger.error(f"Giving up on Gmail message {message_id}")
+
+        email_messages = [parsed[message_id] for message_id in message_ids if message_id in parsed]
+        if not email_messages:
+            return []
+        email_messages = EmailMessage.objects.bulk_create(
+            email_messages,
+            update_conflicts=True,
+            unique_fields=['account', 'message_id'],
+            update_fields=self.MESSAGE_SYNC_FIELDS,
+        )
+        EmailMessage.refresh_search_vectors(EmailMessage.objects.filter(
+            account=self.email_account,
+            message_id__in=[m.message_id for m in email_messages]
+        ))
+        return email_messages
+
+    def _fetch_batched(self, service, message_ids: list[str], parsed: dict[str, EmailMessage]) -> list[str]:
+        """
+        Fetch messages with batch HTTP requests of up to FETCH_BATCH_SIZE.
+
+        Parsed messages are added to `parsed`.
+
+        Returns:
+            List of message ids that failed with a retryable error
+        """
+        retry = []
+
+        def handle(request_id, response, exception):
+            if exception is not None:
+                status_code = getattr(getattr(exception, 'resp', None), 'status', None)
+                if status_code in self.RETRYABLE_STATUSES:
+                    retry.append(request_id)
+                else:
+                    logger.warning(f"Failed to fetch Gmail message {request_id}: {exception}")
+                return
+            email_msg = self._parse_message(response)
+            if email_msg:
+                parsed[request_id] = email_msg
+
+        for start in range(0, len(message_ids), self.FETCH_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=handle)
+            for message_id in message_ids[start:start + self.FETCH_BATCH_SIZE]:
+                batch.add(
+                    service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='metadata',
+                        metadataHeaders=self.METADATA_HEADERS
+                    ),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        return retry
+
+    def sync_messages(self, max_results: int = 50) -> dict[str, Any]:
+        """
+        Sync the mailbox, incrementally when possible.
+
+        Accounts with a stored historyId only fetch what changed since then
+        via users.history.list. A full sync (the latest INBOX and SENT
+        messages) runs on first sync, or when Gmail no longer has the
+        stored history id.
+
+        Args:
+            max_results: Maximum number of messages to fetch on a full sync
+
+        Returns:
+            Dict with 'full_sync', 'added', 'updated' and 'deleted' counts
+        """
+        service = self._get_service()
+
+        if self.email_account.history_id:
+            try:
+                return self._sync_history(service)
+            except HttpError as e:
+                if getattr(e.resp, 'status', None) != 404:
+                    logger.error(f"Failed to sync history: {e}")
+                    raise
+                logger.info(
+                    f"History id {self.email_account.history_id} expired for "
+                    f"{self.email_account.email_address}, running full sync"
+                )
+
+        # Read the history id before listing, so changes made during the
+        # full sync are picked up by the next incremental sync
+        profile = service.users().getProfile(userId='me').execute()
+        messages = self.fetch_messages(max_results=max_results)
+        self._save_sync_state(profile['historyId'])
+        return {'full_sync': True, 'added': len(messages), 'updated': 0, 'deleted': 0}
+
+    def _sync_history(self, service) -> dict[str, Any]:
+        """Apply the mailbox changes recorded since the stored history id."""
+        added = {}
+        labels_by_id = {}
+        deleted = set()
+        history_id = self.email_account.history_id
+        page_token = None
+
+        while True:
+            params = {
+                'userId': 'me',
+                'startHistoryId': self.email_account.history_id,
+                'historyTypes': ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            response = service.users().history().list(**params).execute()
+
+            # Records are in chronological order, so later states win
+            for record in response.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    message = item['message']
+                    if self.SYNC_LABELS.intersection(message.get('labelIds', [])):
+                        added[message['id']] = message
+                        deleted.discard(message['id'])
+                for item in record.get('messagesDeleted', []):
+                    message_id = item['message']['id']
+                    deleted.add(message_id)
+                    added.pop(message_id, None)
+                    labels_by_id.pop(message_id, None)
+                for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    message = item['message']
+                    if message['id'] not in deleted:
+                        labels_by_id[message['id']] = message.get('labelIds', [])
+
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        # Trashed or spammed messages leave the local mailbox
+        for message_id, labels in list(labels_by_id.items()):
+            if self.HIDDEN_LABELS.intersection(labels):
+                deleted.add(message_id)
+                added.pop(message_id, None)
+                del labels_by_id[message_id]
+
+        # Newly added messages are downloaded with their current labels
+        stored = self._fetch_and_store(service, list(added))
+        for message_id, labels in labels_by_id.items():
+            if message_id in added:
+                continue
+            EmailMessage.objects.filter(account=self.email_account, message_id=message_id).update(
+                labels=labels,
+                is_read='UNREAD' not in labels,
+                is_starred='STARRED' in labels,
+            )
+        deleted_count = 0
+        if deleted:
+            deleted_count, _ = EmailMessage.objects.filter(
+                account=self.email_account,
+                message_id__in=deleted
+            ).delete()
+
+        self._save_sync_state(history_id)
+        return {
+            'full_sync': False,
+            'added': len(stored),
+            'updated': len(labels_by_id),
+            'deleted': deleted_count,
+        }
+
+    def _save_sync_state(self, history_id: str):
+        """Store the synced history id and sync time without a full save."""
+        self.email_account.history_id = str(history_id or '')
+        self.email_account.last_synced = timezone.now()
+        EmailAccount.objects.filter(pk=self.email_account.pk).update(
+            history_id=self.email_account.history_id,
+            last_synced=self.email_account.last_synced,
+        )
+
+    def _parse_message(self, message: dict) -> EmailMessage | None:
+        """Parse a Gmail API message (metadata or full) into an unsaved EmailMessage."""
         try:
             headers = {h['name']: h['value'] for h in message['payload']['headers']}
 
@@ -291,12 +613,11 @@ class GmailService:
             from email.utils import parsedate_to_datetime
             received_at = parsedate_to_datetime(date_str) if date_str else timezone.now()
 
-            # Get body
-            body_text, body_html = self._extract_body(message['payload'])
-
-            # Check for attachments
-            has_attachments = any(
-                part.get('filename') for part in message['payload'].get('parts', [])
+            # Metadata responses carry no parts; a mixed multipart body is
+            # what Gmail uses for messages with attachments
+            payload = message['payload']
+            has_attachments = payload.get('mimeType') == 'multipart/mixed' or any(
+                part.get('filename') for part in payload.get('parts', [])
             )
 
             # Get labels
@@ -304,35 +625,83 @@ class GmailService:
             is_read = 'UNREAD' not in labels
             is_starred = 'STARRED' in labels
 
-            # Create or update message
-            email_message, created = EmailMessage.objects.update_or_create(
+            return EmailMessage(
                 account=self.email_account,
                 message_id=message['id'],
-                defaults={
-                    'thread_id': message.get('threadId', ''),
-                    'from_email': from_email,
-                    'from_name': from_name,
-                    'to_emails': [e.strip() for e in to_emails if e.strip()],
-                    'cc_emails': [e.strip() for e in cc_emails if e.strip()],
-                    'subject': subject,
-                    'body_text': body_text,
-                    'body_html': body_html,
-                    'snippet': message.get('snippet', ''),
-                    'received_at': received_at,
-                    'is_read': is_read,
-                    'is_starred': is_starred,
-                    'has_attachments': has_attachments,
-                    'labels': labels,
-                }
+                thread_id=message.get('threadId', ''),
+                from_email=from_email,
+                from_name=from_name,
+                to_emails=[e.strip() for e in to_emails if e.strip()],
+                cc_emails=[e.strip() for e in cc_emails if e.strip()],
+                subject=subject,
+                snippet=message.get('snippet', ''),
+                received_at=received_at,
+                is_read=is_read,
+                is_starred=is_starred,
+                has_attachments=has_attachments,
+                labels=labels,
             )
 
-            return email_message
-
         except Exception as e:
             logger.error(f"Failed to parse message: {e}")
             return None
 
-    def _extract_body(self, payload: Dict) -> tuple:
+    def hydrate_message(self, email_message: EmailMessage) -> EmailMessage:
+        """
+        Download the body and attachment metadata of a synced message.
+
+        Sync only stores headers and the snippet; this is called the first
+        time a message is opened and stores the result, so later opens are
+        served from the database.
+
+        Args:
+            email_message: EmailMessage with body_fetched_at unset
+
+        Returns:
+            The updated EmailMessage
+        """
+        try:
+            service = self._get_service()
+            message = service.users().messages().get(
+                userId='me',
+                id=email_message.message_id,
+                format='full'
+            ).execute()
+        except HttpError as e:
+            logger.error(f"Failed to fetch message body: {e}")
+            raise
+
+        payload = message['payload']
+        email_message.body_text, email_message.body_html = self._extract_body(payload)
+        attachments = [
+            EmailAttachment(
+                message=email_message,
+                attachment_id=part['body']['attachmentId'],
+                filename=part['filename'],
+                content_type=part.get('mimeType', '')[:100],
+                size=part['body'].get('size', 0),
+            )
+            for part in self._iter_parts(payload)
+            if part.get('filename') and part.get('body', {}).get('attachmentId')
+        ]
+        email_message.has_attachments = bool(attachments)
+        email_message.body_fetched_at = timezone.now()
+
+        with transaction.atomic():
+            email_message.save(update_fields=['body_text', 'body_html', 'has_attachments', 'body_fetched_at'])
+            email_message.attachments.all().delete()
+            EmailAttachment.objects.bulk_create(attachments)
+            EmailMessage.refresh_search_vectors(EmailMessage.objects.filter(pk=email_message.pk))
+
+        return email_message
+
+    def _iter_parts(self, payload: dict):
+        """Yield all MIME parts of a message payload, depth first."""
+        for part in payload.get('parts', []):
+            yield part
+            yield from self._iter_parts(part)
+
+    def _extract_body(self, payload: dict) -> tuple:
         """Extract text and HTML body from message payload."""
         body_text = ''
         body_html = ''
@@ -363,13 +732,13 @@ class GmailService:
 
     def send_message(
         self,
-        to_emails: List[str],
+        to_emails: list[str],
         subject: str,
         body_html: str,
-        cc_emails: List[str] = None,
-        bcc_emails: List[str] = None,
-        attachments: List[Dict] = None
-    ) -> Dict[str, Any]:
+        cc_emails: list[str] = None,
+        bcc_emails: list[str] = None,
+        attachments: list[dict] = None
+    ) -> dict[str, Any]:
         """
         Send an email via Gmail.
 
@@ -385,8 +754,7 @@ class GmailService:
             Dict with message ID and thread ID
         """
         try:
-            creds = self._get_credentials()
-            service = build('gmail', 'v1', credentials=creds)
+            service = self._get_service()
 
             # Create message
             message = MIMEMultipart()
@@ -436,8 +804,7 @@ class GmailService:
     def mark_as_read(self, message_id: str) -> bool:
         """Mark a message as read."""
         try:
-            creds = self._get_credentials()
-            service = build('gmail', 'v1', credentials=creds)
+            service = self._get_service()
 
             service.users().messages().modify(
                 userId='me',
@@ -460,8 +827,7 @@ class GmailService:
     def delete_message(self, message_id: str) -> bool:
         """Move message to trash."""
         try:
-            creds = self._get_credentials()
-            service = build('gmail', 'v1', credentials=creds)
+            service = self._get_service()
 
             service.users().messages().trash(
                 userId='me',
@@ -480,11 +846,55 @@ class GmailService:
             logger.error(f"Failed to delete message: {e}")
             return False
 
+    def watch_mailbox(self, topic_name: str) -> dict[str, Any]:
+        """
+        Register (or renew) Gmail push notifications for INBOX and SENT changes.
+
+        Args:
+            topic_name: Pub/Sub topic, e.g. 'projects/<project>/topics/<topic>'
+
+        Returns:
+            Dict with 'historyId' and 'expiration' (epoch milliseconds)
+        """
+        try:
+            service = self._get_service()
+            result = service.users().watch(userId='me', body={
+                'topicName': topic_name,
+                'labelIds': sorted(self.SYNC_LABELS),
+                'labelFilterBehavior': 'include',
+            }).execute()
+        except HttpError as e:
+            logger.error(f"Failed to watch mailbox: {e}")
+            raise
+
+        self.email_account.watch_expires_at = datetime.fromtimestamp(
+            int(result['expiration']) / 1000, tz=UTC
+        )
+        EmailAccount.objects.filter(pk=self.email_account.pk).update(
+            watch_expires_at=self.email_account.watch_expires_at
+        )
+        return result
+
+    def stop_watch(self) -> bool:
+        """Stop Gmail push notifications for the account."""
+        try:
+            self._get_service().users().stop(userId='me').execute()
+        except HttpError as e:
+            logger.error(f"Failed to stop mailbox watch: {e}")
+            return False
+
+        self.email_account.watch_expires_at = None
+        EmailAccount.objects.filter(pk=self.email_account.pk).update(watch_expires_at=None)
+        return True
+
     def disconnect_account(self) -> bool:
         """Disconnect Gmail account."""
         try:
+            if self.email_account.watch_expires_at and self.email_account.watch_expires_at > timezone.now():
+                self.stop_watch()
             self.email_account.is_active = False
-            self.email_account.save()
+            self.email_account.save(update_fields=['is_active', 'modified_at'])
+            _client_cache().pop(self.email_account.pk, None)
             logger.info(f"Gmail account disconnected: {self.email_account.email_address}")
             return True
         except Exception as e:
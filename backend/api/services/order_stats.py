@@ -0,0 +1,178 @@
+"""
+Order statistics rollups for the seller dashboard.
+
+OrderStats holds one row of counters per product (total and per status) and
+OrderDailyStats the number of orders created per product and day. Both are
+moved with UPDATE ... SET x = x + n from the Order post_save and post_delete
+signals, inside the transaction that saved or deleted the order, so the stats endpoint
+reads a seller's product rows through one indexed query however many orders
+they have.
+
+Revenue is not stored: it is completed orders times the product's current
+price, as before, which the endpoint works out from the product rows. The
+30 day order count is summed from the daily rows, so it covers whole days
+(today and the 29 before it).
+
+rebuild_order_stats() recomputes a product's rows from its orders.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import CustomLink, Order, OrderDailyStats, OrderStats
+
+logger = logging.getLogger(__name__)
+
+# OrderStats counter of each order status
+STATUS_COUNTERS = {
+    'pending': 'pending_orders',
+    'completed': 'completed_orders',
+    'cancelled': 'cancelled_orders',
+}
+
+RECENT_DAYS = 30
+TOP_PRODUCTS = 10
+
+
+def _increment(model, lookup: dict[str, Any], deltas: dict[str, int], defaults=None) -> None:
+    """
+    Add deltas to the counters of the row matching lookup. When the row is
+    missing it is created with the fields returned by defaults(), unless
+    defaults is None (the product is being deleted).
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    update = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**update) or defaults is None:
+        return
+    model.objects.bulk_create([model(**lookup, **defaults())], ignore_conflicts=True)
+    model.objects.filter(**lookup).update(**update)
+
+
+def _stats_defaults(custom_link_id):
+    def defaults():
+        user_id = CustomLink.objects.filter(pk=custom_link_id).values_list('user_profile__user_id', flat=True).first()
+        return {'user_id': user_id}
+    return defaults
+
+
+def _status_deltas(status: str, sign: int) -> dict[str, int]:
+    counter = STATUS_COUNTERS.get(status)
+    return {counter: sign} if counter else {}
+
+
+def record_order_created(order) -> None:
+    """Count a new order."""
+    _increment(
+        OrderStats, {'custom_link_id': order.custom_link_id},
+        {'total_orders': 1, **_status_deltas(order.status, 1)},
+        defaults=_stats_defaults(order.custom_link_id)
+    )
+    _increment(
+        OrderDailyStats, {'custom_link_id': order.custom_link_id, 'date': timezone.localdate(order.created_at)},
+        {'orders': 1}, defaults=dict
+    )
+
+
+def record_status_change(custom_link_id, previous_status: str, status: str) -> None:
+    """Move one order from one status counter to another."""
+    record_status_changes({(custom_link_id, previous_status): 1}, status)
+
+
+def record_status_changes(changes: dict[tuple, int], status: str) -> None:
+    """
+    Apply a bulk status update. `changes` counts the updated orders by
+    (custom_link_id, previous status).
+    """
+    deltas_by_link = {}
+    for (custom_link_id, previous_status), count in changes.items():
+        deltas = deltas_by_link.setdefault(custom_link_id, {})
+        for field, delta in _status_deltas(previous_status, -count).items():
+            deltas[field] = deltas.get(field, 0) + delta
+        for field, delta in _status_deltas(status, count).items():
+            deltas[field] = deltas.get(field, 0) + delta
+    for custom_link_id, deltas in deltas_by_link.items():
+        _increment(OrderStats, {'custom_link_id': custom_link_id}, deltas, defaults=_stats_defaults(custom_link_id))
+
+
+def record_order_deleted(order) -> None:
+    """Uncount a deleted order. Rows of a product being deleted are left to its cascade."""
+    _increment(
+        OrderStats, {'custom_link_id': order.custom_link_id},
+        {'total_orders': -1, **_status_deltas(order.status, -1)}
+    )
+    _increment(
+        OrderDailyStats, {'custom_link_id': order.custom_link_id, 'date': timezone.localdate(order.created_at)},
+        {'orders': -1}
+    )
+
+
+def seller_order_stats(user) -> dict[str, Any]:
+    """
+    Order statistics of a seller's products, for OrderViewSet.stats, read
+    from their OrderStats rows in one query.
+    """
+    since = timezone.localdate() - timedelta(days=RECENT_DAYS - 1)
+    recent = OrderDailyStats.objects.filter(
+        custom_link_id=OuterRef('custom_link_id'), date__gte=since
+    ).order_by().values('custom_link_id').annotate(total=Sum('orders')).values('total')
+    rows = list(
+        OrderStats.objects.filter(user=user)
+        .select_related('custom_link')
+        .annotate(recent_orders=Coalesce(Subquery(recent, output_field=IntegerField()), 0))
+    )
+
+    total_revenue = Decimal('0.00')
+    for row in rows:
+        link = row.custom_link
+        # Discounted price when set, otherwise the regular price
+        price = link.checkout_discounted_price if link.checkout_discounted_price is not None else link.checkout_price
+        if price is not None:
+            total_revenue += price * row.completed_orders
+
+    by_product = sorted((row for row in rows if row.total_orders), key=lambda row: -row.total_orders)
+    return {
+        'total_orders': sum(row.total_orders for row in rows),
+        'pending_orders': sum(row.pending_orders for row in rows),
+        'completed_orders': sum(row.completed_orders for row in rows),
+        'cancelled_orders': sum(row.cancelled_orders for row in rows),
+        'total_revenue': float(total_revenue),
+        'recent_orders_30d': sum(row.recent_orders for row in rows),
+        'orders_by_product': [
+            {'custom_link__id': row.custom_link_id, 'custom_link__title': row.custom_link.title, 'count': row.total_orders}
+            for row in by_product[:TOP_PRODUCTS]
+        ],
+    }
+
+
+def rebuild_order_stats(custom_link) -> OrderStats:
+    """Recompute a product's OrderStats and OrderDailyStats rows from its orders."""
+    orders = Order.objects.filter(custom_link=custom_link)
+    counts = orders.aggregate(
+        total_orders=Count('id'),
+        **{counter: Count('id', filter=Q(status=status)) for status, counter in STATUS_COUNTERS.items()}
+    )
+    days = (
+        orders.annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .order_by()
+        .values('date')
+        .annotate(orders=Count('id'))
+    )
+
+    with transaction.atomic():
+        stats, _ = OrderStats.objects.update_or_create(
+            custom_link=custom_link,
+            defaults={'user_id': custom_link.user_profile.user_id, **counts}
+        )
+        OrderDailyStats.objects.filter(custom_link=custom_link).delete()
+        OrderDailyStats.objects.bulk_create([
+            OrderDailyStats(custom_link=custom_link, date=day['date'], orders=day['orders']) for day in days
+        ])
+    return stats
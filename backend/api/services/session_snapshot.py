@@ -0,0 +1,121 @@
+"""
+Cached session snapshot for the dashboard shell.
+
+On every load the dashboard needs the current user, their permissions, the
+iframe menu items they can open and the active plans. The snapshot endpoint
+returns all of them from two cache entries:
+
+- a per-user part: the user's name fields, their serialized UserPermissions
+  and the ids of the iframe menu items they can access, dropped when the
+  user, their permissions or their menu access change;
+- a shared part: the active iframe menu items and the active plans with
+  their features, dropped when an IframeMenuItem, Plan or PlanFeature is
+  saved or deleted.
+
+Both are read with one cache.get_many(), so a warm load runs no queries;
+the user's menu is the shared items filtered by their ids. Each part gets a
+new random version when it is built, and the snapshot's version (sent as
+the ETag) joins the two, so clients can revalidate with If-None-Match.
+SNAPSHOT_SCHEMA is part of the cache keys; bump it when the snapshot's shape
+changes so old entries are not read.
+"""
+import logging
+import uuid
+from typing import Any
+
+from django.core.cache import cache
+
+from ..models import IframeMenuItem, Plan, User, UserPermissions
+from ..serializers import (
+    IframeMenuItemSerializer,
+    PlanSerializer,
+    UserPermissionsSerializer,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SCHEMA = 1
+CACHE_TIMEOUT = 600
+
+SHARED_KEY = f"session_snapshot:{SNAPSHOT_SCHEMA}:shared"
+
+
+def _user_key(user_id) -> str:
+    return f"session_snapshot:{SNAPSHOT_SCHEMA}:user:{user_id}"
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def build_user_part(user_id) -> dict[str, Any] | None:
+    """The per-user part of the snapshot, or None if there is no active user with that id."""
+    me = User.objects.filter(pk=user_id, is_active=True).values('username', 'first_name', 'last_name').first()
+    if me is None:
+        return None
+
+    # Created with the user; not created here, so reads never write
+    permissions = UserPermissions.objects.filter(user_id=user_id).first()
+    return {
+        'version': _new_version(),
+        'me': me,
+        'permissions': dict(UserPermissionsSerializer(permissions).data) if permissions else None,
+        'iframe_menu_item_ids': list(
+            permissions.accessible_iframe_menu_items.values_list('id', flat=True)
+        ) if permissions else [],
+    }
+
+
+def build_shared_part() -> dict[str, Any]:
+    """The snapshot part every user shares: active iframe menu items and plans."""
+    items = IframeMenuItem.objects.filter(is_active=True).order_by('order', 'created_at')
+    plans = Plan.objects.filter(is_active=True).order_by('sort_order', 'price').prefetch_related('features')
+    return {
+        'version': _new_version(),
+        'iframe_menu_items': [dict(item) for item in IframeMenuItemSerializer(items, many=True).data],
+        'plans': [dict(plan) for plan in PlanSerializer(plans, many=True).data],
+    }
+
+
+def get_session_snapshot(user_id) -> dict[str, Any] | None:
+    """
+    The session snapshot of a user, built and cached as needed.
+
+    Returns:
+        dict, or None if there is no active user with that id
+    """
+    user_key = _user_key(user_id)
+    cached = cache.get_many([user_key, SHARED_KEY])
+
+    user_part = cached.get(user_key)
+    if user_part is None:
+        user_part = build_user_part(user_id)
+        if user_part is None:
+            return None
+        cache.set(user_key, user_part, CACHE_TIMEOUT)
+
+    shared = cached.get(SHARED_KEY)
+    if shared is None:
+        shared = build_shared_part()
+        cache.set(SHARED_KEY, shared, CACHE_TIMEOUT)
+
+    accessible = set(user_part['iframe_menu_item_ids'])
+    return {
+        'version': f"{SNAPSHOT_SCHEMA}.{user_part['version']}.{shared['version']}",
+        'me': user_part['me'],
+        'permissions': user_part['permissions'],
+        'iframe_menu_items': [item for item in shared['iframe_menu_items'] if item['id'] in accessible],
+        'plans': shared['plans'],
+    }
+
+
+def invalidate_user_snapshot(user_id) -> None:
+    cache.delete(_user_key(user_id))
+
+
+def invalidate_user_snapshots(user_ids) -> None:
+    cache.delete_many([_user_key(user_id) for user_id in user_ids])
+
+
+def invalidate_shared_snapshot() -> None:
+    cache.delete(SHARED_KEY)
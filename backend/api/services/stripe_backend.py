@@ -0,0 +1,227 @@
+"""
+Pluggable backend for Stripe API calls.
+
+settings.STRIPE_BACKEND picks where the stripe SDK sends its requests:
+
+- "live": api.stripe.com, with STRIPE_SECRET_KEY (the default).
+- "stripe-mock": a stripe-mock server (github.com/stripe/stripe-mock) at
+  STRIPE_API_BASE. It validates requests against Stripe's OpenAPI spec but
+  returns fixture objects, so ids and amounts do not follow the request.
+- "local": LocalStripeClient, an in-process stand-in installed as the SDK's
+  HTTP client. It keeps the objects it creates in memory, so a PaymentIntent
+  created by initialize-payment can be modified by finalize-order, and waits
+  STRIPE_LOCAL_LATENCY_MS per call to stand in for the network round trip.
+
+configure_stripe() applies the setting to the stripe module and is what
+init_stripe() in the Stripe services calls, so every checkout code path
+uses the same backend. The local backend is meant for load tests
+(manage.py load_test_checkout) and offline development: it implements the
+create, retrieve, modify, delete and list calls this app makes, not
+Stripe's business rules.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+import stripe
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# API path of each collection: (object type, id prefix)
+COLLECTIONS = {
+    'accounts': ('account', 'acct'),
+    'account_links': ('account_link', 'acctlink'),
+    'billing_portal/sessions': ('billing_portal.session', 'bps'),
+    'charges': ('charge', 'ch'),
+    'checkout/sessions': ('checkout.session', 'cs_test'),
+    'customers': ('customer', 'cus'),
+    'payment_intents': ('payment_intent', 'pi'),
+    'prices': ('price', 'price'),
+    'products': ('product', 'prod'),
+    'refunds': ('refund', 're'),
+    'subscriptions': ('subscription', 'sub'),
+    'transfers': ('transfer', 'tr'),
+}
+
+# Fields Stripe fills in on creation, by object type
+OBJECT_DEFAULTS = {
+    'account': lambda object_id: {
+        'charges_enabled': False, 'payouts_enabled': False, 'details_submitted': False,
+        'default_currency': 'usd', 'metadata': {},
+    },
+    'account_link': lambda object_id: {
+        'url': f'https://connect.stripe.com/setup/e/{object_id}', 'expires_at': int(time.time()) + 300,
+    },
+    'billing_portal.session': lambda object_id: {'url': f'https://billing.stripe.com/p/session/{object_id}'},
+    'checkout.session': lambda object_id: {
+        'url': f'https://checkout.stripe.com/c/pay/{object_id}', 'client_secret': f'{object_id}_secret_local',
+        'status': 'open', 'payment_status': 'unpaid', 'payment_intent': None, 'metadata': {},
+    },
+    'login_link': lambda object_id: {'url': f'https://connect.stripe.com/express/{object_id}'},
+    'payment_intent': lambda object_id: {
+        'client_secret': f'{object_id}_secret_local', 'status': 'requires_payment_method', 'currency': 'usd',
+        'amount_received': 0, 'application_fee_amount': None, 'latest_charge': None, 'metadata': {},
+    },
+    'price': lambda object_id: {'active': True, 'metadata': {}},
+    'product': lambda object_id: {'active': True, 'metadata': {}},
+    'refund': lambda object_id: {'status': 'succeeded', 'metadata': {}},
+    'subscription': lambda object_id: {'status': 'active', 'metadata': {}},
+}
+
+
+def _parse_value(value: str, raw: bool) -> Any:
+    """Form-encoded values are strings; numbers and booleans are typed like Stripe's responses."""
+    if raw:
+        return value
+    if value.isdigit():
+        return int(value)
+    if value in ('true', 'false'):
+        return value == 'true'
+    return value
+
+
+def _listify(value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    value = {key: _listify(item) for key, item in value.items()}
+    if value and all(key.isdigit() for key in value):
+        return [value[key] for key in sorted(value, key=int)]
+    return value
+
+
+def parse_params(encoded: str | None) -> dict[str, Any]:
+    """Nested form parameters (metadata[order_id]=..., line_items[0][price]=...) as a dict."""
+    params: dict[str, Any] = {}
+    for key, value in parse_qsl(encoded or '', keep_blank_values=True):
+        parts = key.replace(']', '').split('[')
+        if parts[-1] == '':
+            # expand[] and other list-append keys are not needed by the stand-in
+            continue
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = _parse_value(value, raw='metadata' in parts[:-1])
+    return _listify(params)
+
+
+def _merge(target: dict[str, Any], params: dict[str, Any]) -> None:
+    for key, value in params.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+class LocalStripeClient(stripe.HTTPClient):
+    """In-memory Stripe API stand-in, installed as stripe.default_http_client."""
+
+    name = 'local'
+
+    def __init__(self, latency_ms: int = 0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.objects: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def request(self, method, url, headers, post_data=None, *, _usage=None) -> tuple[str, int, dict[str, str]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        parsed = urlsplit(url)
+        params = parse_params(post_data if method == 'post' else parsed.query)
+        path = parsed.path.strip('/')
+        if path.startswith('v1/'):
+            path = path[len('v1/'):]
+
+        with self._lock:
+            body, status = self._dispatch(method, path, params)
+            content = json.dumps(body)
+        headers = {'request-id': f'req_local_{next(self._ids)}', 'content-type': 'application/json'}
+        return content, status, headers
+
+    def close(self):
+        pass
+
+    def reset(self) -> None:
+        with self._lock:
+            self.objects.clear()
+
+    def _dispatch(self, method: str, path: str, params: dict[str, Any]) -> tuple[dict[str, Any], int]:
+        if path == 'balance':
+            return {'object': 'balance', 'livemode': False, 'available': [{'amount': 0, 'currency': 'usd'}],
+                    'pending': [{'amount': 0, 'currency': 'usd'}]}, 200
+
+        if path in COLLECTIONS:
+            object_type, prefix = COLLECTIONS[path]
+            if method == 'post':
+                return self._create(object_type, prefix, params), 200
+            data = [obj for obj in self.objects.values() if obj['object'] == object_type]
+            return {'object': 'list', 'url': f'/v1/{path}', 'has_more': False, 'data': data}, 200
+
+        collection, _, object_id = path.rpartition('/')
+        if collection in COLLECTIONS:
+            obj = self.objects.get(object_id)
+            if obj is None:
+                return self._missing(object_id), 404
+            if method == 'post':
+                _merge(obj, params)
+            elif method == 'delete':
+                del self.objects[object_id]
+                return {'id': object_id, 'object': obj['object'], 'deleted': True}, 200
+            return obj, 200
+
+        # Sub-resources such as accounts/{id}/login_links
+        parent_path, _, action = path.rpartition('/')
+        parent_collection, _, parent_id = parent_path.rpartition('/')
+        if parent_collection in COLLECTIONS and method == 'post':
+            if parent_id not in self.objects:
+                return self._missing(parent_id), 404
+            object_type = action[:-1] if action.endswith('s') else action
+            return self._create(object_type, object_type.replace('_', ''), params), 200
+
+        return {'error': {'type': 'invalid_request_error', 'message': f'Unrecognized request URL (/v1/{path})'}}, 404
+
+    def _create(self, object_type: str, prefix: str, params: dict[str, Any]) -> dict[str, Any]:
+        object_id = f'{prefix}_local{next(self._ids):012d}'
+        obj = {'id': object_id, 'object': object_type, 'created': int(time.time()), 'livemode': False}
+        obj.update(OBJECT_DEFAULTS.get(object_type, lambda object_id: {})(object_id))
+        _merge(obj, params)
+        self.objects[object_id] = obj
+        return obj
+
+    @staticmethod
+    def _missing(object_id: str) -> dict[str, Any]:
+        return {'error': {
+            'type': 'invalid_request_error', 'code': 'resource_missing',
+            'message': f"No such object: '{object_id}'", 'param': 'id',
+        }}
+
+
+def configure_stripe():
+    """Point the stripe module at the backend chosen by settings.STRIPE_BACKEND."""
+    backend = getattr(settings, 'STRIPE_BACKEND', 'live')
+    api_key = settings.STRIPE_SECRET_KEY
+
+    if backend == 'local':
+        if not isinstance(stripe.default_http_client, LocalStripeClient):
+            stripe.default_http_client = LocalStripeClient()
+        stripe.default_http_client.latency_ms = settings.STRIPE_LOCAL_LATENCY_MS
+        stripe.api_base = stripe.DEFAULT_API_BASE
+        api_key = api_key or 'sk_test_local'
+    else:
+        if isinstance(stripe.default_http_client, LocalStripeClient):
+            stripe.default_http_client = None
+        if backend == 'stripe-mock':
+            stripe.api_base = settings.STRIPE_API_BASE
+            # stripe-mock accepts any test key
+            api_key = api_key or 'sk_test_123'
+        else:
+            stripe.api_base = stripe.DEFAULT_API_BASE
+
+    stripe.api_key = api_key
+    return stripe
@@ -1,16 +1,18 @@
 """
 Stripe Connect Service for handling all Connect-related operations
 """
+import hashlib
+import json
 import logging
 import datetime
 from decimal import Decimal
-from typing import Optional, Dict, Any, Tuple
+from typing import Any
 
 import stripe
-from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
+from .stripe_backend import configure_stripe
 from ..models import (
     User, UserProfile, CustomLink, Order, 
     StripeConnectAccount, PaymentTransaction, ConnectWebhookEvent
@@ -20,15 +22,14 @@ logger = logging.getLogger(__name__)
 
 
 def init_stripe():
-    """Initialize Stripe with API key"""
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-    return stripe
+    """Initialize Stripe with API key and the configured backend"""
+    return configure_stripe()
 
 
 class StripeConnectService:
     """Service class for handling Stripe Connect operations"""
 
-    def create_express_account(self, user: User, email: Optional[str] = None, country: Optional[str] = None) -> StripeConnectAccount:
+    def create_express_account(self, user: User, email: str | None = None, country: str | None = None) -> StripeConnectAccount:
         """
         Create a new Stripe Express account for a user.
 
@@ -112,7 +113,7 @@ class StripeConnectService:
             logger.error(f"Stripe error creating account link for {account_id}: {e}")
             raise
 
-    def get_account_status(self, account_id: str) -> Dict[str, Any]:
+    def get_account_status(self, account_id: str) -> dict[str, Any]:
         """
         Get the current status of a Stripe Connect account.
         """
@@ -181,6 +182,86 @@ class StripeConnectService:
             logger.error(f"Stripe error creating login link for {account_id}: {e}")
             raise
 
+    @staticmethod
+    def _product_data(custom_link: CustomLink) -> dict[str, Any]:
+        return {
+            'name': custom_link.title or custom_link.checkout_title or 'Digital Product',
+            'description': custom_link.subtitle or '',
+            'images': [custom_link.checkout_image.url] if custom_link.checkout_image else [],
+        }
+
+    @classmethod
+    def price_key(cls, custom_link: CustomLink, currency: str, unit_amount: int) -> str:
+        """
+        Fingerprint of the Stripe Price a link needs. Any change to the
+        amount, currency or product details gives a different key.
+        """
+        payload = json.dumps([currency, unit_amount, cls._product_data(custom_link)], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def _line_item(self, custom_link: CustomLink, currency: str, price_cents: int) -> dict[str, Any]:
+        """
+        Checkout line item for a link: its pre-created Price when that is
+        still current, otherwise inline price_data.
+        """
+        if custom_link.stripe_price_id and custom_link.stripe_price_key == self.price_key(custom_link, currency, price_cents):
+            return {'price': custom_link.stripe_price_id, 'quantity': 1}
+        return {
+            'price_data': {
+                'currency': currency,
+                'product_data': self._product_data(custom_link),
+                'unit_amount': price_cents,
+            },
+            'quantity': 1,
+        }
+
+    def sync_product_price(self, custom_link: CustomLink, connect_account: StripeConnectAccount) -> str | None:
+        """
+        Create (or refresh) the Stripe Product and Price checkout sessions
+        use for a link, so session creation does not define them inline.
+
+        Returns:
+            The current Price id, or None for free links
+        """
+        if not custom_link.checkout_price or custom_link.checkout_price <= 0:
+            return None
+
+        currency = connect_account.default_currency
+        price_cents = int(custom_link.checkout_price * 100)
+        key = self.price_key(custom_link, currency, price_cents)
+        if custom_link.stripe_price_id and custom_link.stripe_price_key == key:
+            return custom_link.stripe_price_id
+
+        init_stripe()
+        product_data = self._product_data(custom_link)
+        metadata = {'custom_link_id': str(custom_link.id)}
+        if custom_link.stripe_product_id:
+            stripe.Product.modify(custom_link.stripe_product_id, **product_data)
+            product_id = custom_link.stripe_product_id
+        else:
+            product_id = stripe.Product.create(metadata=metadata, **product_data).id
+
+        price = stripe.Price.create(
+            product=product_id,
+            currency=currency,
+            unit_amount=price_cents,
+            metadata=metadata,
+        )
+        if custom_link.stripe_price_id:
+            stripe.Price.modify(custom_link.stripe_price_id, active=False)
+
+        # Queryset update, so the link's post_save does not queue another sync
+        CustomLink.objects.filter(pk=custom_link.pk).update(
+            stripe_product_id=product_id,
+            stripe_price_id=price.id,
+            stripe_price_key=key,
+        )
+        custom_link.stripe_product_id = product_id
+        custom_link.stripe_price_id = price.id
+        custom_link.stripe_price_key = key
+        logger.info(f"Synced Stripe price {price.id} for custom link {custom_link.id}")
+        return price.id
+
     def create_checkout_session_for_product(
         self,
         custom_link: CustomLink,
@@ -188,9 +269,9 @@ class StripeConnectService:
         success_url: str,
         cancel_url: str,
         order_id: str,  # Pass the existing order ID instead of creating one
-        customer_email: Optional[str] = None,
-        metadata: Optional[Dict[str, str]] = None
-    ) -> Tuple[str, str]:  # Returns (checkout_url, session_id)
+        customer_email: str | None = None,
+        metadata: dict[str, str] | None = None
+    ) -> tuple[str, str]:  # Returns (checkout_url, session_id)
         """
         Create a Stripe Checkout Session for a product purchase with Connect.
         Uses destination charges to automatically transfer funds to the seller.
@@ -230,18 +311,7 @@ class StripeConnectService:
                     'klarna',           # Multiple regions: Flexible installments
                     'afterpay_clearpay' # US, Canada, UK, AU, NZ: 4 installments
                 ],
-                line_items=[{
-                    'price_data': {
-                        'currency': connect_account.default_currency,
-                        'product_data': {
-                            'name': custom_link.title or custom_link.checkout_title or 'Digital Product',
-                            'description': custom_link.subtitle or '',
-                            'images': [custom_link.checkout_image.url] if custom_link.checkout_image else [],
-                        },
-                        'unit_amount': price_cents,
-                    },
-                    'quantity': 1,
-                }],
+                line_items=[self._line_item(custom_link, connect_account.default_currency, price_cents)],
                 mode='payment',
                 success_url=success_url,
                 cancel_url=cancel_url,
@@ -287,10 +357,10 @@ class StripeConnectService:
         custom_link: CustomLink,
         connect_account: StripeConnectAccount,
         order_id: str,
-        return_url: Optional[str] = None,
-        customer_email: Optional[str] = None,
-        metadata: Optional[Dict[str, str]] = None
-    ) -> Tuple[str, str]:  # Returns (client_secret, session_id)
+        return_url: str | None = None,
+        customer_email: str | None = None,
+        metadata: dict[str, str] | None = None
+    ) -> tuple[str, str]:  # Returns (client_secret, session_id)
         """
         Create a Stripe Embedded Checkout Session for a product purchase with Connect.
         Uses destination charges to automatically transfer funds to the seller.
@@ -334,18 +404,7 @@ class StripeConnectService:
                     'klarna',           # Multiple regions: Flexible installments
                     'afterpay_clearpay' # US, Canada, UK, AU, NZ: 4 installments
                 ],
-                'line_items': [{
-                    'price_data': {
-                        'currency': connect_account.default_currency,
-                        'product_data': {
-                            'name': custom_link.title or custom_link.checkout_title or 'Digital Product',
-                            'description': custom_link.subtitle or '',
-                            'images': [custom_link.checkout_image.url] if custom_link.checkout_image else [],
-                        },
-                        'unit_amount': price_cents,
-                    },
-                    'quantity': 1,
-                }],
+                'line_items': [self._line_item(custom_link, connect_account.default_currency, price_cents)],
                 'mode': 'payment',
                 'payment_intent_data': {
                     'application_fee_amount': platform_fee_cents,
@@ -399,9 +458,9 @@ class StripeConnectService:
         custom_link: 'CustomLink',
         connect_account: StripeConnectAccount,
         order_id: str,
-        customer_email: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
-    ) -> Tuple[str, str]:
+        customer_email: str | None = None,
+        metadata: dict[str, Any] | None = None
+    ) -> tuple[str, str]:
         """
         Create a Stripe PaymentIntent for a product purchase with Connect.
         This is used for inline payment element instead of embedded checkout.
@@ -483,7 +542,7 @@ class StripeConnectService:
             logger.error(f"Error creating payment intent: {e}")
             raise
 
-    def handle_successful_payment(self, payment_intent_id: str) -> Optional[PaymentTransaction]:
+    def handle_successful_payment(self, payment_intent_id: str) -> PaymentTransaction | None:
         """
         Handle a successful payment by updating the transaction and order status.
         """
@@ -532,7 +591,7 @@ class StripeConnectService:
             logger.error(f"Error handling successful payment {payment_intent_id}: {e}")
             raise
 
-    def handle_transfer_created(self, transfer_id: str) -> Optional[PaymentTransaction]:
+    def handle_transfer_created(self, transfer_id: str) -> PaymentTransaction | None:
         """
         Handle when a transfer is created to a connected account.
         """
@@ -569,7 +628,7 @@ class StripeConnectService:
             logger.error(f"Error handling transfer {transfer_id}: {e}")
             raise
 
-    def get_account_balance(self, account_id: str) -> Dict[str, Any]:
+    def get_account_balance(self, account_id: str) -> dict[str, Any]:
         """
         Get the balance for a connected account.
         """
@@ -592,9 +651,9 @@ class StripeConnectService:
     def refund_payment(
         self, 
         payment_intent_id: str, 
-        amount_cents: Optional[int] = None,
+        amount_cents: int | None = None,
         reason: str = 'requested_by_customer'
-    ) -> Dict[str, Any]:
+    ) -> dict[str, Any]:
         """
         Process a refund for a payment. Handles both full and partial refunds.
         """
@@ -10,15 +10,15 @@ import stripe
 from django.conf import settings
 from django.db import transaction
 
+from .stripe_backend import configure_stripe
 from ..models import Plan, StripeCustomer, Subscription, User
 
 logger = logging.getLogger(__name__)
 
 
 def init_stripe():
-    """Initialize Stripe with API key"""
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-    return stripe
+    """Initialize Stripe with API key and the configured backend"""
+    return configure_stripe()
 
 
 def sync_plan_to_stripe(plan: Plan) -> Dict[str, str]:
@@ -4,10 +4,11 @@ Stripe Webhook Handlers for processing payment events
 import json
 import logging
 import datetime
-from typing import Dict, Any
+from typing import Any
 
 import stripe
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from ..models import (
@@ -40,7 +41,7 @@ def verify_webhook_signature(payload: str, sig_header: str) -> stripe.Event:
         raise
 
 
-def handle_webhook_event(event: stripe.Event) -> Dict[str, Any]:
+def handle_webhook_event(event: stripe.Event) -> dict[str, Any]:
     """
     Main webhook handler that routes events to specific handlers.
     """
@@ -159,7 +160,7 @@ def _log_payment_event(event: stripe.Event):
         logger.error(f"Error logging payment event: {e}")
 
 
-def handle_checkout_session_completed(event: stripe.Event) -> Dict[str, Any]:
+def handle_checkout_session_completed(event: stripe.Event) -> dict[str, Any]:
     """
     Handle successful checkout session completion.
     User has completed signup (with or without trial).
@@ -235,7 +236,7 @@ def handle_checkout_session_completed(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "message": str(e)}
 
 
-def handle_subscription_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_subscription_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle new subscription creation.
     """
@@ -306,7 +307,7 @@ def handle_subscription_created(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "message": "Customer not found"}
 
 
-def handle_subscription_updated(event: stripe.Event) -> Dict[str, Any]:
+def handle_subscription_updated(event: stripe.Event) -> dict[str, Any]:
     """
     Handle subscription updates (status changes, plan changes, etc).
     """
@@ -353,7 +354,7 @@ def handle_subscription_updated(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "message": "Subscription not found"}
 
 
-def handle_subscription_deleted(event: stripe.Event) -> Dict[str, Any]:
+def handle_subscription_deleted(event: stripe.Event) -> dict[str, Any]:
     """
     Handle subscription cancellation/deletion.
     """
@@ -383,7 +384,7 @@ def handle_subscription_deleted(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "message": "Subscription not found"}
 
 
-def handle_trial_will_end(event: stripe.Event) -> Dict[str, Any]:
+def handle_trial_will_end(event: stripe.Event) -> dict[str, Any]:
     """
     Handle trial ending soon notification (sent 3 days before trial ends).
     """
@@ -408,7 +409,7 @@ def handle_trial_will_end(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "message": "Subscription not found"}
 
 
-def handle_invoice_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_invoice_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle invoice creation.
     """
@@ -417,7 +418,7 @@ def handle_invoice_created(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_invoice_payment_succeeded(event: stripe.Event) -> Dict[str, Any]:
+def handle_invoice_payment_succeeded(event: stripe.Event) -> dict[str, Any]:
     """
     Handle successful payment (including after trial).
     """
@@ -450,7 +451,7 @@ def handle_invoice_payment_succeeded(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "warning", "message": "Subscription not found"}
 
 
-def handle_invoice_payment_failed(event: stripe.Event) -> Dict[str, Any]:
+def handle_invoice_payment_failed(event: stripe.Event) -> dict[str, Any]:
     """
     Handle failed payment.
     """
@@ -480,7 +481,7 @@ def handle_invoice_payment_failed(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "warning", "message": "Subscription not found"}
 
 
-def handle_invoice_finalized(event: stripe.Event) -> Dict[str, Any]:
+def handle_invoice_finalized(event: stripe.Event) -> dict[str, Any]:
     """
     Handle invoice finalization (ready for payment).
     """
@@ -489,7 +490,7 @@ def handle_invoice_finalized(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_payment_method_attached(event: stripe.Event) -> Dict[str, Any]:
+def handle_payment_method_attached(event: stripe.Event) -> dict[str, Any]:
     """
     Handle payment method attachment to customer.
     """
@@ -498,7 +499,7 @@ def handle_payment_method_attached(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_payment_method_detached(event: stripe.Event) -> Dict[str, Any]:
+def handle_payment_method_detached(event: stripe.Event) -> dict[str, Any]:
     """
     Handle payment method detachment from customer.
     """
@@ -529,131 +530,84 @@ def verify_connect_webhook_signature(payload: str, sig_header: str) -> stripe.Ev
         raise
 
 
-def handle_connect_webhook_event(event: stripe.Event) -> Dict[str, Any]:
+def handle_connect_webhook_event(event: stripe.Event) -> dict[str, Any]:
     """
     Main Connect webhook handler that routes events to specific handlers.
+    Called by the inbox worker (services.connect_webhook_inbox), never
+    inline from the webhook request. Handler errors propagate to the caller.
     """
-    logger.info(f"=== CONNECT WEBHOOK EVENT RECEIVED ===")
+    logger.info(f"=== CONNECT WEBHOOK EVENT ===")
     logger.info(f"Event ID: {event.id}")
     logger.info(f"Event Type: {event.type}")
     logger.info(f"Event Created: {event.created}")
     logger.info(f"Event Livemode: {event.livemode}")
 
-    # Import here to avoid circular imports
-    from ..models import ConnectWebhookEvent
+    handler = CONNECT_EVENT_HANDLERS.get(event.type)
+    if not handler:
+        logger.info(f"Unhandled Connect event type: {event.type}")
+        return {"status": "unhandled"}
 
-    # Check if we've already processed this event
-    if ConnectWebhookEvent.objects.filter(stripe_event_id=event.id).exists():
-        logger.info(f"Connect event {event.id} already processed, skipping")
-        return {"status": "already_processed"}
+    result = handler(event)
+    logger.info(f"Successfully processed Connect {event.type} event {event.id}")
+    return result
 
-    # Map event types to handler functions
-    connect_handlers = {
-        "account.updated": handle_account_updated,
-        "account.application.authorized": handle_account_authorized,
-        "checkout.session.completed": handle_connect_checkout_session_completed,
-        "payment_intent.succeeded": handle_connect_payment_succeeded,
-        "payment_intent.payment_failed": handle_connect_payment_failed,
-        "payment.created": handle_payment_created,
-        "charge.succeeded": handle_payment_created,  # Alternative event name
-        "transfer.created": handle_transfer_created,
-        "transfer.updated": handle_transfer_updated,
-        "payout.created": handle_payout_created,
-        "payout.updated": handle_payout_updated,
-        "charge.dispute.created": handle_charge_dispute_created,
-    }
 
-    handler = connect_handlers.get(event.type)
-    if handler:
-        try:
-            result = handler(event)
-            
-            # Log the event
-            _log_connect_event(event, processed=True)
-            
-            logger.info(f"Successfully processed Connect {event.type} event {event.id}")
-            return result
-        except Exception as e:
-            # Log the event with error
-            _log_connect_event(event, processed=False, error_message=str(e))
-            logger.error(f"Error processing Connect {event.type} event {event.id}: {e}")
-            raise
-    else:
-        # Log unhandled event
-        _log_connect_event(event, processed=False, error_message=f"Unhandled event type: {event.type}")
-        logger.info(f"Unhandled Connect event type: {event.type}")
-        return {"status": "unhandled"}
+def connect_event_account_id(event_data) -> str | None:
+    """Connected account id an event object refers to, if any."""
+    if getattr(event_data, 'account', None):
+        return event_data.account
+    if getattr(event_data, 'destination', None):
+        return event_data.destination
+    if hasattr(event_data, 'source') and hasattr(event_data.source, 'id'):
+        # For payment.created events, account is in source.id
+        return event_data.source.id
+    metadata = getattr(event_data, 'metadata', None)
+    return getattr(metadata, 'connect_account_id', None) or None
 
 
-def _log_connect_event(event: stripe.Event, processed: bool = True, error_message: str = ""):
+def connect_event_relations(event_data) -> dict[str, Any]:
     """
-    Log the Connect webhook event to database.
+    Look up the Connect account and payment transaction an event object
+    refers to, for linking them to the logged event.
     """
-    try:
-        from ..models import ConnectWebhookEvent, StripeConnectAccount, PaymentTransaction
+    from ..models import StripeConnectAccount, PaymentTransaction
 
-        # Extract account ID if present
-        account_id = None
-        connect_account = None
-        payment_transaction = None
+    connect_account = None
+    payment_transaction = None
 
-        # Try to get account ID from event data
-        event_data = event.data.object
-        if hasattr(event_data, 'account') and event_data.account:
-            account_id = event_data.account
-        elif hasattr(event_data, 'destination') and event_data.destination:
-            account_id = event_data.destination
-        elif hasattr(event_data, 'source') and hasattr(event_data.source, 'id'):
-            # For payment.created events, account is in source.id
-            account_id = event_data.source.id
-        elif hasattr(event_data, 'metadata') and event_data.metadata.get('connect_account_id'):
-            account_id = event_data.metadata.get('connect_account_id')
-
-        # Try to find related models
-        if account_id:
-            try:
-                connect_account = StripeConnectAccount.objects.get(stripe_account_id=account_id)
-            except StripeConnectAccount.DoesNotExist:
-                pass
+    account_id = connect_event_account_id(event_data)
+    if account_id:
+        connect_account = StripeConnectAccount.objects.filter(stripe_account_id=account_id).first()
 
-        # Try to find related payment transaction
-        if hasattr(event_data, 'payment_intent'):
-            try:
-                payment_transaction = PaymentTransaction.objects.get(payment_intent_id=event_data.payment_intent)
-            except PaymentTransaction.DoesNotExist:
-                pass
-        elif hasattr(event_data, 'metadata') and event_data.metadata.get('order_id'):
-            try:
-                payment_transaction = PaymentTransaction.objects.get(order_id=event_data.metadata.get('order_id'))
-            except PaymentTransaction.DoesNotExist:
-                pass
+    order_id = getattr(getattr(event_data, 'metadata', None), 'order_id', None)
+    if hasattr(event_data, 'payment_intent'):
+        payment_transaction = PaymentTransaction.objects.filter(payment_intent_id=event_data.payment_intent).first()
+    elif order_id:
+        payment_transaction = PaymentTransaction.objects.filter(order__order_id=order_id).first()
 
-        # Create webhook event record
-        ConnectWebhookEvent.objects.create(
-            stripe_event_id=event.id,
-            event_type=event.type,
-            account_id=account_id,
-            connect_account=connect_account,
-            payment_transaction=payment_transaction,
-            data=event.data.object,
-            processed=processed,
-            error_message=error_message,
-            processed_at=timezone.now() if processed else None
-        )
-
-    except Exception as e:
-        logger.error(f"Error logging Connect webhook event {event.id}: {e}")
+    return {'connect_account': connect_account, 'payment_transaction': payment_transaction}
 
 
-def handle_account_updated(event: stripe.Event) -> Dict[str, Any]:
+def handle_account_updated(event: stripe.Event) -> dict[str, Any]:
     """
     Handle account.updated events - when a connected account's status changes.
     """
+    from ..models import StripeConnectAccount
+    from .checkout_context import invalidate_seller_checkout_contexts
     from .stripe_connect_service import stripe_connect_service
     
     account = event.data.object
     logger.info(f"Account {account.id} updated")
 
+    # Checkout must not keep serving the old charges status from cache
+    user_ids = list(StripeConnectAccount.objects.filter(stripe_account_id=account.id).values_list('user_id', flat=True))
+
+    def invalidate_checkout_contexts():
+        for user_id in user_ids:
+            invalidate_seller_checkout_contexts(user_id)
+
+    transaction.on_commit(invalidate_checkout_contexts)
+
     try:
         # Update account status in our database
         account_status = stripe_connect_service.get_account_status(account.id)
@@ -665,7 +619,7 @@ def handle_account_updated(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "error": str(e)}
 
 
-def handle_account_authorized(event: stripe.Event) -> Dict[str, Any]:
+def handle_account_authorized(event: stripe.Event) -> dict[str, Any]:
     """
     Handle account.application.authorized - when a user authorizes the platform.
     """
@@ -674,7 +628,7 @@ def handle_account_authorized(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_connect_checkout_session_completed(event: stripe.Event) -> Dict[str, Any]:
+def handle_connect_checkout_session_completed(event: stripe.Event) -> dict[str, Any]:
     """
     Handle completed checkout sessions for Connect payments.
     """
@@ -717,7 +671,7 @@ def handle_connect_checkout_session_completed(event: stripe.Event) -> Dict[str,
         return {"status": "error", "error": "Transaction not found"}
 
 
-def handle_connect_payment_succeeded(event: stripe.Event) -> Dict[str, Any]:
+def handle_connect_payment_succeeded(event: stripe.Event) -> dict[str, Any]:
     """
     Handle successful payments for Connect transactions.
     """
@@ -737,7 +691,7 @@ def handle_connect_payment_succeeded(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "error": str(e)}
 
 
-def handle_connect_payment_failed(event: stripe.Event) -> Dict[str, Any]:
+def handle_connect_payment_failed(event: stripe.Event) -> dict[str, Any]:
     """
     Handle failed payments for Connect transactions.
     """
@@ -763,7 +717,7 @@ def handle_connect_payment_failed(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "error": "Transaction not found"}
 
 
-def handle_payment_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_payment_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle payment.created or charge.succeeded events.
     This happens when a charge is created from a PaymentIntent.
@@ -827,7 +781,7 @@ def handle_payment_created(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "error": str(e)}
 
 
-def handle_transfer_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_transfer_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle transfer.created events - when funds are transferred to connected accounts.
     """
@@ -847,7 +801,7 @@ def handle_transfer_created(event: stripe.Event) -> Dict[str, Any]:
         return {"status": "error", "error": str(e)}
 
 
-def handle_transfer_updated(event: stripe.Event) -> Dict[str, Any]:
+def handle_transfer_updated(event: stripe.Event) -> dict[str, Any]:
     """
     Handle transfer.updated events.
     """
@@ -858,7 +812,7 @@ def handle_transfer_updated(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_payout_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_payout_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle payout.created events - when Stripe initiates a payout to connected account.
     """
@@ -867,7 +821,7 @@ def handle_payout_created(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_payout_updated(event: stripe.Event) -> Dict[str, Any]:
+def handle_payout_updated(event: stripe.Event) -> dict[str, Any]:
     """
     Handle payout.updated events.
     """
@@ -876,7 +830,7 @@ def handle_payout_updated(event: stripe.Event) -> Dict[str, Any]:
     return {"status": "success"}
 
 
-def handle_charge_dispute_created(event: stripe.Event) -> Dict[str, Any]:
+def handle_charge_dispute_created(event: stripe.Event) -> dict[str, Any]:
     """
     Handle charge.dispute.created events.
     """
@@ -884,4 +838,21 @@ def handle_charge_dispute_created(event: stripe.Event) -> Dict[str, Any]:
     logger.info(f"Dispute {dispute.id} created for charge {dispute.charge}")
     
     # Could notify platform admin and/or seller about the dispute
-    return {"status": "success"}
\ No newline at end of file
+    return {"status": "success"}
+
+
+# Connect event types and their handlers
+CONNECT_EVENT_HANDLERS = {
+    "account.updated": handle_account_updated,
+    "account.application.authorized": handle_account_authorized,
+    "checkout.session.completed": handle_connect_checkout_session_completed,
+    "payment_intent.succeeded": handle_connect_payment_succeeded,
+    "payment_intent.payment_failed": handle_connect_payment_failed,
+    "payment.created": handle_payment_created,
+    "charge.succeeded": handle_payment_created,  # Alternative event name
+    "transfer.created": handle_transfer_created,
+    "transfer.updated": handle_transfer_updated,
+    "payout.created": handle_payout_created,
+    "payout.updated": handle_payout_updated,
+    "charge.dispute.created": handle_charge_dispute_created,
+}
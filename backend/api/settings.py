@@ -266,7 +266,50 @@ cloudinary.config(
     secure=True
 )
 
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+######################################################################
+# File Storage
+######################################################################
+# Django 5 reads STORAGES only. Uploads use the local filesystem. Data
+# exports are written by the Celery worker and downloaded through the API,
+# which run in separate containers, so their storage must be shared by both:
+# Cloudinary (as raw files) in production, or EXPORT_STORAGE_ROOT, which then
+# has to be a volume mounted by both containers.
+EXPORT_STORAGE_BACKEND = environ.get("EXPORT_STORAGE_BACKEND", "filesystem")  # filesystem or cloudinary
+EXPORT_STORAGE_ROOT = environ.get("EXPORT_STORAGE_ROOT", str(MEDIA_ROOT))
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "exports": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    } if EXPORT_STORAGE_BACKEND == "cloudinary" else {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": EXPORT_STORAGE_ROOT},
+    },
+}
+
+######################################################################
+# Cache Configuration
+######################################################################
+# A shared cache is needed so web and worker processes see the same
+# batching/lock keys; fall back to per-process memory for local runs.
+if environ.get("REDIS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": environ.get("REDIS_CACHE_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
 
 ######################################################################
 # Celery Configuration
@@ -296,12 +339,45 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'api.tasks.send_scheduled_optin_emails',
         'schedule': 300.0,  # Every 5 minutes
     },
+    'retry-connect-webhook-events': {
+        'task': 'api.tasks.retry_connect_webhook_events',
+        'schedule': 60.0,  # Every minute
+    },
+    'delete-expired-data-exports': {
+        'task': 'api.tasks.delete_expired_data_exports',
+        'schedule': 86400.0,  # Daily
+    },
+    'expire-automation-claims': {
+        'task': 'api.tasks.expire_automation_claims',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    'rollup-automation-daily-stats': {
+        'task': 'api.tasks.rollup_automation_daily_stats',
+        'schedule': 600.0,  # Every 10 minutes
+    },
     'sync-gmail-accounts': {
         'task': 'api.tasks.sync_all_email_accounts',
-        'schedule': 300.0,  # Every 5 minutes
+        'schedule': 60.0,  # Every minute; each account syncs on its own interval
+    },
+    'renew-gmail-watches': {
+        'task': 'api.tasks.renew_gmail_watches',
+        'schedule': 21600.0,  # Every 6 hours
     },
 }
 
+# Comment/DM automation batching
+AUTOMATION_BATCH_SIZE = int(environ.get("AUTOMATION_BATCH_SIZE", 100))  # messages claimed per batch task
+AUTOMATION_REPLIES_PER_SECOND = int(environ.get("AUTOMATION_REPLIES_PER_SECOND", 10))
+AUTOMATION_PENDING_MAX_AGE = int(environ.get("AUTOMATION_PENDING_MAX_AGE", 3600))  # seconds; older pending messages are not answered
+AUTOMATION_CLAIM_TIMEOUT = int(environ.get("AUTOMATION_CLAIM_TIMEOUT", 600))  # seconds before an unfinished batch's messages are marked 'error'
+AUTOMATION_STATS_CACHE_TTL = int(environ.get("AUTOMATION_STATS_CACHE_TTL", 60))  # 0 disables caching
+
+# Gmail sync scheduling
+EMAIL_SYNC_MIN_INTERVAL_MINUTES = int(environ.get("EMAIL_SYNC_MIN_INTERVAL_MINUTES", 1))
+EMAIL_SYNC_MAX_INTERVAL_MINUTES = int(environ.get("EMAIL_SYNC_MAX_INTERVAL_MINUTES", 30))
+EMAIL_SYNC_INACTIVE_AFTER_DAYS = int(environ.get("EMAIL_SYNC_INACTIVE_AFTER_DAYS", 7))
+EMAIL_SYNC_PUSH_FALLBACK_MINUTES = int(environ.get("EMAIL_SYNC_PUSH_FALLBACK_MINUTES", 120))  # Polling interval while push is active
+
 ######################################################################
 # Email Configuration
 ######################################################################
@@ -324,6 +400,12 @@ GOOGLE_EMAIL_REDIRECT_URI = environ.get('GOOGLE_EMAIL_REDIRECT_URI', f"{environ.
 # Email Token Encryption Key (must be 32 url-safe base64-encoded bytes)
 EMAIL_ENCRYPTION_KEY = environ.get('EMAIL_ENCRYPTION_KEY', '')
 
+# Gmail push notifications (users.watch via Pub/Sub). Leave the topic empty to
+# rely on polling only. The push subscription must call
+# {BACKEND_URL}/api/email/push/?token=<GMAIL_PUSH_VERIFICATION_TOKEN>
+GMAIL_PUSH_TOPIC = environ.get('GMAIL_PUSH_TOPIC', '')  # projects/<project>/topics/<topic>
+GMAIL_PUSH_VERIFICATION_TOKEN = environ.get('GMAIL_PUSH_VERIFICATION_TOKEN', '')
+
 ######################################################################
 # Logging Configuration
 ######################################################################
@@ -367,6 +449,14 @@ STRIPE_PUBLISHABLE_KEY = environ.get("STRIPE_PUBLISHABLE_KEY", "")
 STRIPE_SECRET_KEY = environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_WEBHOOK_SECRET = environ.get("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_CONNECT_WEBHOOK_SECRET = environ.get("STRIPE_CONNECT_WEBHOOK_SECRET", "")
+# Create a Stripe Product/Price per paid link ahead of checkout (set to 1 to enable)
+STRIPE_PRECREATE_PRICES = environ.get("STRIPE_PRECREATE_PRICES", "") == "1"
+# Where Stripe API calls go: "live" (api.stripe.com), "stripe-mock" (a stripe-mock
+# server at STRIPE_API_BASE) or "local" (in-process stand-in, for load tests)
+STRIPE_BACKEND = environ.get("STRIPE_BACKEND", "live")
+STRIPE_API_BASE = environ.get("STRIPE_API_BASE", "http://localhost:12111")
+# Simulated round trip of the local backend, in milliseconds
+STRIPE_LOCAL_LATENCY_MS = int(environ.get("STRIPE_LOCAL_LATENCY_MS", "0"))
 FRONTEND_URL=environ.get("FRONTEND_URL", "http://localhost:3000")
 
 ######################################################################
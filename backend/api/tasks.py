@@ -1,13 +1,12 @@
 import logging
+from datetime import datetime, timedelta
+
 from celery import shared_task
 from django.utils import timezone
-from datetime import timedelta, datetime
+from django.utils.dateparse import parse_datetime
 
-from .models import SocialMediaConnection, SocialMediaPost, Comment, CommentAutomationRule, CommentAutomationSettings, CommentReply
+from .models import Comment, SocialMediaConnection, SocialMediaPost
 from .services.factory import SocialMediaServiceFactory
-from .services.integrations.meta_service import MetaService
-from django.utils.dateparse import parse_datetime
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -258,151 +257,53 @@ def cleanup_old_posts():
 
 @shared_task
 def process_comment_automation(comment_id, delay_seconds=0):
-    """Process comment automation with optional delay"""
-    logger.info(f"Processing comment automation for comment {comment_id}")
-    
-    if delay_seconds > 0:
-        logger.info(f"Delaying reply by {delay_seconds} seconds")
-        time.sleep(delay_seconds)
-    
-    try:
-        # Get the comment
-        comment = Comment.objects.get(id=comment_id)
-        
-        # Skip if comment is from the page itself (don't reply to our own comments)
-        if comment.from_user_id and comment.page_id == comment.from_user_id:
-            logger.info(f"Comment {comment_id} is from the page itself (user_id: {comment.from_user_id}), skipping automation")
-            comment.status = 'ignored'
-            comment.save()
-            return {'success': True, 'message': 'Comment from page itself, ignored'}
-        
-        # Skip if already replied
-        if comment.status == 'replied':
-            logger.info(f"Comment {comment_id} already replied, skipping")
-            return {'success': True, 'message': 'Already replied'}
-        
-        # Check if automation is enabled for this connection
-        try:
-            settings = CommentAutomationSettings.objects.get(connection=comment.connection)
-            if not settings.is_enabled:
-                logger.info(f"Automation disabled for connection {comment.connection.id}")
-                comment.status = 'ignored'
-                comment.save()
-                return {'success': True, 'message': 'Automation disabled'}
-        except CommentAutomationSettings.DoesNotExist:
-            # No settings found, skip automation
-            logger.info(f"No automation settings found for connection {comment.connection.id}")
-            comment.status = 'ignored'
-            comment.save()
-            return {'success': True, 'message': 'No automation settings'}
-        
-        # Get matching rules
-        rules = CommentAutomationRule.objects.filter(
-            connection=comment.connection,
-            is_active=True
-        ).order_by('-priority', 'rule_name')
-        
-        matched_rule = None
-        reply_text = None
-        
-        # Find matching rule
-        for rule in rules:
-            if _does_comment_match_rule(comment, rule):
-                matched_rule = rule
-                reply_text = rule.reply_template
-                break
-        
-        # Use default reply if no rule matched
-        if not matched_rule and settings.default_reply:
-            reply_text = settings.default_reply
-        
-        # Send reply if we have text
-        if reply_text:
-            result = _send_comment_reply(comment, reply_text, matched_rule)
-            
-            if result.get('success'):
-                comment.status = 'replied'
-                comment.save()
-                
-                # Update rule statistics
-                if matched_rule:
-                    matched_rule.times_triggered += 1
-                    matched_rule.save()
-                
-                logger.info(f"Successfully replied to comment {comment_id}")
-                return {'success': True, 'reply_sent': True, 'rule': matched_rule.rule_name if matched_rule else 'default'}
-            else:
-                comment.status = 'error'
-                comment.save()
-                logger.error(f"Failed to send reply to comment {comment_id}: {result.get('error')}")
-                return {'success': False, 'error': result.get('error')}
-        else:
-            # No matching rule and no default reply
-            comment.status = 'ignored'
-            comment.save()
-            logger.info(f"No matching rule or default reply for comment {comment_id}")
-            return {'success': True, 'message': 'No matching rule or default reply'}
-        
-    except Comment.DoesNotExist:
+    """
+    Automate one comment through its connection's batch, the only path that
+    sends automated replies. Kept for callers and queued messages that still
+    name a single comment.
+    """
+    from .services.automation_engine import schedule_batch
+
+    connection_id = Comment.objects.filter(id=comment_id).values_list('connection_id', flat=True).first()
+    if connection_id is None:
         logger.error(f"Comment {comment_id} not found")
         return {'success': False, 'error': 'Comment not found'}
-    except Exception as e:
-        logger.error(f"Error processing comment automation for {comment_id}: {str(e)}")
-        return {'success': False, 'error': str(e)}
 
+    schedule_batch(process_comment_automation_batch, 'comment', connection_id, delay_seconds)
+    return {'success': True, 'connection_id': connection_id}
 
-def _does_comment_match_rule(comment, rule):
-    """Check if comment matches a rule's conditions"""
-    message = comment.message.lower()
-    keywords = rule.keywords
-    
-    if not keywords:
-        return False
-    
-    matches = []
-    for keyword in keywords:
-        keyword_check = keyword.lower()
-        matches.append(keyword_check in message)
-    
-    # Return True if any keyword matches (OR logic)
-    # For AND logic, we'd use: return all(matches)
-    return any(matches)
 
+@shared_task
+def process_comment_automation_batch(connection_id):
+    """
+    Process all pending comments of a connection in one batch.
+    Scheduled once per automation window by the webhook handler.
+    """
+    from .services.automation_engine import (
+        BATCH_SIZE,
+        acquire_batch_lock,
+        process_comment_batch,
+        release_batch_lock,
+    )
+
+    if not acquire_batch_lock('comment', connection_id):
+        logger.info(f"Comment batch already running for connection {connection_id}, retrying shortly")
+        process_comment_automation_batch.apply_async(args=[connection_id], countdown=5)
+        return {'success': True, 'message': 'Batch already running'}
 
-def _send_comment_reply(comment, reply_text, rule=None):
-    """Send reply to a comment"""
     try:
-        # Use Meta service to send reply
-        meta_service = MetaService(comment.connection)
-        result = meta_service.reply_to_comment(comment.comment_id, reply_text, comment.connection)
-        
-        if result.get('success'):
-            # Save reply record
-            CommentReply.objects.create(
-                comment=comment,
-                rule=rule,
-                reply_text=reply_text,
-                facebook_reply_id=result.get('reply_id', ''),
-                status='sent',
-                sent_at=timezone.now()
-            )
-            
-            return {'success': True, 'reply_id': result.get('reply_id')}
-        else:
-            # Save failed reply record
-            CommentReply.objects.create(
-                comment=comment,
-                rule=rule,
-                reply_text=reply_text,
-                status='failed',
-                error_message=result.get('error', 'Unknown error')
-            )
-            
-            return {'success': False, 'error': result.get('error', 'Unknown error')}
-    
+        result = process_comment_batch(connection_id)
     except Exception as e:
-        logger.error(f"Error sending reply to comment {comment.comment_id}: {str(e)}")
+        logger.error(f"Error processing comment batch for connection {connection_id}: {str(e)}")
         return {'success': False, 'error': str(e)}
+    finally:
+        release_batch_lock('comment', connection_id)
+
+    # Keep draining while the burst fills whole batches
+    if result['processed'] >= BATCH_SIZE:
+        process_comment_automation_batch.apply_async(args=[connection_id], countdown=1)
+
+    return {'success': True, **result}
 
 
 # =============================================================================
@@ -411,161 +312,232 @@ def _send_comment_reply(comment, reply_text, rule=None):
 
 @shared_task
 def process_dm_automation(dm_id, delay_seconds=0):
-    """Process direct message automation with optional delay"""
-    logger.info(f"Processing DM automation for message {dm_id}")
-    
-    if delay_seconds > 0:
-        logger.info(f"Delaying DM reply by {delay_seconds} seconds")
-        time.sleep(delay_seconds)
-    
+    """
+    Automate one direct message through its connection's batch, the only
+    path that sends automated replies. Kept for callers and queued messages
+    that still name a single message.
+    """
+    from .models import DirectMessage
+    from .services.automation_engine import schedule_batch
+
+    connection_id = DirectMessage.objects.filter(id=dm_id).values_list('connection_id', flat=True).first()
+    if connection_id is None:
+        logger.error(f"DM {dm_id} not found")
+        return {'success': False, 'error': 'DM not found'}
+
+    schedule_batch(process_dm_automation_batch, 'dm', connection_id, delay_seconds)
+    return {'success': True, 'connection_id': connection_id}
+
+
+@shared_task
+def process_dm_automation_batch(connection_id):
+    """
+    Process all pending direct messages of a connection in one batch.
+    Scheduled once per automation window by the webhook handler.
+    """
+    from .services.automation_engine import (
+        BATCH_SIZE,
+        acquire_batch_lock,
+        process_dm_batch,
+        release_batch_lock,
+    )
+
+    if not acquire_batch_lock('dm', connection_id):
+        logger.info(f"DM batch already running for connection {connection_id}, retrying shortly")
+        process_dm_automation_batch.apply_async(args=[connection_id], countdown=5)
+        return {'success': True, 'message': 'Batch already running'}
+
     try:
-        from .models import DirectMessage, AutomationRule, AutomationSettings, DirectMessageReply
-        
-        dm = DirectMessage.objects.get(id=dm_id)
-        logger.info(f"Processing DM {dm.message_id} from {dm.sender_name}")
-        
-        # Skip if DM is from the page itself (echo messages should already be filtered)
-        if dm.is_echo:
-            logger.info(f"DM {dm_id} is an echo message, skipping automation")
-            dm.status = 'ignored'
-            dm.save()
-            return {'success': True, 'message': 'Echo message, ignored'}
-        
-        # Skip if already replied
-        if dm.status == 'replied':
-            logger.info(f"DM {dm_id} already replied to")
-            return {'success': True, 'message': 'Already replied'}
-        
-        # Check if DM automation is enabled for this connection
-        try:
-            settings = AutomationSettings.objects.get(connection=dm.connection)
-            if not settings.enable_dm_automation:
-                logger.info(f"DM automation disabled for connection {dm.connection.id}")
-                dm.status = 'ignored'
-                dm.save()
-                return {'success': True, 'message': 'DM automation disabled'}
-        except AutomationSettings.DoesNotExist:
-            # No settings found, skip automation
-            logger.info(f"No automation settings found for connection {dm.connection.id}")
-            dm.status = 'ignored'
-            dm.save()
-            return {'success': True, 'message': 'No automation settings'}
-        
-        # Get matching rules for DMs
-        rules = AutomationRule.objects.filter(
-            connection=dm.connection,
-            is_active=True,
-            message_type__in=['dm', 'both']
-        ).order_by('-priority')
-        
-        logger.info(f"Found {rules.count()} active DM automation rules")
-        
-        matched_rule = None
-        reply_text = None
-        
-        # Check each rule for keyword matches
-        for rule in rules:
-            if _does_dm_match_rule(dm, rule):
-                logger.info(f"DM matches rule: {rule.rule_name}")
-                matched_rule = rule
-                reply_text = rule.reply_template
-                break
-        
-        # If no rule matched, use default reply if available
-        if not reply_text and settings.dm_default_reply:
-            logger.info("No rules matched, using default DM reply")
-            reply_text = settings.dm_default_reply
-        
-        if reply_text:
-            # Send the reply
-            result = _send_dm_reply(dm, reply_text, matched_rule)
-            
-            if result.get('success'):
-                dm.status = 'replied'
-                dm.save()
-                
-                # Update rule trigger count
-                if matched_rule:
-                    matched_rule.times_triggered += 1
-                    matched_rule.save()
-                
-                logger.info(f"Successfully processed DM automation for {dm_id}")
-                return {'success': True, 'message': 'Reply sent'}
-            else:
-                dm.status = 'error'
-                dm.save()
-                return result
-        else:
-            logger.info(f"No matching rules or default reply for DM {dm_id}")
-            dm.status = 'ignored'
-            dm.save()
-            return {'success': True, 'message': 'No matching rules'}
-            
-    except DirectMessage.DoesNotExist:
-        logger.error(f"DirectMessage {dm_id} not found")
-        return {'success': False, 'error': 'Direct message not found'}
+        result = process_dm_batch(connection_id)
     except Exception as e:
-        logger.error(f"Error processing DM automation for {dm_id}: {str(e)}")
+        logger.error(f"Error processing DM batch for connection {connection_id}: {str(e)}")
         return {'success': False, 'error': str(e)}
+    finally:
+        release_batch_lock('dm', connection_id)
 
+    # Keep draining while the burst fills whole batches
+    if result['processed'] >= BATCH_SIZE:
+        process_dm_automation_batch.apply_async(args=[connection_id], countdown=1)
 
-def _does_dm_match_rule(dm, rule):
-    """Check if direct message matches a rule's conditions"""
-    message = dm.message_text.lower() if dm.message_text else ""
-    keywords = rule.keywords
-    
-    if not keywords or not message:
-        return False
-    
-    matches = []
-    for keyword in keywords:
-        keyword_check = keyword.lower()
-        matches.append(keyword_check in message)
-    
-    # Return True if any keyword matches (OR logic)
-    return any(matches)
+    return {'success': True, **result}
+
+
+@shared_task
+def expire_automation_claims():
+    """
+    Mark comments and DMs left 'processing' by a batch that never finished
+    as 'error'. Runs every 5 minutes via Celery Beat.
+    """
+    from .services.automation_engine import expire_stale_claims
+
+    return {'expired': expire_stale_claims()}
+
+
+@shared_task
+def rollup_automation_daily_stats(days=2):
+    """
+    Refresh the AutomationDailyStats rollup for the last `days` days.
+    Runs every 10 minutes via Celery Beat; backfills the full history
+    the first time it runs on an empty rollup table.
+    """
+    from .models import AutomationDailyStats
+    from .services.automation_stats import rollup_daily_stats
 
+    since = None
+    if days and AutomationDailyStats.objects.exists():
+        since = timezone.localdate() - timedelta(days=days - 1)
+
+    bucket_count = rollup_daily_stats(since=since)
+    logger.info(f"Automation stats rollup refreshed {bucket_count} buckets since {since or 'the beginning'}")
+    return {'buckets': bucket_count}
+
+
+@shared_task
+def send_order_delivery_email(order_id):
+    """
+    Send the product delivery email for a completed order.
+    Queued by the Order post_save signal once the order is committed.
+    """
+    from .models import Order
+    from .services.email_service import send_product_delivery_email
 
-def _send_dm_reply(dm, reply_text, rule=None):
-    """Send reply to a direct message"""
     try:
-        # Use Meta service to send DM reply
-        meta_service = MetaService(dm.connection)
-        
-        if dm.platform == 'facebook':
-            result = meta_service.reply_to_facebook_dm(dm.conversation_id, reply_text, dm.connection)
-        elif dm.platform == 'instagram':
-            result = meta_service.reply_to_instagram_dm(dm.conversation_id, reply_text, dm.connection)
-        else:
-            return {'success': False, 'error': f'Unsupported platform: {dm.platform}'}
-        
-        if result.get('success'):
-            # Save the reply to database
-            DirectMessageReply.objects.create(
-                direct_message=dm,
-                rule=rule,
-                reply_text=reply_text,
-                platform_reply_id=result.get('reply_id', ''),
-                status='sent'
-            )
-            
-            logger.info(f"DM reply sent successfully for {dm.message_id}")
-            return {'success': True}
-        else:
-            # Save failed reply to database
-            DirectMessageReply.objects.create(
-                direct_message=dm,
-                rule=rule,
-                reply_text=reply_text,
-                status='failed',
-                error_message=result.get('error', 'Unknown error')
-            )
-            
-            return {'success': False, 'error': result.get('error', 'Unknown error')}
-    
+        order = Order.objects.select_related('custom_link__user_profile__user').get(id=order_id)
+    except Order.DoesNotExist:
+        logger.warning(f"Order {order_id} no longer exists, skipping product delivery email")
+        return {'success': False, 'reason': 'order_not_found'}
+
+    email_sent = send_product_delivery_email(order)
+    if email_sent:
+        logger.info(f"Product delivery email sent successfully for order {order.order_id}")
+    else:
+        logger.warning(f"Failed to send product delivery email for order {order.order_id}")
+    return {'success': email_sent}
+
+
+@shared_task
+def process_completed_orders(order_ids):
+    """
+    Send delivery emails and enroll follow-up sequences for a batch of orders
+    completed by a bulk status update. One task per chunk of orders.
+    """
+    from .models import (
+        FreebieFollowupEmail,
+        OptinFollowupEmail,
+        Order,
+        ScheduledFollowupEmail,
+        ScheduledOptinEmail,
+    )
+    from .services.email_service import send_product_delivery_email
+    from .services.followup_emails import enroll_orders
+
+    orders = list(
+        Order.objects.select_related('custom_link__user_profile__user')
+        .filter(id__in=order_ids, status='completed')
+    )
+
+    sent = 0
+    failed = 0
+    for order in orders:
+        try:
+            if send_product_delivery_email(order):
+                sent += 1
+            else:
+                failed += 1
+        except Exception as e:
+            logger.error(f"Failed to send product delivery email for order {order.order_id}: {e}")
+            failed += 1
+
+    enrolled = enroll_orders(
+        [order for order in orders if order.custom_link.type == 'freebie'],
+        FreebieFollowupEmail, ScheduledFollowupEmail
+    )
+    enrolled += enroll_orders(
+        [order for order in orders if order.custom_link.type == 'opt_in'],
+        OptinFollowupEmail, ScheduledOptinEmail
+    )
+
+    logger.info(f"Completed orders processed: {sent} delivered, {failed} failed, {enrolled} enrolled")
+    return {'delivered': sent, 'failed': failed, 'enrolled': enrolled}
+
+
+@shared_task
+def sync_custom_link_stripe_price(link_id):
+    """
+    Create or refresh the pre-created Stripe Product/Price of a paid link.
+    Queued when a link is saved and STRIPE_PRECREATE_PRICES is enabled.
+    """
+    from .services.checkout_context import checkout_links
+    from .services.stripe_connect_service import stripe_connect_service
+
+    link = checkout_links().filter(pk=link_id).first()
+    connect_account = getattr(link.user_profile.user, 'connect_account', None) if link else None
+    if connect_account is None:
+        return {'success': False, 'reason': 'no_connect_account'}
+
+    try:
+        price_id = stripe_connect_service.sync_product_price(link, connect_account)
     except Exception as e:
-        logger.error(f"Error sending DM reply to {dm.message_id}: {str(e)}")
+        logger.error(f"Failed to sync Stripe price for custom link {link_id}: {e}")
         return {'success': False, 'error': str(e)}
+    return {'success': True, 'price_id': price_id}
+
+
+@shared_task
+def process_connect_webhook_events(object_key):
+    """
+    Handle the stored Connect webhook events of one Stripe object, in order.
+    Queued by the Connect webhook view for every delivered event.
+    """
+    from .services.connect_webhook_inbox import process_object_events
+
+    result = process_object_events(object_key)
+    if result['failed']:
+        logger.warning(f"Connect events for {object_key}: {result['processed']} processed, {result['failed']} failed")
+    return result
+
+
+@shared_task
+def retry_connect_webhook_events():
+    """
+    Process Connect webhook events still pending: failed events, and events
+    whose processing task was lost. Runs every minute via Celery Beat.
+    """
+    from .services.connect_webhook_inbox import pending_object_keys
+
+    object_keys = pending_object_keys()
+    for object_key in object_keys:
+        process_connect_webhook_events.delay(object_key)
+    return {'queued': len(object_keys)}
+
+
+@shared_task
+def run_data_export(export_id):
+    """
+    Write a requested order or collect info export to its file.
+    Queued by the exports API once the DataExport row is committed.
+    """
+    from .models import DataExport
+    from .services.data_export import run_export
+
+    try:
+        data_export = DataExport.objects.select_related('user').get(id=export_id, status='pending')
+    except DataExport.DoesNotExist:
+        logger.warning(f"Data export {export_id} not found or already started")
+        return {'success': False, 'reason': 'export_not_found'}
+
+    return run_export(data_export)
+
+
+@shared_task
+def delete_expired_data_exports():
+    """
+    Delete finished exports and their files after the retention period.
+    Runs daily via Celery Beat.
+    """
+    from .services.data_export import delete_expired_exports
+
+    return {'deleted': delete_expired_exports()}
 
 
 @shared_task
@@ -574,11 +546,11 @@ def schedule_freebie_email_sequence(order_id):
     Schedule all follow-up emails for a freebie order.
     Called automatically when freebie order is completed.
     """
-    from .models import Order, FreebieFollowupEmail, ScheduledFollowupEmail, ScheduledOptinEmail
-    from datetime import timedelta
+    from .models import FreebieFollowupEmail, Order, ScheduledFollowupEmail
+    from .services.followup_emails import enroll, is_enrolled
 
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('custom_link').get(id=order_id)
 
         # Only schedule for freebie type
         if order.custom_link.type != 'freebie':
@@ -586,42 +558,11 @@ def schedule_freebie_email_sequence(order_id):
             return
 
         # Check if this email is already enrolled in any active sequence from ANY community leader
-        customer_email = order.customer_email
-        existing_freebie_sequences = ScheduledFollowupEmail.objects.filter(
-            order__customer_email=customer_email,
-            sent=False
-        ).exists()
-
-        existing_optin_sequences = ScheduledOptinEmail.objects.filter(
-            order__customer_email=customer_email,
-            sent=False
-        ).exists()
-
-        if existing_freebie_sequences or existing_optin_sequences:
-            logger.info(f"Email {customer_email} is already enrolled in an active nurturing sequence. Skipping for order {order.order_id}")
+        if is_enrolled(order.customer_email):
+            logger.info(f"Email {order.customer_email} is already enrolled in an active nurturing sequence. Skipping for order {order.order_id}")
             return {'success': False, 'reason': 'already_enrolled', 'message': 'Customer is already in an active email sequence'}
 
-        # Get all active email templates
-        email_templates = FreebieFollowupEmail.objects.filter(is_active=True).order_by('step_number')
-
-        scheduled_count = 0
-        for template in email_templates:
-            # Calculate scheduled datetime
-            scheduled_datetime = order.created_at + timedelta(days=template.delay_days)
-            scheduled_datetime = scheduled_datetime.replace(
-                hour=template.send_time.hour,
-                minute=template.send_time.minute,
-                second=0,
-                microsecond=0
-            )
-
-            # Create scheduled email
-            ScheduledFollowupEmail.objects.create(
-                order=order,
-                email_template=template,
-                scheduled_for=scheduled_datetime
-            )
-            scheduled_count += 1
+        scheduled_count = enroll(order, FreebieFollowupEmail, ScheduledFollowupEmail)
 
         logger.info(f"Scheduled {scheduled_count} follow-up emails for order {order.order_id}")
         return {'success': True, 'scheduled_count': scheduled_count}
@@ -634,50 +575,15 @@ def schedule_freebie_email_sequence(order_id):
 @shared_task
 def send_scheduled_followup_emails():
     """
-    Send all follow-up emails that are scheduled to be sent now.
+    Send all freebie follow-up emails that are due.
     Runs every 5 minutes via Celery Beat.
     """
     from .models import ScheduledFollowupEmail
-    from .services.email_service import send_freebie_followup_email
-    from datetime import timedelta
-
-    now = timezone.now()
-
-    # Get emails scheduled to send now (within last 10 minutes to handle delays)
-    pending_emails = ScheduledFollowupEmail.objects.filter(
-        sent=False,
-        scheduled_for__lte=now,
-        scheduled_for__gte=now - timedelta(minutes=10)
-    ).select_related('order', 'email_template', 'order__custom_link', 'order__custom_link__user_profile')
-
-    sent_count = 0
-    failed_count = 0
-
-    for scheduled_email in pending_emails:
-        try:
-            # Send the email
-            success = send_freebie_followup_email(scheduled_email)
-
-            if success:
-                # Mark as sent
-                scheduled_email.sent = True
-                scheduled_email.sent_at = timezone.now()
-                scheduled_email.save()
-                sent_count += 1
-                logger.info(f"Sent follow-up email {scheduled_email.email_template.step_number} for order {scheduled_email.order.order_id}")
-            else:
-                scheduled_email.error_message = "Email sending failed"
-                scheduled_email.save()
-                failed_count += 1
-                logger.error(f"Failed to send follow-up email {scheduled_email.id}")
+    from .services.followup_emails import send_due_followups
 
-        except Exception as e:
-            scheduled_email.error_message = str(e)
-            scheduled_email.save()
-            failed_count += 1
-            logger.error(f"Error sending scheduled email {scheduled_email.id}: {e}")
-
-    logger.info(f"Follow-up emails processed: {sent_count} sent, {failed_count} failed")
+    result = send_due_followups(ScheduledFollowupEmail, 'freebie_followup')
+    logger.info(f"Follow-up emails processed: {result['sent']} sent, {result['failed']} failed")
+    return result
 
 
 @shared_task
@@ -686,11 +592,11 @@ def schedule_optin_email_sequence(order_id):
     Schedule all follow-up emails for an opt-in order.
     Called automatically when opt-in order is completed.
     """
-    from .models import Order, OptinFollowupEmail, ScheduledOptinEmail, ScheduledFollowupEmail
-    from datetime import timedelta
+    from .models import OptinFollowupEmail, Order, ScheduledOptinEmail
+    from .services.followup_emails import enroll, is_enrolled
 
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('custom_link').get(id=order_id)
 
         # Only schedule for opt_in type
         if order.custom_link.type != 'opt_in':
@@ -698,42 +604,11 @@ def schedule_optin_email_sequence(order_id):
             return
 
         # Check if this email is already enrolled in any active sequence from ANY community leader
-        customer_email = order.customer_email
-        existing_optin_sequences = ScheduledOptinEmail.objects.filter(
-            order__customer_email=customer_email,
-            sent=False
-        ).exists()
-
-        existing_freebie_sequences = ScheduledFollowupEmail.objects.filter(
-            order__customer_email=customer_email,
-            sent=False
-        ).exists()
-
-        if existing_optin_sequences or existing_freebie_sequences:
-            logger.info(f"Email {customer_email} is already enrolled in an active nurturing sequence. Skipping for order {order.order_id}")
+        if is_enrolled(order.customer_email):
+            logger.info(f"Email {order.customer_email} is already enrolled in an active nurturing sequence. Skipping for order {order.order_id}")
             return {'success': False, 'reason': 'already_enrolled', 'message': 'Customer is already in an active email sequence'}
 
-        # Get all active email templates
-        email_templates = OptinFollowupEmail.objects.filter(is_active=True).order_by('step_number')
-
-        scheduled_count = 0
-        for template in email_templates:
-            # Calculate scheduled datetime
-            scheduled_datetime = order.created_at + timedelta(days=template.delay_days)
-            scheduled_datetime = scheduled_datetime.replace(
-                hour=template.send_time.hour,
-                minute=template.send_time.minute,
-                second=0,
-                microsecond=0
-            )
-
-            # Create scheduled email
-            ScheduledOptinEmail.objects.create(
-                order=order,
-                email_template=template,
-                scheduled_for=scheduled_datetime
-            )
-            scheduled_count += 1
+        scheduled_count = enroll(order, OptinFollowupEmail, ScheduledOptinEmail)
 
         logger.info(f"Scheduled {scheduled_count} opt-in follow-up emails for order {order.order_id}")
         return {'success': True, 'scheduled_count': scheduled_count}
@@ -746,51 +621,15 @@ def schedule_optin_email_sequence(order_id):
 @shared_task
 def send_scheduled_optin_emails():
     """
-    Send all opt-in follow-up emails that are scheduled to be sent now.
+    Send all opt-in follow-up emails that are due.
     Runs every 5 minutes via Celery Beat.
     """
     from .models import ScheduledOptinEmail
-    from .services.email_service import send_optin_followup_email
-    from datetime import timedelta
-
-    now = timezone.now()
-
-    # Get emails scheduled to send now (within last 10 minutes to handle delays)
-    pending_emails = ScheduledOptinEmail.objects.filter(
-        sent=False,
-        scheduled_for__lte=now,
-        scheduled_for__gte=now - timedelta(minutes=10)
-    ).select_related('order', 'email_template', 'order__custom_link', 'order__custom_link__user_profile')
+    from .services.followup_emails import send_due_followups
 
-    sent_count = 0
-    failed_count = 0
-
-    for scheduled_email in pending_emails:
-        try:
-            # Send the email
-            success = send_optin_followup_email(scheduled_email)
-
-            if success:
-                # Mark as sent
-                scheduled_email.sent = True
-                scheduled_email.sent_at = timezone.now()
-                scheduled_email.save()
-                sent_count += 1
-                logger.info(f"Sent opt-in follow-up email {scheduled_email.email_template.step_number} for order {scheduled_email.order.order_id}")
-            else:
-                scheduled_email.error_message = "Email sending failed"
-                scheduled_email.save()
-                failed_count += 1
-                logger.error(f"Failed to send opt-in follow-up email {scheduled_email.id}")
-
-        except Exception as e:
-            scheduled_email.error_message = str(e)
-            scheduled_email.save()
-            failed_count += 1
-            logger.error(f"Error sending scheduled opt-in email {scheduled_email.id}: {e}")
-
-    logger.info(f"Opt-in follow-up emails processed: {sent_count} sent, {failed_count} failed")
-    return {'sent': sent_count, 'failed': failed_count}
+    result = send_due_followups(ScheduledOptinEmail, 'optin_followup')
+    logger.info(f"Opt-in follow-up emails processed: {result['sent']} sent, {result['failed']} failed")
+    return result
 
 
 # ============================================================================
@@ -800,28 +639,38 @@ def send_scheduled_optin_emails():
 @shared_task
 def sync_all_email_accounts():
     """
-    Sync emails from all active Gmail accounts.
-    Runs every 5 minutes via Celery Beat.
-    """
-    from .models import EmailAccount
+    Dispatch syncs for Gmail accounts that are due.
+    Runs every minute via Celery Beat.
 
-    logger.info("Starting email sync for all active accounts")
+    Each account has its own adaptive interval; due accounts are spread
+    over the minute by a hash of their id so Gmail and the database see a
+    steady trickle instead of a burst.
+    """
+    from .services.email_sync import (
+        SCHEDULER_TICK_SECONDS,
+        assign_initial_phases,
+        claim_due_accounts,
+        hash_offset,
+    )
 
-    accounts = EmailAccount.objects.filter(is_active=True)
-    synced_count = 0
+    assign_initial_phases()
+    account_ids = claim_due_accounts()
+    queued_count = 0
     failed_count = 0
 
-    for account in accounts:
+    for account_id in account_ids:
         try:
-            # Dispatch individual sync task
-            sync_single_email_account.delay(account.id)
-            synced_count += 1
+            sync_single_email_account.apply_async(
+                args=[account_id],
+                countdown=hash_offset(account_id, SCHEDULER_TICK_SECONDS)
+            )
+            queued_count += 1
         except Exception as e:
             failed_count += 1
-            logger.error(f"Failed to queue sync for account {account.id}: {e}")
+            logger.error(f"Failed to queue sync for account {account_id}: {e}")
 
-    logger.info(f"Email sync queued: {synced_count} accounts, {failed_count} failed")
-    return {'queued': synced_count, 'failed': failed_count}
+    logger.info(f"Email sync queued: {queued_count} accounts, {failed_count} failed")
+    return {'queued': queued_count, 'failed': failed_count}
 
 
 @shared_task
@@ -833,22 +682,56 @@ def sync_single_email_account(account_id):
         account_id: ID of the EmailAccount to sync
     """
     from .models import EmailAccount
+    from .services.email_sync import schedule_next_sync
     from .services.integrations import GmailService
 
+    account = None
     try:
         account = EmailAccount.objects.get(id=account_id, is_active=True)
         logger.info(f"Syncing email account: {account.email_address}")
 
         service = GmailService(email_account=account)
-        messages = service.fetch_messages(max_results=50)
+        result = service.sync_messages(max_results=50)
+        schedule_next_sync(account, result['added'] + result['updated'] + result['deleted'])
 
-        logger.info(f"Successfully synced {len(messages)} emails for {account.email_address}")
-        return {'account_id': account_id, 'synced_count': len(messages)}
+        logger.info(f"Successfully synced {account.email_address}: {result}")
+        return {'account_id': account_id, 'synced_count': result['added'], **result}
 
     except EmailAccount.DoesNotExist:
         logger.error(f"Email account {account_id} not found or inactive")
         return {'error': 'Account not found'}
     except Exception as e:
         logger.error(f"Failed to sync account {account_id}: {e}")
+        if account:
+            # Back off like an idle mailbox
+            schedule_next_sync(account, 0)
         return {'error': str(e)}
 
+
+@shared_task
+def renew_gmail_watches():
+    """
+    Register or renew Gmail push notifications for active accounts.
+    Runs every 6 hours via Celery Beat; a no-op when GMAIL_PUSH_TOPIC is unset.
+    """
+    from django.conf import settings
+
+    from .services.email_sync import accounts_needing_watch
+    from .services.integrations import GmailService
+
+    topic = getattr(settings, 'GMAIL_PUSH_TOPIC', '')
+    if not topic:
+        return {'renewed': 0, 'failed': 0}
+
+    renewed = 0
+    failed = 0
+    for account in accounts_needing_watch():
+        try:
+            GmailService(email_account=account).watch_mailbox(topic)
+            renewed += 1
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to watch Gmail account {account.id}: {e}")
+
+    logger.info(f"Gmail watches renewed: {renewed}, failed: {failed}")
+    return {'renewed': renewed, 'failed': failed}
@@ -0,0 +1,542 @@
+"""
+Test cases for comment and DM automation.
+"""
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import (
+    AutomationDailyStats,
+    AutomationRule,
+    AutomationSettings,
+    Comment,
+    CommentReply,
+    DirectMessage,
+    DirectMessageReply,
+    SocialMediaConnection,
+    SocialMediaPlatform,
+)
+from ..services import automation_engine
+from ..services.automation_engine import (
+    CompiledRuleMatcher,
+    process_comment_batch,
+    process_dm_batch,
+    schedule_batch,
+)
+from ..services.automation_stats import rollup_daily_stats
+from ..tasks import expire_automation_claims, process_comment_automation
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class AutomationTestBase(TestCase):
+    """Base test class with a Facebook connection and automation settings."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pageowner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.platform = SocialMediaPlatform.objects.create(
+            name='facebook',
+            display_name='Facebook',
+            client_id='client',
+            client_secret='secret',
+            auth_url='https://example.com/auth',
+            token_url='https://example.com/token',
+            scope='pages_manage_engagement'
+        )
+        self.connection = SocialMediaConnection.objects.create(
+            user=self.user,
+            platform=self.platform,
+            access_token='token',
+            facebook_page_id='page-1',
+            facebook_page_name='Test Page'
+        )
+        self.settings = AutomationSettings.objects.create(
+            user=self.user,
+            connection=self.connection,
+            is_enabled=True
+        )
+        self.rule = AutomationRule.objects.create(
+            user=self.user,
+            connection=self.connection,
+            rule_name='Price',
+            keywords=['price'],
+            reply_template='Check your DMs!'
+        )
+
+    def create_comment(self, comment_id, message='What is the price?', from_user_id='fan-1', **kwargs):
+        kwargs.setdefault('created_time', timezone.now())
+        return Comment.objects.create(
+            comment_id=comment_id,
+            post_id='post-1',
+            page_id='page-1',
+            from_user_name='Fan',
+            from_user_id=from_user_id,
+            message=message,
+            connection=self.connection,
+            **kwargs
+        )
+
+
+class TestRuleOutcomeStatistics(AutomationTestBase):
+    """Test atomic rule statistics updates."""
+
+    def test_record_outcomes_increments_counters(self):
+        """Test that outcomes are added to the existing counters."""
+        AutomationRule.record_outcomes(self.rule.id, succeeded=2, failed=1)
+        AutomationRule.record_outcomes(self.rule.id, succeeded=1)
+
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_triggered, 3)
+        self.assertEqual(self.rule.times_succeeded, 3)
+        self.assertEqual(self.rule.times_failed, 1)
+        self.assertIsNotNone(self.rule.last_triggered_at)
+
+    def test_stale_full_save_keeps_counters(self):
+        """Test that saving a rule loaded before outcomes were recorded keeps them."""
+        stale_rule = AutomationRule.objects.get(id=self.rule.id)
+        AutomationRule.record_outcomes(self.rule.id, succeeded=2, failed=1)
+
+        stale_rule.is_active = False
+        stale_rule.save()
+
+        self.rule.refresh_from_db()
+        self.assertFalse(self.rule.is_active)
+        self.assertEqual((self.rule.times_triggered, self.rule.times_succeeded, self.rule.times_failed), (2, 2, 1))
+        self.assertIsNotNone(self.rule.last_triggered_at)
+
+    def test_record_outcomes_noop_without_outcomes(self):
+        """Test that nothing is written when there is nothing to record."""
+        self.assertEqual(AutomationRule.record_outcomes(self.rule.id), 0)
+        self.assertEqual(AutomationRule.record_outcomes(None, succeeded=1), 0)
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_comment_automation_records_success(self, mock_meta):
+        """Test that a successful automated reply updates rule statistics."""
+        mock_meta.return_value.reply_to_comment.return_value = {
+            'success': True, 'reply_id': 'reply-1'
+        }
+        comment = self.create_comment('comment-1')
+
+        result = process_comment_batch(self.connection.id)
+
+        self.assertEqual(result['replied'], 1)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_triggered, 1)
+        self.assertEqual(self.rule.times_succeeded, 1)
+        self.assertEqual(self.rule.times_failed, 0)
+        self.assertEqual(CommentReply.objects.filter(comment=comment).count(), 1)
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_comment_automation_records_failure(self, mock_meta):
+        """Test that a failed automated reply is counted as a failure."""
+        mock_meta.return_value.reply_to_comment.return_value = {
+            'success': False, 'error': 'Rate limited'
+        }
+        self.create_comment('comment-2')
+
+        process_comment_batch(self.connection.id)
+
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_triggered, 0)
+        self.assertEqual(self.rule.times_succeeded, 0)
+        self.assertEqual(self.rule.times_failed, 1)
+
+    @patch('api.tasks.process_comment_automation_batch')
+    def test_single_comment_task_goes_through_the_batch(self, mock_batch):
+        """Test that the per-comment task only schedules its connection's batch."""
+        cache.clear()
+        comment = self.create_comment('comment-3')
+
+        result = process_comment_automation(comment.id, delay_seconds=3)
+
+        self.assertEqual(result, {'success': True, 'connection_id': self.connection.id})
+        mock_batch.apply_async.assert_called_once_with(args=[self.connection.id], countdown=3)
+        self.assertFalse(CommentReply.objects.exists())
+
+
+class TestCompiledRuleMatcher(AutomationTestBase):
+    """Test the compiled keyword matcher."""
+
+    def test_matches_in_priority_order(self):
+        """Test that the highest priority matching rule wins."""
+        urgent = AutomationRule.objects.create(
+            user=self.user,
+            connection=self.connection,
+            rule_name='Urgent price',
+            keywords=['PRICE NOW'],
+            reply_template='Sending it now!',
+            priority=10
+        )
+        rules = AutomationRule.objects.filter(connection=self.connection).order_by('-priority', 'rule_name')
+        matcher = CompiledRuleMatcher(list(rules))
+
+        self.assertEqual(matcher.match('price now please'), urgent)
+        self.assertEqual(matcher.match('What is the Price?'), self.rule)
+        self.assertIsNone(matcher.match('Nice photo'))
+        self.assertIsNone(matcher.match(''))
+
+    def test_keywords_are_matched_literally(self):
+        """Test that regex characters in keywords are escaped."""
+        self.rule.keywords = ['$9.99']
+        matcher = CompiledRuleMatcher([self.rule])
+
+        self.assertEqual(matcher.match('is it $9.99?'), self.rule)
+        self.assertIsNone(matcher.match('is it $9x99?'))
+
+
+class TestCommentBatchProcessing(AutomationTestBase):
+    """Test micro-batched comment automation."""
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_batch_replies_and_records_results(self, mock_meta):
+        """Test that a batch replies to matches and writes results in bulk."""
+        mock_meta.return_value.reply_to_comment.return_value = {
+            'success': True, 'reply_id': 'reply-1'
+        }
+        self.settings.default_reply = ''
+        self.settings.save()
+        for i in range(20):
+            self.create_comment(f'match-{i}')
+        self.create_comment('nomatch', message='Love it')
+        self.create_comment('own', from_user_id='page-1')
+
+        # Claim (5), settings and rules (2), then one flush: the replies,
+        # one update per status and the rule outcomes (4)
+        with self.assertNumQueries(11):
+            result = process_comment_batch(self.connection.id)
+
+        self.assertEqual(result['processed'], 22)
+        self.assertEqual(result['replied'], 20)
+        self.assertEqual(result['ignored'], 2)
+        self.assertEqual(Comment.objects.filter(status='replied').count(), 20)
+        self.assertEqual(Comment.objects.filter(status='ignored').count(), 2)
+        self.assertEqual(CommentReply.objects.filter(rule=self.rule).count(), 20)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_succeeded, 20)
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_writes_do_not_grow_with_batch_size(self, mock_meta):
+        """Test that results are flushed every FLUSH_EVERY sends, not per comment."""
+        mock_meta.return_value.reply_to_comment.return_value = {'success': True, 'reply_id': 'reply-1'}
+        for i in range(8):
+            self.create_comment(f'match-{i}')
+
+        with patch.object(automation_engine, 'FLUSH_EVERY', 4), CaptureQueriesContext(connection) as queries:
+            process_comment_batch(self.connection.id)
+
+        # Claim, settings and rules (7), then per flush of 4 sends: the
+        # replies, their status and the rule outcomes (3)
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(len(queries), 7 + 2 * 3)
+        self.assertEqual(Comment.objects.filter(status='replied').count(), 8)
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_rules_of_any_message_type_match_comments(self, mock_meta):
+        """Test that comment matching does not filter rules by message type."""
+        mock_meta.return_value.reply_to_comment.return_value = {'success': True, 'reply_id': 'reply-1'}
+        AutomationRule.objects.filter(pk=self.rule.pk).update(message_type='dm')
+        self.create_comment('comment-1')
+
+        self.assertEqual(process_comment_batch(self.connection.id)['replied'], 1)
+
+    def test_stale_claims_expire(self):
+        """Test that messages left processing by a dead batch are marked as errors."""
+        stale = self.create_comment('stale', status='processing')
+        Comment.objects.filter(pk=stale.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        fresh = self.create_comment('fresh', status='processing', claimed_at=timezone.now())
+
+        self.assertEqual(expire_automation_claims(), {'expired': 1})
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, fresh.status), ('error', 'processing'))
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_batch_records_failed_replies(self, mock_meta):
+        """Test that failed sends are stored with their error."""
+        mock_meta.return_value.reply_to_comment.return_value = {
+            'success': False, 'error': 'Rate limited'
+        }
+        comment = self.create_comment('comment-1')
+
+        result = process_comment_batch(self.connection.id)
+
+        self.assertEqual(result['failed'], 1)
+        reply = CommentReply.objects.get(comment=comment)
+        self.assertEqual(reply.status, 'failed')
+        self.assertEqual(reply.error_message, 'Rate limited')
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_failed, 1)
+
+    def test_batch_ignores_when_disabled(self):
+        """Test that comments are ignored when automation is disabled."""
+        self.settings.is_enabled = False
+        self.settings.save()
+        self.create_comment('comment-1')
+
+        result = process_comment_batch(self.connection.id)
+
+        self.assertEqual(result['ignored'], 1)
+        self.assertFalse(Comment.objects.filter(status='new').exists())
+
+    @patch('api.tasks.process_comment_automation_batch')
+    def test_schedule_batch_once_per_window(self, mock_task):
+        """Test that only the first message in a window enqueues a task."""
+        cache.clear()
+
+        self.assertTrue(schedule_batch(mock_task, 'comment', self.connection.id, 5))
+        self.assertFalse(schedule_batch(mock_task, 'comment', self.connection.id, 5))
+        mock_task.apply_async.assert_called_once_with(args=[self.connection.id], countdown=5)
+
+
+class WorkerLost(BaseException):
+    """Stands in for a worker dying mid-batch; not caught like a send error."""
+
+
+class TestDMBatchProcessing(AutomationTestBase):
+    """Test micro-batched DM automation."""
+
+    def setUp(self):
+        super().setUp()
+        self.settings.enable_dm_automation = True
+        self.settings.save()
+        self.rule.message_type = 'both'
+        self.rule.save()
+
+    def create_dm(self, message_id, message_text='What is the price?', **kwargs):
+        kwargs.setdefault('created_time', timezone.now())
+        return DirectMessage.objects.create(
+            message_id=message_id,
+            conversation_id=f'conversation-{message_id}',
+            platform='facebook',
+            sender_id='fan-1',
+            message_text=message_text,
+            connection=self.connection,
+            **kwargs
+        )
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_batch_replies_and_records_results(self, mock_meta):
+        """Test that a DM batch replies to matches and skips echoes."""
+        mock_meta.return_value.reply_to_facebook_dm.return_value = {
+            'success': True, 'reply_id': 'reply-1'
+        }
+        for i in range(3):
+            self.create_dm(f'match-{i}')
+        self.create_dm('echo', is_echo=True)
+
+        result = process_dm_batch(self.connection.id)
+
+        self.assertEqual(result['processed'], 4)
+        self.assertEqual(result['replied'], 3)
+        self.assertEqual(result['ignored'], 1)
+        self.assertEqual(DirectMessage.objects.filter(status='replied').count(), 3)
+        self.assertEqual(DirectMessageReply.objects.filter(rule=self.rule, status='sent').count(), 3)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.times_succeeded, 3)
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_batch_skips_stale_pending_messages(self, mock_meta):
+        """Test that DMs left pending past the maximum age are ignored, not answered."""
+        mock_meta.return_value.reply_to_facebook_dm.return_value = {'success': True}
+        stale = self.create_dm('stale')
+        DirectMessage.objects.filter(id=stale.id).update(received_at=timezone.now() - timedelta(days=3))
+        self.create_dm('fresh')
+
+        result = process_dm_batch(self.connection.id)
+
+        self.assertEqual(result['replied'], 1)
+        mock_meta.return_value.reply_to_facebook_dm.assert_called_once()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'ignored')
+        self.assertFalse(DirectMessageReply.objects.filter(direct_message=stale).exists())
+
+    @patch('api.services.automation_engine.REPLIES_PER_SECOND', 0)
+    @patch('api.services.automation_engine.MetaService')
+    def test_interrupted_batch_is_not_resent(self, mock_meta):
+        """Test that a batch dying mid-way keeps what it sent and resends nothing."""
+        mock_meta.return_value.reply_to_facebook_dm.side_effect = [
+            {'success': True, 'reply_id': 'reply-1'}, WorkerLost()
+        ]
+        first = self.create_dm('first', created_time=timezone.now() - timedelta(seconds=2))
+        second = self.create_dm('second')
+
+        with self.assertRaises(WorkerLost):
+            process_dm_batch(self.connection.id)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'replied')
+        self.assertTrue(DirectMessageReply.objects.filter(direct_message=first, status='sent').exists())
+        self.assertEqual(second.status, 'processing')
+
+        self.assertEqual(process_dm_batch(self.connection.id)['processed'], 0)
+        self.assertEqual(mock_meta.return_value.reply_to_facebook_dm.call_count, 2)
+
+
+class TestAutomationStats(AutomationTestBase):
+    """Test the rollup-backed automation statistics endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/automation-stats/'
+
+    def create_old_comment(self, comment_id, days=5, **kwargs):
+        """A comment received `days` days ago, outside the live window."""
+        received_at = timezone.now() - timedelta(days=days)
+        comment = self.create_comment(comment_id, created_time=received_at, **kwargs)
+        Comment.objects.filter(pk=comment.pk).update(received_at=received_at)
+        comment.refresh_from_db()
+        return comment
+
+    def test_stats_combine_rollup_and_live_counts(self):
+        """Test that rolled-up history and today's activity are both counted."""
+        old_comment = self.create_old_comment('old', status='replied')
+        CommentReply.objects.create(comment=old_comment, reply_text='Hi', status='sent')
+        CommentReply.objects.filter(comment=old_comment).update(sent_at=old_comment.received_at)
+        rollup_daily_stats()
+
+        today = self.create_comment('today', status='replied')
+        CommentReply.objects.create(comment=today, reply_text='Hi', status='failed')
+        self.create_comment('today-new')
+
+        response = self.client.get(self.url, {'days': 7})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['stats']
+        self.assertEqual(stats['total_comments'], 3)
+        self.assertEqual(stats['replied_comments'], 2)
+        self.assertEqual(stats['total_replies'], 2)
+        self.assertEqual(stats['successful_replies'], 1)
+        self.assertEqual(stats['success_rate'], 50.0)
+        self.assertEqual(stats['total_rules'], 1)
+        self.assertEqual(stats['active_rules'], 1)
+        self.assertEqual(len(stats['daily']), 7)
+        self.assertEqual(stats['daily'][-1]['messages_received'], 2)
+        self.assertEqual(stats['daily'][-6]['messages_received'], 1)
+
+    def test_history_is_not_rescanned(self):
+        """Test that comments outside the live window only count via the rollup."""
+        self.create_old_comment('old')
+
+        stats = self.client.get(self.url, {'refresh': 'true'}).data['stats']
+        self.assertEqual(stats['total_comments'], 0)
+
+        rollup_daily_stats()
+        stats = self.client.get(self.url, {'refresh': 'true'}).data['stats']
+        self.assertEqual(stats['total_comments'], 1)
+
+    def test_stats_are_cached_per_user(self):
+        """Test that repeated loads are served from the cache."""
+        self.client.get(self.url)
+        self.create_comment('after-cache')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['stats']['total_comments'], 0)
+
+        response = self.client.get(self.url, {'refresh': 'true'})
+        self.assertEqual(response.data['stats']['total_comments'], 1)
+
+    def test_rollup_is_idempotent(self):
+        """Test that re-running the rollup overwrites buckets instead of adding."""
+        self.create_comment('comment-1')
+        rollup_daily_stats()
+        rollup_daily_stats(since=timezone.localdate())
+
+        stats = AutomationDailyStats.objects.get(connection=self.connection, channel='comment')
+        self.assertEqual(stats.messages_received, 1)
+
+    def test_late_comments_count_on_the_day_received(self):
+        """Test that a comment delivered late lands in a day the rollup recomputes."""
+        self.create_comment('late', created_time=timezone.now() - timedelta(days=5))
+
+        rollup_daily_stats(since=timezone.localdate() - timedelta(days=1))
+
+        stats = AutomationDailyStats.objects.get(connection=self.connection, channel='comment')
+        self.assertEqual((stats.date, stats.messages_received), (timezone.localdate(), 1))
+
+    def test_rebuild_command_picks_up_old_status_changes(self):
+        """Test that a full rebuild reflects changes outside the periodic window."""
+        comment = self.create_old_comment('old')
+        rollup_daily_stats()
+        Comment.objects.filter(pk=comment.pk).update(status='replied')
+        rollup_daily_stats(since=timezone.localdate() - timedelta(days=1))
+        stats = AutomationDailyStats.objects.get(connection=self.connection, channel='comment')
+        self.assertEqual(stats.messages_replied, 0)
+
+        call_command('rebuild_automation_stats', stdout=io.StringIO())
+
+        stats = AutomationDailyStats.objects.get(connection=self.connection, channel='comment')
+        self.assertEqual(stats.messages_replied, 1)
+
+
+class TestCommentListPagination(AutomationTestBase):
+    """Test cursor pagination of the comment list."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/comments/'
+        now = timezone.now()
+        for i in range(5):
+            self.create_comment(f'comment-{i}', created_time=now - timedelta(minutes=i))
+        # Two comments with the same timestamp must not be skipped or repeated
+        self.create_comment('tie-a', created_time=now - timedelta(minutes=2))
+
+    def test_pages_follow_cursor_without_count(self):
+        """Test that pages are walked by cursor and no total count is returned."""
+        seen = []
+        url = self.url
+        params = {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['comment_id'] for item in response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(seen[0], 'comment-0')
+        self.assertEqual(seen[-1], 'comment-4')
+
+    def test_page_query_does_not_count(self):
+        """Test that fetching a page runs no table or per-row COUNT queries."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'page_size': 2})
+
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertFalse(queries.captured_queries[0]['sql'].startswith('SELECT COUNT('))
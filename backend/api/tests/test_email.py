@@ -0,0 +1,635 @@
+"""
+Test cases for Gmail sync.
+"""
+import base64
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import EmailAccount, EmailMessage
+from ..services import email_sync
+from ..services.integrations import GmailService, gmail_service
+from ..tasks import sync_all_email_accounts
+
+User = get_user_model()
+
+
+def gmail_message(message_id, labels=None, subject='Hello', body='Hi there'):
+    """Build a Gmail API message resource in format='full'."""
+    return {
+        'id': message_id,
+        'threadId': f'thread-{message_id}',
+        'labelIds': labels if labels is not None else ['INBOX', 'UNREAD'],
+        'snippet': body[:20],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'From', 'value': 'Sender <sender@example.com>'},
+                {'name': 'To', 'value': 'owner@example.com'},
+                {'name': 'Subject', 'value': subject},
+                {'name': 'Date', 'value': 'Mon, 19 Oct 2026 10:00:00 +0000'},
+            ],
+            'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+def http_error(status_code):
+    response = MagicMock(status=status_code, reason='error')
+    return HttpError(response, b'{}')
+
+
+class FakeGmailApi:
+    """Minimal stand-in for the users() resource of the Gmail API client."""
+
+    def __init__(self, messages=None, history_pages=None, history_error=None, history_id='200', errors=None):
+        self.messages_by_id = {m['id']: m for m in (messages or [])}
+        self.history_pages = list(history_pages or [])
+        self.history_error = history_error
+        self.history_id = history_id
+        # message id -> list of exceptions raised by successive fetches
+        self.errors = errors or {}
+        self.get_calls = []
+        self.batch_sizes = []
+        self.formats = []
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return self._result({'emailAddress': 'owner@example.com', 'historyId': self.history_id})
+
+    def messages(self):
+        api = self
+
+        class Messages:
+            def list(self, userId, maxResults, labelIds=None, q=None):
+                ids = [
+                    {'id': m['id']} for m in api.messages_by_id.values()
+                    if not labelIds or set(labelIds) & set(m['labelIds'])
+                ]
+                return api._result({'messages': ids[:maxResults]})
+
+            def get(self, userId, id, format='full', metadataHeaders=None):
+                api.formats.append(format)
+                request = api._result(api.messages_by_id.get(id))
+                request.message_id = id
+                return request
+
+        return Messages()
+
+    def new_batch_http_request(self, callback):
+        api = self
+        requests = []
+
+        class Batch:
+            def add(self, request, request_id):
+                requests.append((request_id, request.message_id))
+
+            def execute(self):
+                api.batch_sizes.append(len(requests))
+                for request_id, message_id in requests:
+                    api.get_calls.append(message_id)
+                    pending_errors = api.errors.get(message_id)
+                    if pending_errors:
+                        callback(request_id, None, pending_errors.pop(0))
+                    else:
+                        callback(request_id, api.messages_by_id[message_id], None)
+
+        return Batch()
+
+    def history(self):
+        api = self
+
+        class History:
+            def list(self, **params):
+                if api.history_error:
+                    raise api.history_error
+                return api._result(api.history_pages.pop(0))
+
+        return History()
+
+    @staticmethod
+    def _result(value):
+        request = MagicMock()
+        request.execute.return_value = value
+        return request
+
+
+@pytest.mark.django_db
+class GmailSyncTestBase(TestCase):
+    """Base test class with a connected Gmail account."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='mailowner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.account = EmailAccount.objects.create(
+            user=self.user,
+            email_address='owner@example.com',
+            access_token='encrypted',
+            refresh_token='encrypted'
+        )
+
+    def gmail_api(self, api):
+        return patch.object(GmailService, '_get_service', return_value=api)
+
+    def sync(self, api):
+        service = GmailService(email_account=self.account)
+        with self.gmail_api(api):
+            return service.sync_messages(max_results=10)
+
+    def store(self, message_id, **kwargs):
+        return EmailMessage.objects.create(
+            account=self.account,
+            message_id=message_id,
+            from_email='sender@example.com',
+            received_at=timezone.now(),
+            **kwargs
+        )
+
+
+class TestIncrementalSync(GmailSyncTestBase):
+    """Test history-based incremental Gmail sync."""
+
+    def test_first_sync_is_full_and_stores_history_id(self):
+        """Test that an account without history id gets a full sync."""
+        api = FakeGmailApi(messages=[gmail_message('m1'), gmail_message('m2', labels=['SENT'])])
+
+        result = self.sync(api)
+
+        self.assertTrue(result['full_sync'])
+        self.assertEqual(EmailMessage.objects.filter(account=self.account).count(), 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.history_id, '200')
+        self.assertIsNotNone(self.account.last_synced)
+
+    def test_full_fetch_keeps_concurrent_account_updates(self):
+        """Test that a full fetch only writes last_synced over a stale account row."""
+        next_sync_at = timezone.now() + timedelta(minutes=30)
+        service = GmailService(email_account=self.account)
+        EmailAccount.objects.filter(pk=self.account.pk).update(history_id='300', next_sync_at=next_sync_at)
+
+        with self.gmail_api(FakeGmailApi(messages=[gmail_message('m1')])):
+            service.fetch_messages(max_results=10)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.history_id, '300')
+        self.assertEqual(self.account.next_sync_at, next_sync_at)
+        self.assertIsNotNone(self.account.last_synced)
+
+    def test_idle_mailbox_fetches_nothing(self):
+        """Test that an unchanged mailbox downloads and writes no messages."""
+        self.account.history_id = '200'
+        self.account.save()
+        api = FakeGmailApi(messages=[gmail_message('m1')], history_pages=[{'historyId': '200'}])
+
+        result = self.sync(api)
+
+        self.assertFalse(result['full_sync'])
+        self.assertEqual(api.get_calls, [])
+        self.assertFalse(EmailMessage.objects.exists())
+
+    def test_history_changes_are_applied(self):
+        """Test that added, deleted and relabelled messages are synced."""
+        self.account.history_id = '100'
+        self.account.save()
+        self.store('read-me', is_read=False, labels=['INBOX', 'UNREAD'])
+        self.store('trash-me', labels=['INBOX'])
+        self.store('gone', labels=['INBOX'])
+        api = FakeGmailApi(
+            messages=[gmail_message('new')],
+            history_pages=[
+                {
+                    'history': [
+                        {'messagesAdded': [{'message': {'id': 'new', 'labelIds': ['INBOX', 'UNREAD']}}]},
+                        {'messagesAdded': [{'message': {'id': 'draft', 'labelIds': ['DRAFT']}}]},
+                        {'labelsRemoved': [{'message': {'id': 'read-me', 'labelIds': ['INBOX']}}]},
+                    ],
+                    'nextPageToken': 'page-2',
+                },
+                {
+                    'history': [
+                        {'labelsAdded': [{'message': {'id': 'trash-me', 'labelIds': ['TRASH']}}]},
+                        {'messagesDeleted': [{'message': {'id': 'gone'}}]},
+                    ],
+                    'historyId': '150',
+                },
+            ],
+        )
+
+        result = self.sync(api)
+
+        self.assertEqual(result['added'], 1)
+        self.assertEqual(result['deleted'], 2)
+        self.assertEqual(api.get_calls, ['new'])
+        self.assertEqual(
+            set(EmailMessage.objects.values_list('message_id', flat=True)),
+            {'new', 'read-me'}
+        )
+        self.assertTrue(EmailMessage.objects.get(message_id='read-me').is_read)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.history_id, '150')
+
+    def test_expired_history_id_triggers_full_sync(self):
+        """Test that a 404 from history.list falls back to a full sync."""
+        self.account.history_id = '1'
+        self.account.save()
+        api = FakeGmailApi(messages=[gmail_message('m1')], history_error=http_error(404))
+
+        result = self.sync(api)
+
+        self.assertTrue(result['full_sync'])
+        self.assertTrue(EmailMessage.objects.filter(message_id='m1').exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.history_id, '200')
+
+
+class TestBatchedFetch(GmailSyncTestBase):
+    """Test batched message download and bulk upsert."""
+
+    def test_messages_are_fetched_in_batches_of_100(self):
+        """Test that downloads are grouped into batch requests."""
+        api = FakeGmailApi(messages=[gmail_message(f'm{i}') for i in range(150)])
+
+        messages = GmailService(email_account=self.account)._fetch_and_store(
+            api, [f'm{i}' for i in range(150)]
+        )
+
+        self.assertEqual(api.batch_sizes, [100, 50])
+        self.assertEqual(len(messages), 150)
+        self.assertEqual(EmailMessage.objects.count(), 150)
+
+    def test_existing_messages_are_upserted_in_one_query(self):
+        """Test that re-synced messages are upserted and indexed with one statement each."""
+        self.store('m1', subject='Old subject')
+        api = FakeGmailApi(messages=[gmail_message('m1', subject='New subject'), gmail_message('m2')])
+
+        with self.assertNumQueries(2):
+            GmailService(email_account=self.account)._fetch_and_store(api, ['m1', 'm2', 'm1'])
+
+        self.assertEqual(EmailMessage.objects.count(), 2)
+        self.assertEqual(EmailMessage.objects.get(message_id='m1').subject, 'New subject')
+
+    def test_item_errors_are_skipped_or_retried(self):
+        """Test that one failed message does not fail the batch."""
+        api = FakeGmailApi(
+            messages=[gmail_message('ok'), gmail_message('throttled'), gmail_message('missing')],
+            errors={'throttled': [http_error(429)], 'missing': [http_error(404)]},
+        )
+
+        messages = GmailService(email_account=self.account)._fetch_and_store(
+            api, ['ok', 'throttled', 'missing']
+        )
+
+        self.assertEqual({m.message_id for m in messages}, {'ok', 'throttled'})
+        self.assertEqual(api.batch_sizes, [3, 1])
+
+
+class TestLazyBodyHydration(GmailSyncTestBase):
+    """Test metadata-only sync with bodies fetched on first open."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def full_message(self, message_id):
+        message = gmail_message(message_id, body='Full body text')
+        message['payload']['mimeType'] = 'multipart/mixed'
+        message['payload']['parts'] = [
+            {'mimeType': 'text/plain', 'body': {'data': message['payload'].pop('body')['data']}},
+            {
+                'mimeType': 'application/pdf',
+                'filename': 'invoice.pdf',
+                'body': {'attachmentId': 'att-1', 'size': 2048},
+            },
+        ]
+        return message
+
+    def test_sync_stores_headers_only(self):
+        """Test that sync requests metadata and keeps hydrated bodies."""
+        self.store('m1', body_text='Opened before', body_fetched_at=timezone.now())
+        api = FakeGmailApi(messages=[gmail_message('m1', subject='Updated'), gmail_message('m2')])
+
+        GmailService(email_account=self.account)._fetch_and_store(api, ['m1', 'm2'])
+
+        self.assertEqual(set(api.formats), {'metadata'})
+        m1 = EmailMessage.objects.get(message_id='m1')
+        self.assertEqual(m1.subject, 'Updated')
+        self.assertEqual(m1.body_text, 'Opened before')
+        m2 = EmailMessage.objects.get(message_id='m2')
+        self.assertEqual(m2.body_text, '')
+        self.assertIsNone(m2.body_fetched_at)
+
+    def test_detail_view_hydrates_once(self):
+        """Test that the body is downloaded on first open and then served locally."""
+        message = self.store('m1', subject='Invoice')
+        api = FakeGmailApi(messages=[self.full_message('m1')])
+        url = f'/api/email/messages/{message.id}/'
+
+        with self.gmail_api(api):
+            first = self.client.get(url)
+            second = self.client.get(url)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['body_text'], 'Full body text')
+        self.assertEqual(first.data['attachments'][0]['filename'], 'invoice.pdf')
+        self.assertTrue(first.data['has_attachments'])
+        self.assertEqual(second.data['body_text'], 'Full body text')
+        self.assertEqual(api.formats, ['full'])
+
+
+class TestGmailClientCache(GmailSyncTestBase):
+    """Test reuse of built Gmail clients and coordinated token refresh."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        gmail_service._client_cache().clear()
+        self.account.token_expiry = timezone.now() + timedelta(hours=1)
+        self.account.save()
+        decrypt = patch.object(GmailService, '_decrypt_token', side_effect=lambda token: f'plain-{token}')
+        decrypt.start()
+        self.addCleanup(decrypt.stop)
+
+    @patch('api.services.integrations.gmail_service.build_gmail_client')
+    def test_client_is_built_once_per_account(self, mock_build):
+        """Test that repeated calls reuse the built client."""
+        first = GmailService(email_account=self.account)._get_service()
+        second = GmailService(email_account=EmailAccount.objects.get(pk=self.account.pk))._get_service()
+
+        self.assertIs(first, second)
+        mock_build.assert_called_once()
+
+    @patch('api.services.integrations.gmail_service.build_gmail_client')
+    def test_client_is_rebuilt_after_token_change(self, mock_build):
+        """Test that a reconnected account does not reuse the old client."""
+        GmailService(email_account=self.account)._get_service()
+        self.account.access_token = 'reconnected'
+        self.account.save()
+
+        GmailService(email_account=self.account)._get_service()
+
+        self.assertEqual(mock_build.call_count, 2)
+
+    @patch('api.services.integrations.gmail_service.CLIENT_CACHE_SIZE', 2)
+    @patch('api.services.integrations.gmail_service.build_gmail_client')
+    def test_least_recently_used_clients_are_evicted(self, mock_build):
+        """Test that the per-thread cache keeps only the most recently used accounts."""
+        accounts = [self.account] + [
+            EmailAccount.objects.create(
+                user=self.user, email_address=f'other{i}@example.com',
+                access_token='encrypted', refresh_token='encrypted',
+                token_expiry=self.account.token_expiry
+            )
+            for i in range(2)
+        ]
+        for account in (accounts[0], accounts[1], accounts[0], accounts[2]):
+            GmailService(email_account=account)._get_service()
+
+        self.assertEqual(list(gmail_service._client_cache()), [accounts[0].pk, accounts[2].pk])
+
+    def test_refresh_locks_are_per_account(self):
+        """Test that refreshing one account does not block refreshes of another."""
+        lock = gmail_service._refresh_lock(1)
+
+        self.assertIs(gmail_service._refresh_lock(1), lock)
+        with lock:
+            self.assertTrue(gmail_service._refresh_lock(2).acquire(blocking=False))
+
+    @patch('api.services.integrations.gmail_service.Credentials.refresh')
+    def test_token_refreshed_elsewhere_is_reused(self, mock_refresh):
+        """Test that an expired token is not refreshed when another worker already did."""
+        stale = EmailAccount.objects.get(pk=self.account.pk)
+        stale.token_expiry = timezone.now() - timedelta(minutes=1)
+        EmailAccount.objects.filter(pk=self.account.pk).update(access_token='fresh')
+
+        creds = GmailService(email_account=stale)._get_credentials()
+
+        mock_refresh.assert_not_called()
+        self.assertEqual(creds.token, 'plain-fresh')
+        self.assertFalse(creds.expired)
+
+    def test_expired_token_is_refreshed_and_stored(self):
+        """Test that the refreshing worker stores the new token and releases the lock."""
+        EmailAccount.objects.filter(pk=self.account.pk).update(token_expiry=timezone.now() - timedelta(minutes=1))
+        self.account.refresh_from_db()
+
+        def refresh(creds, request):
+            creds.token = 'new-token'
+            creds.expiry = None
+
+        with patch('api.services.integrations.gmail_service.Credentials.refresh', autospec=True, side_effect=refresh), \
+                patch.object(GmailService, '_encrypt_token', side_effect=lambda token: f'enc-{token}'):
+            creds = GmailService(email_account=self.account)._get_credentials()
+
+        self.assertEqual(creds.token, 'new-token')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.access_token, 'enc-new-token')
+        self.assertGreater(self.account.token_expiry, timezone.now())
+        self.assertIsNone(cache.get(f'gmail_token_refresh:{self.account.pk}'))
+
+
+class TestSyncScheduler(GmailSyncTestBase):
+    """Test staggered, adaptive Gmail sync scheduling."""
+
+    def test_new_accounts_are_phased_over_their_interval(self):
+        """Test that unscheduled accounts get a hash-spread first sync time."""
+        now = timezone.now()
+
+        email_sync.assign_initial_phases(now)
+
+        self.account.refresh_from_db()
+        offset = (self.account.next_sync_at - now).total_seconds()
+        self.assertEqual(offset, email_sync.hash_offset(self.account.id, 5 * 60))
+        self.assertLess(offset, 5 * 60)
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_only_due_active_inboxes_are_dispatched(self, mock_sync):
+        """Test that dormant and not-yet-due accounts are skipped."""
+        now = timezone.now()
+        self.account.next_sync_at = now - timedelta(seconds=1)
+        self.account.inbox_opened_at = now
+        self.account.save()
+        dormant = EmailAccount.objects.create(
+            user=self.user, email_address='old@example.com', access_token='x', refresh_token='x',
+            next_sync_at=now - timedelta(minutes=1), inbox_opened_at=now - timedelta(days=30)
+        )
+        EmailAccount.objects.create(
+            user=self.user, email_address='later@example.com', access_token='x', refresh_token='x',
+            next_sync_at=now + timedelta(minutes=10), inbox_opened_at=now
+        )
+
+        result = sync_all_email_accounts()
+
+        self.assertEqual(result['queued'], 1)
+        mock_sync.apply_async.assert_called_once_with(
+            args=[self.account.id],
+            countdown=email_sync.hash_offset(self.account.id, 60)
+        )
+        self.account.refresh_from_db()
+        self.assertGreater(self.account.next_sync_at, now)
+        dormant.refresh_from_db()
+        self.assertLess(dormant.next_sync_at, now)
+
+    def test_interval_adapts_to_activity(self):
+        """Test that busy inboxes sync more often and idle ones less."""
+        self.assertEqual(email_sync.next_interval(4, changes=3), 2)
+        self.assertEqual(email_sync.next_interval(1, changes=3), 1)
+        self.assertEqual(email_sync.next_interval(4, changes=0), 8)
+        self.assertEqual(email_sync.next_interval(20, changes=0), 30)
+
+        email_sync.schedule_next_sync(self.account, 0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.sync_interval_minutes, 10)
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_opening_dormant_inbox_triggers_sync(self, mock_sync):
+        """Test that a returning user's dormant account is synced right away."""
+        self.account.inbox_opened_at = timezone.now() - timedelta(days=30)
+        self.account.sync_interval_minutes = 30
+        self.account.save()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        client.get('/api/email/messages/')
+        client.get('/api/email/messages/')
+
+        mock_sync.delay.assert_called_once_with(self.account.id)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.sync_interval_minutes, 1)
+        self.assertGreater(self.account.inbox_opened_at, timezone.now() - timedelta(minutes=1))
+
+
+@override_settings(GMAIL_PUSH_VERIFICATION_TOKEN='push-secret')
+class TestGmailPush(GmailSyncTestBase):
+    """Test the Gmail push notification endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.url = '/api/email/push/?token=push-secret'
+        self.account.history_id = '100'
+        self.account.save()
+
+    def push(self, history_id, email_address='owner@example.com', url=None):
+        data = json.dumps({'emailAddress': email_address, 'historyId': history_id})
+        return self.client.post(url or self.url, {
+            'message': {'data': base64.b64encode(data.encode()).decode(), 'messageId': '1'},
+            'subscription': 'projects/local/subscriptions/gmail-push',
+        }, format='json')
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_notification_queues_one_sync_per_burst(self, mock_sync):
+        """Test that a burst of notifications queues a single history sync."""
+        first = self.push(101)
+        self.push(102)
+
+        self.assertEqual(first.status_code, status.HTTP_204_NO_CONTENT)
+        mock_sync.apply_async.assert_called_once_with(
+            args=[self.account.id], countdown=email_sync.PUSH_COALESCE_SECONDS
+        )
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_already_synced_history_is_ignored(self, mock_sync):
+        """Test that notifications at or before the stored history id are ignored."""
+        self.push(100)
+        self.push(50, email_address='someone-else@example.com')
+
+        mock_sync.apply_async.assert_not_called()
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_invalid_token_is_rejected(self, mock_sync):
+        """Test that pushes without the verification token are refused."""
+        response = self.push(101, url='/api/email/push/?token=wrong')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        mock_sync.apply_async.assert_not_called()
+
+    @patch('api.tasks.sync_single_email_account')
+    def test_malformed_history_id_is_acknowledged(self, mock_sync):
+        """Test that a non-numeric history id is dropped rather than retried forever."""
+        response = self.push('not-a-number')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        mock_sync.apply_async.assert_not_called()
+
+    def test_watched_accounts_poll_slowly(self):
+        """Test that polling becomes a fallback while push is active."""
+        self.account.watch_expires_at = timezone.now() + timedelta(days=7)
+
+        email_sync.schedule_next_sync(self.account, changes=5)
+
+        delay = self.account.next_sync_at - timezone.now()
+        self.assertGreater(delay, timedelta(minutes=email_sync.PUSH_FALLBACK_MINUTES - 1))
+
+
+class TestEmailSearch(GmailSyncTestBase):
+    """Test local full-text search over synced email."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/email/messages/search/'
+
+    def test_sync_indexes_and_search_ranks_subject_first(self):
+        """Test that synced messages are searchable and subject hits rank highest."""
+        api = FakeGmailApi(messages=[
+            gmail_message('body-hit', subject='Weekly update', body='The invoice is attached'),
+            gmail_message('subject-hit', subject='Invoice for October', body='Thanks'),
+            gmail_message('miss', subject='Lunch?', body='Pizza today'),
+        ])
+        GmailService(email_account=self.account)._fetch_and_store(api, ['body-hit', 'subject-hit', 'miss'])
+        # Only the snippet is synced; bodies are indexed once hydrated
+        EmailMessage.objects.filter(message_id='body-hit').update(body_text='The invoice is attached')
+        EmailMessage.refresh_search_vectors(EmailMessage.objects.filter(message_id='body-hit'))
+
+        response = self.client.get(self.url, {'q': 'invoices'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [hit['message_id'] for hit in response.data['results']]
+        self.assertEqual(ids, ['subject-hit', 'body-hit'])
+        self.assertGreater(response.data['results'][0]['rank'], response.data['results'][1]['rank'])
+        self.assertIn('<mark>invoice</mark>', response.data['results'][1]['headline'])
+
+    def test_search_is_scoped_to_user(self):
+        """Test that other users' messages are never returned."""
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        other_account = EmailAccount.objects.create(
+            user=other, email_address='other@example.com', access_token='x', refresh_token='x'
+        )
+        message = EmailMessage.objects.create(
+            account=other_account, message_id='secret', from_email='a@example.com',
+            subject='Invoice', received_at=timezone.now()
+        )
+        EmailMessage.refresh_search_vectors(EmailMessage.objects.filter(pk=message.pk))
+
+        response = self.client.get(self.url, {'q': 'invoice'})
+
+        self.assertEqual(response.data['results'], [])
+
+    def test_query_is_required(self):
+        """Test that an empty query is rejected."""
+        response = self.client.get(self.url, {'q': ' '})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_account_id_is_rejected(self):
+        """Test that a non-numeric account_id is a bad request, not a server error."""
+        response = self.client.get(self.url, {'q': 'invoice', 'account_id': 'abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
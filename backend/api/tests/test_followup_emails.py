@@ -0,0 +1,359 @@
+"""
+Test cases for the freebie and opt-in follow-up email sequences.
+"""
+from datetime import time, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import (
+    CustomLink,
+    FreebieFollowupEmail,
+    OptinFollowupEmail,
+    Order,
+    ScheduledFollowupEmail,
+    ScheduledOptinEmail,
+)
+from ..services import email_service, followup_emails
+from ..tasks import (
+    schedule_freebie_email_sequence,
+    schedule_optin_email_sequence,
+    send_order_delivery_email,
+    send_scheduled_followup_emails,
+    send_scheduled_optin_emails,
+)
+
+User = get_user_model()
+
+
+def batch_response(params):
+    return {'data': [{'id': f'email-{index}'} for index in range(len(params))]}
+
+
+@pytest.mark.django_db
+class FollowupTestBase(TestCase):
+    """Base test class with a seller, a freebie and an opt-in product."""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller',
+            email='seller@example.com',
+            password='testpass123'
+        )
+        self.profile = self.seller.profile
+        self.profile.display_name = 'Sam Seller'
+        self.profile.save()
+        self.freebie = CustomLink.objects.create(user_profile=self.profile, title='Guide', type='freebie')
+        self.optin = CustomLink.objects.create(user_profile=self.profile, title='List', type='opt_in')
+        self.freebie_step = FreebieFollowupEmail.objects.create(
+            step_number=1,
+            delay_days=1,
+            send_time=time(10, 0),
+            subject='Hi {{ first_name }}',
+            body='From {{ sender_name }}'
+        )
+        self.optin_step = OptinFollowupEmail.objects.create(
+            step_number=1,
+            delay_days=1,
+            send_time=time(10, 0),
+            subject='Welcome {{ first_name }}',
+            body='From {{ sender_name }}'
+        )
+
+    def create_order(self, link, email='lead@example.com', name='Lee Lead'):
+        return Order.objects.create(
+            custom_link=link,
+            status='completed',
+            customer_email=email,
+            customer_name=name
+        )
+
+    def schedule_followups(self, count, scheduled_for, link=None, model=ScheduledFollowupEmail):
+        link = link or self.freebie
+        template = self.freebie_step if model is ScheduledFollowupEmail else self.optin_step
+        return [
+            model.objects.create(
+                order=self.create_order(link, email=f'lead{index}@example.com'),
+                customer_email=f'lead{index}@example.com',
+                email_template=template,
+                scheduled_for=scheduled_for
+            )
+            for index in range(count)
+        ]
+
+
+class TestBatchedFollowupSender(FollowupTestBase):
+    """Due follow-ups are claimed in chunks and sent through the batch endpoint."""
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=batch_response)
+    def test_overdue_emails_are_not_dropped(self, batch_send):
+        # Older than the previous 10 minute lookback window
+        emails = self.schedule_followups(2, timezone.now() - timedelta(hours=3))
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 2, 'failed': 0})
+        for email in emails:
+            email.refresh_from_db()
+            self.assertTrue(email.sent)
+            self.assertIsNotNone(email.sent_at)
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=batch_response)
+    def test_sends_in_chunks(self, batch_send):
+        self.schedule_followups(5, timezone.now() - timedelta(minutes=1))
+
+        with patch.object(followup_emails, 'SEND_CHUNK_SIZE', 2):
+            result = send_scheduled_followup_emails()
+
+        self.assertEqual(result['sent'], 5)
+        self.assertEqual([len(call.args[0]) for call in batch_send.call_args_list], [2, 2, 1])
+        params = batch_send.call_args_list[0].args[0][0]
+        self.assertEqual(params['subject'], 'Hi Lee')
+        self.assertIn('From Sam Seller', params['html'])
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=batch_response)
+    def test_skips_future_and_sent_emails(self, batch_send):
+        future = self.schedule_followups(1, timezone.now() + timedelta(hours=1))[0]
+        already_sent = self.schedule_followups(1, timezone.now() - timedelta(hours=1))[0]
+        ScheduledFollowupEmail.objects.filter(pk=already_sent.pk).update(sent=True)
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 0, 'failed': 0})
+        batch_send.assert_not_called()
+        future.refresh_from_db()
+        self.assertFalse(future.sent)
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=Exception('rate limited'))
+    def test_failed_batch_is_recorded_and_retried_later(self, batch_send):
+        email = self.schedule_followups(1, timezone.now() - timedelta(minutes=1))[0]
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 0, 'failed': 1})
+        self.assertEqual(batch_send.call_count, 1)
+        email.refresh_from_db()
+        self.assertFalse(email.sent)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.error_message, 'rate limited')
+        self.assertTrue(followup_emails.due_followups(ScheduledFollowupEmail).filter(pk=email.pk).exists())
+
+    @patch('api.services.email_service.resend.Batch.send', return_value={'data': [{'id': 'email-0'}]})
+    def test_short_resend_response_fails_the_chunk(self, batch_send):
+        emails = self.schedule_followups(2, timezone.now() - timedelta(minutes=1))
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 0, 'failed': 2})
+        for email in emails:
+            email.refresh_from_db()
+            self.assertFalse(email.sent)
+            self.assertEqual(email.attempts, 1)
+
+    @patch.object(followup_emails, 'send_batch_emails', return_value=[None])
+    def test_unmatched_send_results_fail_the_chunk(self, send_batch):
+        emails = self.schedule_followups(2, timezone.now() - timedelta(minutes=1))
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 0, 'failed': 2})
+        emails[0].refresh_from_db()
+        self.assertFalse(emails[0].sent)
+        self.assertEqual(emails[0].error_message, 'Expected 2 send results, got 1')
+
+    def test_gives_up_after_max_attempts(self):
+        email = self.schedule_followups(1, timezone.now() - timedelta(minutes=1))[0]
+        ScheduledFollowupEmail.objects.filter(pk=email.pk).update(attempts=followup_emails.MAX_ATTEMPTS)
+
+        self.assertFalse(followup_emails.due_followups(ScheduledFollowupEmail).exists())
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=batch_response)
+    def test_stale_emails_are_dropped(self, batch_send):
+        stale = self.schedule_followups(1, timezone.now() - followup_emails.MAX_SEND_DELAY - timedelta(hours=1))[0]
+
+        result = send_scheduled_followup_emails()
+
+        self.assertEqual(result, {'sent': 0, 'failed': 0})
+        batch_send.assert_not_called()
+        stale.refresh_from_db()
+        self.assertFalse(stale.sent)
+
+    @patch('api.services.email_service.resend.Batch.send', side_effect=batch_response)
+    def test_optin_emails(self, batch_send):
+        email = self.schedule_followups(
+            1, timezone.now() - timedelta(days=1), link=self.optin, model=ScheduledOptinEmail
+        )[0]
+
+        result = send_scheduled_optin_emails()
+
+        self.assertEqual(result, {'sent': 1, 'failed': 0})
+        email.refresh_from_db()
+        self.assertTrue(email.sent)
+        self.assertEqual(batch_send.call_args.args[0][0]['subject'], 'Welcome Lee')
+
+
+class TestSequenceEnrollment(FollowupTestBase):
+    """Enrollment checks use the denormalized address and schedule in one insert."""
+
+    def test_schedules_all_steps_in_one_insert(self):
+        FreebieFollowupEmail.objects.create(
+            step_number=2, delay_days=3, send_time=time(9, 30), subject='Day 3', body='Body'
+        )
+        order = self.create_order(self.freebie, email='Lead@Example.com')
+
+        with self.assertNumQueries(5):
+            result = schedule_freebie_email_sequence(order.id)
+
+        self.assertEqual(result, {'success': True, 'scheduled_count': 2})
+        scheduled = list(ScheduledFollowupEmail.objects.filter(order=order).order_by('scheduled_for'))
+        self.assertEqual([email.customer_email for email in scheduled], ['lead@example.com'] * 2)
+        self.assertEqual(scheduled[1].scheduled_for.date(), (order.created_at + timedelta(days=3)).date())
+        self.assertEqual((scheduled[1].scheduled_for.hour, scheduled[1].scheduled_for.minute), (9, 30))
+
+    def test_active_enrollment_in_other_sequence_blocks(self):
+        self.schedule_followups(1, timezone.now() + timedelta(days=1))
+        order = self.create_order(self.optin, email='LEAD0@example.com')
+
+        result = schedule_optin_email_sequence(order.id)
+
+        self.assertEqual(result['reason'], 'already_enrolled')
+        self.assertFalse(ScheduledOptinEmail.objects.filter(order=order).exists())
+
+    def test_abandoned_emails_allow_reenrollment(self):
+        failed, stale = self.schedule_followups(2, timezone.now() + timedelta(days=1))
+        ScheduledFollowupEmail.objects.filter(pk=failed.pk).update(attempts=followup_emails.MAX_ATTEMPTS)
+        ScheduledFollowupEmail.objects.filter(pk=stale.pk).update(scheduled_for=timezone.now() - timedelta(days=3))
+
+        self.assertFalse(followup_emails.is_enrolled('lead0@example.com'))
+        self.assertFalse(followup_emails.is_enrolled('lead1@example.com'))
+        orders = [self.create_order(self.optin, email=f'lead{index}@example.com') for index in range(2)]
+        enrolled = followup_emails.enroll_orders(orders, OptinFollowupEmail, ScheduledOptinEmail)
+        self.assertEqual(enrolled, 2)
+
+    def test_finished_sequence_allows_reenrollment(self):
+        self.schedule_followups(1, timezone.now() - timedelta(days=1))
+        ScheduledFollowupEmail.objects.update(sent=True)
+        order = self.create_order(self.freebie, email='lead0@example.com')
+
+        result = schedule_freebie_email_sequence(order.id)
+
+        self.assertEqual(result, {'success': True, 'scheduled_count': 1})
+
+
+class TestFollowupRendering(FollowupTestBase):
+    """Follow-up placeholders are filled in and seller variables worked out once per batch."""
+
+    def setUp(self):
+        super().setUp()
+        self.profile.affiliate_link = 'https://shop.example.com/?a=1&b=2'
+        self.profile.save()
+        self.freebie_step.subject = '{{ first_name }}, from {{ sender_name }}'
+        self.freebie_step.body = 'Line one\nBuy: {{ affiliate_link }}'
+        self.freebie_step.save()
+
+    def test_variables_are_inserted_verbatim(self):
+        email = self.schedule_followups(1, timezone.now())[0]
+
+        params = email_service.build_followup_email(email, 'freebie_followup')
+
+        self.assertEqual(params['subject'], 'Lee, from Sam Seller')
+        self.assertIn('Line one<br>Buy: https://shop.example.com/?a=1&b=2', params['html'])
+
+    def test_other_braces_are_left_as_written(self):
+        self.freebie_step.subject = '{% sale %} for {{ first_name }}'
+        self.freebie_step.body = '{# not a comment #} {{ unknown }} {{first_name}} {{ first_name }}'
+        self.freebie_step.save()
+        email = self.schedule_followups(1, timezone.now())[0]
+
+        params = email_service.build_followup_email(email, 'freebie_followup')
+
+        self.assertEqual(params['subject'], '{% sale %} for Lee')
+        self.assertIn('{# not a comment #} {{ unknown }} {{first_name}} Lee', params['html'])
+
+    def test_templates_are_compiled_once_per_version(self):
+        emails = self.schedule_followups(2, timezone.now())
+        split = email_service._FOLLOWUP_PLACEHOLDER.split
+
+        with patch.object(email_service, '_FOLLOWUP_PLACEHOLDER') as placeholder:
+            placeholder.split.side_effect = split
+            email_service.build_followup_email(emails[0], 'freebie_followup')
+            email_service.build_followup_email(emails[1], 'freebie_followup')
+            self.assertEqual(placeholder.split.call_count, 2)
+
+            self.freebie_step.subject = 'Edited for {{ first_name }}'
+            self.freebie_step.save()
+            params = email_service.build_followup_email(emails[1], 'freebie_followup')
+
+        self.assertEqual(placeholder.split.call_count, 4)
+        self.assertEqual(params['subject'], 'Edited for Lee')
+
+    def test_seller_context_is_cached_per_batch(self):
+        emails = self.schedule_followups(2, timezone.now())
+        seller_cache = {}
+
+        email_service.build_followup_email(emails[0], 'freebie_followup', seller_cache)
+        self.assertEqual(list(seller_cache), [self.profile.pk])
+        seller_cache[self.profile.pk] = {**seller_cache[self.profile.pk], 'sender_name': 'Cached Name'}
+        params = email_service.build_followup_email(emails[1], 'freebie_followup', seller_cache)
+
+        self.assertEqual(params['subject'], 'Lee, from Cached Name')
+
+
+class TestOrderCompletionDelivery(FollowupTestBase):
+    """Completing an order queues delivery after commit instead of emailing inline."""
+
+    def complete(self, order):
+        order.status = 'completed'
+        with self.captureOnCommitCallbacks() as callbacks:
+            order.save(update_fields=['status'])
+        return callbacks
+
+    @patch('api.tasks.schedule_freebie_email_sequence.delay')
+    @patch('api.tasks.send_order_delivery_email.delay')
+    @patch('api.services.email_service.send_product_delivery_email')
+    def test_completion_queues_tasks_after_commit(self, send_email, deliver, schedule):
+        order = Order.objects.create(custom_link=self.freebie, customer_email='lead@example.com')
+
+        # The order and its stats counters are updated; no SELECT of the previous status
+        with self.assertNumQueries(4):
+            callbacks = self.complete(order)
+
+        send_email.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        deliver.assert_called_once_with(order.id)
+        schedule.assert_called_once_with(order.id)
+
+    @patch('api.tasks.send_order_delivery_email.delay')
+    def test_already_completed_order_is_not_redelivered(self, deliver):
+        order = Order.objects.get(pk=self.create_order(self.freebie).pk)
+
+        order.customer_name = 'Renamed'
+        callbacks = self.complete(order)
+
+        self.assertEqual(callbacks, [])
+        deliver.assert_not_called()
+
+    @patch('api.tasks.send_order_delivery_email.delay')
+    def test_loaded_pending_order_is_delivered_once(self, deliver):
+        pending = Order.objects.create(custom_link=self.optin, customer_email='lead@example.com')
+        order = Order.objects.get(pk=pending.pk)
+
+        with patch('api.tasks.schedule_optin_email_sequence.delay'):
+            first = self.complete(order)
+            second = self.complete(order)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+
+    @patch('api.services.email_service.send_product_delivery_email', return_value=True)
+    def test_delivery_task_sends_email(self, send_email):
+        order = self.create_order(self.freebie)
+
+        result = send_order_delivery_email(order.id)
+
+        self.assertEqual(result, {'success': True})
+        self.assertEqual(send_email.call_args.args[0].pk, order.pk)
@@ -0,0 +1,401 @@
+"""
+Test cases for the seller orders API.
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import (
+    CollectInfoField,
+    CollectInfoResponse,
+    CustomLink,
+    DataExport,
+    FreebieFollowupEmail,
+    Order,
+    OrderDailyStats,
+    OrderStats,
+    ScheduledFollowupEmail,
+    get_export_storage,
+)
+from ..services import bulk_orders, data_export
+from ..services.followup_emails import enroll_orders
+from ..services.order_stats import rebuild_order_stats
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class OrdersTestBase(TestCase):
+    """Base test class with a seller, two products and an authenticated client."""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller',
+            email='seller@example.com',
+            password='testpass123'
+        )
+        self.profile = self.seller.profile
+        self.course = CustomLink.objects.create(
+            user_profile=self.profile,
+            title='Course',
+            checkout_price=Decimal('49.00'),
+            checkout_discounted_price=Decimal('29.00')
+        )
+        self.guide = CustomLink.objects.create(
+            user_profile=self.profile,
+            title='Guide',
+            type='freebie',
+            checkout_price=Decimal('0.00')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+        # Order completion dispatches delivery emails
+        patcher = patch('api.tasks.send_order_delivery_email.delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_orders(self, link, count, status='pending'):
+        return [
+            Order.objects.create(custom_link=link, customer_email=f'lead{index}@example.com', status=status)
+            for index in range(count)
+        ]
+
+
+class TestOrderList(OrdersTestBase):
+    """The orders list is paged by number, as the leads page and export expect."""
+
+    def test_pages_by_number_with_count(self):
+        self.create_orders(self.course, 12)
+
+        first = self.client.get('/api/orders/')
+        second = self.client.get('/api/orders/', {'page': 2})
+
+        self.assertEqual(first.data['count'], 12)
+        self.assertEqual(len(first.data['results']), 10)
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+
+
+class TestOrderStats(OrdersTestBase):
+    """Order counters are kept per product and read by the stats endpoint."""
+
+    def stats(self, link):
+        return OrderStats.objects.get(custom_link=link)
+
+    def test_counters_follow_orders(self):
+        pending = self.create_orders(self.course, 3)
+        self.create_orders(self.guide, 1, status='completed')
+
+        stats = self.stats(self.course)
+        self.assertEqual((stats.user_id, stats.total_orders, stats.pending_orders), (self.seller.id, 3, 3))
+        self.assertEqual(OrderDailyStats.objects.get(custom_link=self.course, date=timezone.localdate()).orders, 3)
+
+        pending[0].status = 'completed'
+        pending[0].save()
+        pending[1].status = 'cancelled'
+        pending[1].save(update_fields=['status'])
+        pending[2].customer_name = 'Unchanged status'
+        pending[2].save()
+
+        stats = self.stats(self.course)
+        self.assertEqual(
+            (stats.total_orders, stats.pending_orders, stats.completed_orders, stats.cancelled_orders),
+            (3, 1, 1, 1)
+        )
+
+        pending[1].delete()
+        stats = self.stats(self.course)
+        self.assertEqual((stats.total_orders, stats.cancelled_orders), (2, 0))
+        self.assertEqual(OrderDailyStats.objects.get(custom_link=self.course).orders, 2)
+
+    def test_counters_match_rebuild(self):
+        orders = self.create_orders(self.course, 4)
+        orders[0].status = 'completed'
+        orders[0].save()
+        orders[1].delete()
+        incremental = OrderStats.objects.filter(custom_link=self.course).values(
+            'total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders'
+        ).get()
+
+        rebuilt = rebuild_order_stats(self.course)
+
+        self.assertEqual(
+            {field: getattr(rebuilt, field) for field in incremental},
+            incremental
+        )
+        self.assertEqual(OrderDailyStats.objects.get(custom_link=self.course).orders, 3)
+
+    def test_deleting_product_drops_its_rows(self):
+        self.create_orders(self.course, 2)
+
+        self.course.delete()
+
+        self.assertFalse(OrderStats.objects.filter(custom_link_id=self.course.id).exists())
+        self.assertFalse(OrderDailyStats.objects.filter(custom_link_id=self.course.id).exists())
+
+    def test_stats_endpoint_reads_counters(self):
+        completed = self.create_orders(self.course, 2, status='completed')
+        self.create_orders(self.course, 1, status='cancelled')
+        self.create_orders(self.guide, 3)
+        # Created before the 30 day window
+        old = timezone.now() - timedelta(days=40)
+        Order.objects.filter(pk=completed[0].pk).update(created_at=old)
+        OrderDailyStats.objects.filter(custom_link=self.course).update(orders=2)
+        OrderDailyStats.objects.create(custom_link=self.course, date=timezone.localdate(old), orders=1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/stats/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_orders'], 6)
+        self.assertEqual(response.data['pending_orders'], 3)
+        self.assertEqual(response.data['completed_orders'], 2)
+        self.assertEqual(response.data['cancelled_orders'], 1)
+        self.assertEqual(response.data['total_revenue'], 58.0)
+        self.assertEqual(response.data['recent_orders_30d'], 5)
+        self.assertEqual(response.data['orders_by_product'], [
+            {'custom_link__id': self.course.id, 'custom_link__title': 'Course', 'count': 3},
+            {'custom_link__id': self.guide.id, 'custom_link__title': 'Guide', 'count': 3},
+        ])
+
+    def test_stats_only_include_own_products(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        other_link = CustomLink.objects.create(user_profile=other.profile, title='Other')
+        self.create_orders(other_link, 2)
+
+        response = self.client.get('/api/orders/stats/')
+
+        self.assertEqual(response.data['total_orders'], 0)
+        self.assertEqual(response.data['orders_by_product'], [])
+
+
+class TestDataExport(OrdersTestBase):
+    """Orders and leads are exported to files by a background task."""
+
+    def setUp(self):
+        super().setUp()
+        self.export_root = self.make_dir()
+        self.override_storage(self.export_root)
+
+    def make_dir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+    def override_storage(self, export_root, **overrides):
+        # The file field resolves get_export_storage() once, so swap its instance too
+        storages = dict(settings.STORAGES, exports={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': export_root},
+        })
+        settings_override = override_settings(STORAGES=storages, **overrides)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        storage_patch = patch.object(
+            DataExport._meta.get_field('file'), 'storage', get_export_storage()
+        )
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+    def read_csv(self, export):
+        with export.file.open('rb') as fileobj:
+            return list(csv.reader(io.StringIO(fileobj.read().decode('utf-8'))))
+
+    @patch('api.tasks.run_data_export.delay')
+    def test_request_queues_export_after_commit(self, run_export):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/exports/', {
+                'export_type': 'orders',
+                'filters': {'custom_link_id': self.course.id, 'status': 'completed'}
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['status'], response.data['progress']), ('pending', 0))
+        self.assertIsNone(response.data['download_url'])
+        run_export.assert_called_once_with(response.data['id'])
+
+    def test_rejects_other_sellers_products(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        other_link = CustomLink.objects.create(user_profile=other.profile, title='Other')
+
+        response = self.client.post('/api/exports/', {
+            'export_type': 'orders', 'filters': {'custom_link_id': other_link.id}
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('api.services.data_export.parquet_available', return_value=False)
+    def test_parquet_needs_pyarrow(self, parquet_available):
+        response = self.client.post('/api/exports/', {'export_type': 'orders', 'file_format': 'parquet'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orders_are_streamed_in_chunks_with_flattened_answers(self):
+        orders = self.create_orders(self.course, 3)
+        Order.objects.filter(pk=orders[0].pk).update(form_responses={'Goal': 'Grow', 'Topics': ['SEO', 'Ads']})
+        Order.objects.filter(pk=orders[1].pk).update(form_responses={'Budget': 100})
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.create_orders(CustomLink.objects.create(user_profile=other.profile, title='Other'), 2)
+        export = DataExport.objects.create(user=self.seller, export_type='orders')
+
+        with patch.object(data_export, 'CHUNK_SIZE', 2):
+            result = data_export.run_export(export)
+
+        self.assertEqual(result, {'success': True, 'rows': 3})
+        export.refresh_from_db()
+        self.assertEqual((export.status, export.total_rows, export.exported_rows, export.progress), ('completed', 3, 3, 100))
+        rows = self.read_csv(export)
+        self.assertEqual(rows[0][-3:], ['Budget', 'Goal', 'Topics'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][0], orders[0].order_id)
+        self.assertEqual(rows[1][-3:], ['', 'Grow', 'SEO, Ads'])
+        self.assertEqual(rows[2][-3:], ['100', '', ''])
+
+    def test_collect_info_headers_use_field_labels(self):
+        field = CollectInfoField.objects.create(custom_link=self.guide, field_type='text', label='Company', order=1)
+        CollectInfoResponse.objects.create(custom_link=self.guide, responses={str(field.id): 'Acme'})
+        export = DataExport.objects.create(
+            user=self.seller, export_type='collect_info_responses', filters={'custom_link_id': self.guide.id}
+        )
+
+        data_export.run_export(export)
+
+        rows = self.read_csv(export)
+        self.assertEqual((rows[0][-1], rows[1][-1]), ('Company', 'Acme'))
+
+    def test_download_is_limited_to_owner(self):
+        self.create_orders(self.course, 1)
+        export = DataExport.objects.create(user=self.seller, export_type='orders')
+        data_export.run_export(export)
+
+        response = self.client.get(f'/api/exports/{export.id}/')
+        self.assertTrue(response.data['download_url'].endswith(f'/api/exports/{export.id}/download/'))
+        download = self.client.get(f'/api/exports/{export.id}/download/')
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Order ID', b''.join(download.streaming_content))
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/exports/{export.id}/download/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+    def test_download_reads_the_shared_export_storage(self):
+        """The API serves files the worker wrote, not ones on its own media disk."""
+        self.create_orders(self.course, 1)
+        export = DataExport.objects.create(user=self.seller, export_type='orders')
+        data_export.run_export(export)
+
+        # A separate process: fresh storage instances and a different local MEDIA_ROOT
+        api_media_root = self.make_dir()
+        self.override_storage(self.export_root, MEDIA_ROOT=api_media_root)
+        download = self.client.get(f'/api/exports/{export.id}/download/')
+
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Order ID', b''.join(download.streaming_content))
+        self.assertEqual(os.listdir(api_media_root), [])
+        self.assertTrue(os.path.exists(os.path.join(self.export_root, DataExport.objects.get(pk=export.pk).file.name)))
+
+class TestBulkOrderUpdates(OrdersTestBase):
+    """Bulk updates run per chunk, without per-order saves or signals."""
+
+    def stats(self, link):
+        return OrderStats.objects.filter(custom_link=link).values_list(
+            'total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders'
+        ).get()
+
+    @patch('api.tasks.process_completed_orders.delay')
+    def test_completing_orders_batches_side_effects_per_chunk(self, process_completed):
+        orders = self.create_orders(self.course, 4) + self.create_orders(self.guide, 1)
+        ids = [order.id for order in orders]
+
+        with patch.object(bulk_orders, 'BULK_CHUNK_SIZE', 2), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/bulk_update_status/', {
+                'order_ids': ids, 'status': 'completed'
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated_count'], response.data['completed_count']), (5, 5))
+        self.assertEqual(Order.objects.filter(status='completed').count(), 5)
+        self.assertEqual(self.stats(self.course), (4, 0, 4, 0))
+        self.assertEqual(self.stats(self.guide), (1, 0, 1, 0))
+        # One task per chunk instead of one email task per order
+        self.assertEqual([call.args[0] for call in process_completed.call_args_list], [ids[:2], ids[2:4], ids[4:]])
+        from ..tasks import send_order_delivery_email
+        send_order_delivery_email.delay.assert_not_called()
+
+    @patch('api.tasks.process_completed_orders.delay')
+    def test_only_changed_own_orders_are_updated(self, process_completed):
+        completed = self.create_orders(self.course, 1, status='completed')
+        pending = self.create_orders(self.course, 2)
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        other_order = self.create_orders(CustomLink.objects.create(user_profile=other.profile, title='Other'), 1)[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/bulk_update_status/', {
+                'order_ids': [completed[0].id, pending[0].id, other_order.id], 'status': 'cancelled'
+            }, format='json')
+
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(self.stats(self.course), (3, 1, 0, 2))
+        other_order.refresh_from_db()
+        self.assertEqual(other_order.status, 'pending')
+        process_completed.assert_not_called()
+
+    def test_rejects_invalid_status(self):
+        response = self.client.post('/api/orders/bulk_update_status/', {
+            'order_ids': [1], 'status': 'shipped'
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_email_preference_updates_in_chunks(self):
+        orders = self.create_orders(self.guide, 3, status='completed')
+        template = FreebieFollowupEmail.objects.create(step_number=1, delay_days=1, subject='Hi', body='Hello')
+        enroll_orders(orders, FreebieFollowupEmail, ScheduledFollowupEmail)
+
+        with patch.object(bulk_orders, 'BULK_CHUNK_SIZE', 2):
+            response = self.client.post('/api/orders/bulk_update_email_preference/', {
+                'order_ids': [order.id for order in orders], 'email_automation_enabled': False
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated_count'], response.data['pending_emails']), (3, 3))
+        self.assertFalse(Order.objects.filter(email_automation_enabled=True).exists())
+        self.assertEqual(ScheduledFollowupEmail.objects.filter(email_template=template).count(), 3)
+
+        response = self.client.post('/api/orders/bulk_update_email_preference/', {
+            'order_ids': [999999], 'email_automation_enabled': True
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_enroll_orders_skips_enrolled_addresses(self):
+        FreebieFollowupEmail.objects.create(step_number=1, delay_days=1, subject='One', body='One')
+        FreebieFollowupEmail.objects.create(step_number=2, delay_days=3, subject='Two', body='Two')
+        enrolled = Order.objects.create(custom_link=self.guide, customer_email='Known@example.com')
+        enroll_orders([enrolled], FreebieFollowupEmail, ScheduledFollowupEmail)
+        repeat = Order.objects.create(custom_link=self.guide, customer_email='known@example.com')
+        first = Order.objects.create(custom_link=self.guide, customer_email='new@example.com')
+        duplicate = Order.objects.create(custom_link=self.guide, customer_email='NEW@example.com')
+
+        with self.assertNumQueries(4):
+            count = enroll_orders([repeat, first, duplicate], FreebieFollowupEmail, ScheduledFollowupEmail)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            sorted(ScheduledFollowupEmail.objects.values_list('order_id', 'customer_email')),
+            sorted([(enrolled.id, 'known@example.com')] * 2 + [(first.id, 'new@example.com')] * 2)
+        )
@@ -0,0 +1,454 @@
+"""
+Test cases for storefront checkout and Stripe Connect payments.
+"""
+import io
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+import stripe
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import (
+    ConnectWebhookEvent,
+    CustomLink,
+    Order,
+    PaymentTransaction,
+    SellerEarningsDay,
+    SellerEarningsLedger,
+    StripeConnectAccount,
+)
+from ..services import checkout_context, connect_webhook_inbox, earnings_ledger
+from ..services.stripe_backend import configure_stripe
+from ..services.stripe_connect_service import StripeConnectService
+from ..services.webhook_handlers import CONNECT_EVENT_HANDLERS, handle_account_updated
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class PaymentsTestBase(TestCase):
+    """Base test class with a seller who has a Connect account and a paid product."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='seller',
+            email='seller@example.com',
+            password='testpass123'
+        )
+        self.profile = self.seller.profile
+        self.connect_account = StripeConnectAccount.objects.create(
+            user=self.seller,
+            stripe_account_id='acct_seller',
+            charges_enabled=True,
+            payouts_enabled=True
+        )
+        self.link = CustomLink.objects.create(
+            user_profile=self.profile,
+            title='Course',
+            style='checkout',
+            type='digital_product',
+            checkout_price=Decimal('49.00'),
+            checkout_discounted_price=Decimal('29.00')
+        )
+        self.client = APIClient()
+
+
+class TestCheckoutContext(PaymentsTestBase):
+    """Checkout context is loaded in one query, cached and invalidated."""
+
+    def test_loaded_once_then_cached(self):
+        with self.assertNumQueries(1):
+            context = checkout_context.get_checkout_context(self.link.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(checkout_context.get_checkout_context(self.link.id), context)
+
+        self.assertEqual(context['effective_price'], Decimal('29.00'))
+        self.assertEqual(context['stripe_account_id'], 'acct_seller')
+        self.assertTrue(context['charges_enabled'])
+        self.assertIsNone(checkout_context.readiness_error(context))
+        self.assertEqual(checkout_context.platform_fee(context, 2900), 116)
+
+    def test_inactive_link_has_no_context(self):
+        CustomLink.objects.filter(pk=self.link.pk).update(is_active=False)
+
+        self.assertIsNone(checkout_context.get_checkout_context(self.link.id))
+
+    def test_link_save_invalidates(self):
+        checkout_context.get_checkout_context(self.link.id)
+
+        self.link.checkout_price = Decimal('99.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.link.save()
+            # Readers still get the committed context until the save commits
+            self.assertEqual(checkout_context.get_checkout_context(self.link.id)['price'], Decimal('49.00'))
+
+        self.assertEqual(checkout_context.get_checkout_context(self.link.id)['price'], Decimal('99.00'))
+
+    def test_account_delete_invalidates(self):
+        checkout_context.get_checkout_context(self.link.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.connect_account.delete()
+
+        self.assertEqual(
+            checkout_context.readiness_error(checkout_context.get_checkout_context(self.link.id)),
+            "Seller has not connected their Stripe account"
+        )
+
+    def test_account_update_webhook_invalidates(self):
+        checkout_context.get_checkout_context(self.link.id)
+        StripeConnectAccount.objects.filter(pk=self.connect_account.pk).update(charges_enabled=False)
+        event = SimpleNamespace(data=SimpleNamespace(object=SimpleNamespace(id='acct_seller')))
+
+        with patch('api.services.stripe_connect_service.stripe_connect_service.get_account_status',
+                   return_value={'charges_enabled': False, 'payouts_enabled': False}), \
+                self.captureOnCommitCallbacks(execute=True):
+            handle_account_updated(event)
+
+        context = checkout_context.get_checkout_context(self.link.id)
+        self.assertFalse(context['charges_enabled'])
+        self.assertEqual(
+            checkout_context.readiness_error(context),
+            "Seller's Stripe account is not yet ready to accept payments"
+        )
+
+    @patch('stripe.PaymentIntent.create')
+    def test_initialize_payment_uses_cached_context(self, create_intent):
+        create_intent.return_value = SimpleNamespace(id='pi_1', client_secret='secret')
+        url = f'/api/storefront/links/{self.link.id}/initialize-payment/'
+        self.client.post(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payment_intent_id'], 'pi_1')
+        kwargs = create_intent.call_args.kwargs
+        self.assertEqual(kwargs['amount'], 2900)
+        self.assertEqual(kwargs['application_fee_amount'], 116)
+        self.assertEqual(kwargs['transfer_data'], {'destination': 'acct_seller'})
+
+
+class TestPrecreatedStripePrice(PaymentsTestBase):
+    """Links can carry a pre-created Stripe Price used by checkout sessions."""
+
+    @patch('stripe.Price.create', return_value=SimpleNamespace(id='price_1'))
+    @patch('stripe.Product.create', return_value=SimpleNamespace(id='prod_1'))
+    def test_sync_creates_product_and_price_once(self, create_product, create_price):
+        service = StripeConnectService()
+
+        self.assertEqual(service.sync_product_price(self.link, self.connect_account), 'price_1')
+        self.assertEqual(service.sync_product_price(self.link, self.connect_account), 'price_1')
+
+        create_product.assert_called_once()
+        create_price.assert_called_once()
+        self.assertEqual(create_price.call_args.kwargs['unit_amount'], 4900)
+        self.link.refresh_from_db()
+        self.assertEqual((self.link.stripe_product_id, self.link.stripe_price_id), ('prod_1', 'price_1'))
+
+    def test_line_item_uses_current_price_only(self):
+        service = StripeConnectService()
+        self.link.stripe_price_id = 'price_1'
+        self.link.stripe_price_key = service.price_key(self.link, 'usd', 4900)
+
+        self.assertEqual(service._line_item(self.link, 'usd', 4900), {'price': 'price_1', 'quantity': 1})
+
+        self.link.title = 'Renamed course'
+        line_item = service._line_item(self.link, 'usd', 4900)
+        self.assertEqual(line_item['price_data']['product_data']['name'], 'Renamed course')
+        self.assertEqual(line_item['price_data']['unit_amount'], 4900)
+
+
+def connect_event_payload(event_id, event_type='payment_intent.succeeded', created=1700000000, object_id='pi_1'):
+    object_type = event_type.split('.')[0]
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'created': created,
+        'livemode': False,
+        'data': {'object': {'id': object_id, 'object': object_type, 'metadata': {}}},
+    }
+
+
+class TestConnectWebhookInbox(PaymentsTestBase):
+    """Connect webhooks are stored on receipt and handled by a worker, per object and in order."""
+
+    def deliver(self, payload):
+        event = stripe.Event.construct_from(payload, 'sk_test')
+        with patch('api.apis.stripe_connect.verify_connect_webhook_signature', return_value=event), \
+                patch('api.tasks.process_connect_webhook_events.delay') as process:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    '/api/stripe-connect/webhook/',
+                    data=json.dumps(payload),
+                    content_type='application/json',
+                    HTTP_STRIPE_SIGNATURE='t=1,v1=sig'
+                )
+        return response, process
+
+    def test_webhook_stores_event_once_without_handling_it(self):
+        payload = connect_event_payload('evt_1')
+        handler = patch.dict(CONNECT_EVENT_HANDLERS, {'payment_intent.succeeded': lambda event: self.fail('handled inline')})
+
+        with handler:
+            first, process = self.deliver(payload)
+            second, _ = self.deliver(payload)
+
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(ConnectWebhookEvent.objects.filter(stripe_event_id='evt_1').count(), 1)
+        process.assert_called_once_with('payment_intent:pi_1')
+        inbox_event = ConnectWebhookEvent.objects.get(stripe_event_id='evt_1')
+        self.assertFalse(inbox_event.processed)
+        self.assertEqual(inbox_event.payload['id'], 'evt_1')
+
+    def test_unhandled_events_are_logged_but_not_queued(self):
+        response, process = self.deliver(connect_event_payload('evt_2', event_type='customer.created', object_id='cus_1'))
+
+        self.assertEqual(response.status_code, 200)
+        process.assert_not_called()
+        self.assertEqual(
+            ConnectWebhookEvent.objects.get(stripe_event_id='evt_2').error_message,
+            'Unhandled event type: customer.created'
+        )
+        self.assertFalse(connect_webhook_inbox.pending_events().exists())
+
+    def store(self, *payloads):
+        for payload in payloads:
+            connect_webhook_inbox.store_event(stripe.Event.construct_from(payload, 'sk_test'), payload)
+
+    def test_events_for_an_object_are_handled_in_created_order(self):
+        self.store(
+            connect_event_payload('evt_late', event_type='payment_intent.payment_failed', created=200),
+            connect_event_payload('evt_early', created=100),
+        )
+        handled = []
+        handlers = {
+            'payment_intent.succeeded': lambda event: handled.append(event.id),
+            'payment_intent.payment_failed': lambda event: handled.append(event.id),
+        }
+
+        with patch.dict(CONNECT_EVENT_HANDLERS, handlers):
+            result = connect_webhook_inbox.process_object_events('payment_intent:pi_1')
+
+        self.assertEqual(result, {'processed': 2, 'failed': 0})
+        self.assertEqual(handled, ['evt_early', 'evt_late'])
+        self.assertFalse(ConnectWebhookEvent.objects.filter(processed=False).exists())
+
+    def test_failure_holds_back_later_events_until_retried(self):
+        self.store(
+            connect_event_payload('evt_a', created=100),
+            connect_event_payload('evt_b', event_type='payment_intent.payment_failed', created=200),
+        )
+
+        def fail(event):
+            raise RuntimeError('database unavailable')
+
+        with patch.dict(CONNECT_EVENT_HANDLERS, {'payment_intent.succeeded': fail}):
+            result = connect_webhook_inbox.process_object_events('payment_intent:pi_1')
+
+        self.assertEqual(result, {'processed': 0, 'failed': 1})
+        failed = ConnectWebhookEvent.objects.get(stripe_event_id='evt_a')
+        self.assertEqual((failed.attempts, failed.error_message), (1, 'database unavailable'))
+        self.assertFalse(ConnectWebhookEvent.objects.get(stripe_event_id='evt_b').processed)
+        self.assertEqual(connect_webhook_inbox.pending_object_keys(), ['payment_intent:pi_1'])
+
+        handlers = {'payment_intent.succeeded': lambda event: None, 'payment_intent.payment_failed': lambda event: None}
+        with patch.dict(CONNECT_EVENT_HANDLERS, handlers):
+            result = connect_webhook_inbox.process_object_events('payment_intent:pi_1')
+        self.assertEqual(result, {'processed': 2, 'failed': 0})
+
+    def test_exhausted_event_keeps_blocking_its_object(self):
+        self.store(
+            connect_event_payload('evt_a', created=100),
+            connect_event_payload('evt_b', event_type='payment_intent.payment_failed', created=200),
+            connect_event_payload('evt_other', object_id='pi_2'),
+        )
+        ConnectWebhookEvent.objects.filter(stripe_event_id='evt_a').update(attempts=connect_webhook_inbox.MAX_ATTEMPTS - 1)
+
+        def fail(event):
+            raise RuntimeError('database unavailable')
+
+        with patch.dict(CONNECT_EVENT_HANDLERS, {'payment_intent.succeeded': fail}), \
+                self.assertLogs('api.services.connect_webhook_inbox', level='CRITICAL'):
+            connect_webhook_inbox.process_object_events('payment_intent:pi_1')
+
+        self.assertEqual(connect_webhook_inbox.pending_object_keys(), ['payment_intent:pi_2'])
+        handlers = {'payment_intent.succeeded': lambda event: None, 'payment_intent.payment_failed': lambda event: None}
+        with patch.dict(CONNECT_EVENT_HANDLERS, handlers):
+            result = connect_webhook_inbox.process_object_events('payment_intent:pi_1')
+        self.assertEqual(result, {'processed': 0, 'failed': 0})
+        self.assertFalse(ConnectWebhookEvent.objects.get(stripe_event_id='evt_b').processed)
+
+    def test_related_objects_share_a_queue(self):
+        charge = {'id': 'ch_1', 'object': 'charge', 'payment_intent': 'pi_1'}
+        account = {'id': 'acct_seller', 'object': 'account'}
+
+        self.assertEqual(connect_webhook_inbox.object_key(charge), 'payment_intent:pi_1')
+        self.assertEqual(connect_webhook_inbox.object_key(account), 'account:acct_seller')
+
+
+class TestSellerEarningsLedger(PaymentsTestBase):
+    """Seller earnings are materialized as transactions change."""
+
+    def create_transaction(self, total_amount=2900, status='pending'):
+        order = Order.objects.create(custom_link=self.link, customer_email='buyer@example.com')
+        return PaymentTransaction.objects.create(
+            order=order,
+            seller_account=self.connect_account,
+            payment_intent_id=f'pi_{order.id}',
+            total_amount=total_amount,
+            platform_fee=total_amount // 25,
+            seller_amount=total_amount - total_amount // 25,
+            status=status
+        )
+
+    def ledger(self):
+        return SellerEarningsLedger.objects.get(connect_account=self.connect_account)
+
+    def test_ledger_follows_transaction_lifecycle(self):
+        payment = self.create_transaction()
+        self.assertEqual((self.ledger().transaction_count, self.ledger().gross_amount), (1, 2900))
+        self.assertEqual(self.ledger().succeeded_count, 0)
+
+        payment.status = 'succeeded'
+        payment.paid_at = timezone.now()
+        payment.save()
+        ledger = self.ledger()
+        self.assertEqual((ledger.transaction_count, ledger.succeeded_count), (1, 1))
+        self.assertEqual((ledger.succeeded_amount, ledger.pending_payout_amount), (2900, 2784))
+        day = SellerEarningsDay.objects.get(connect_account=self.connect_account)
+        self.assertEqual((day.date, day.sales_count, day.seller_amount), (timezone.localdate(), 1, 2784))
+
+        payment.transfer_id = 'tr_1'
+        payment.save()
+        self.assertEqual(self.ledger().pending_payout_amount, 0)
+
+        payment.status = 'refunded'
+        payment.refunded_amount = 2900
+        payment.save()
+        ledger = self.ledger()
+        self.assertEqual((ledger.succeeded_count, ledger.refunded_count, ledger.refunded_amount), (0, 1, 2900))
+        self.assertEqual(SellerEarningsDay.objects.get(connect_account=self.connect_account).refunded_amount, 2900)
+
+    def test_stale_instance_is_not_counted_twice(self):
+        payment = self.create_transaction()
+        stale = PaymentTransaction.objects.get(pk=payment.pk)
+
+        for instance in (payment, stale):
+            instance.status = 'succeeded'
+            instance.save()
+
+        self.assertEqual(self.ledger().succeeded_count, 1)
+        self.assertEqual(self.ledger().seller_earned_amount, 2784)
+
+    def test_delete_removes_transaction(self):
+        payment = self.create_transaction(status='failed')
+        self.assertEqual(self.ledger().failed_count, 1)
+
+        payment.order.delete()
+
+        self.assertEqual((self.ledger().transaction_count, self.ledger().failed_count), (0, 0))
+
+    def test_matches_rebuild(self):
+        self.create_transaction(status='failed')
+        paid = self.create_transaction(total_amount=4900)
+        paid.status = 'succeeded'
+        paid.save()
+        incremental = SellerEarningsLedger.objects.filter(pk=self.ledger().pk).values().get()
+        days = list(SellerEarningsDay.objects.values('date', 'sales_count', 'sales_amount', 'seller_amount'))
+
+        earnings_ledger.rebuild_ledger(self.connect_account)
+
+        rebuilt = SellerEarningsLedger.objects.filter(pk=self.ledger().pk).values().get()
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(list(SellerEarningsDay.objects.values('date', 'sales_count', 'sales_amount', 'seller_amount')), days)
+
+    def test_earnings_view_reads_the_ledger(self):
+        paid = self.create_transaction()
+        paid.status = 'succeeded'
+        paid.save()
+        self.create_transaction(status='failed')
+        self.client.force_authenticate(self.seller)
+
+        # The ledger row and the daily rows, whatever the number of transactions
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stripe-connect/earnings/', {'days': 7})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_sales'], '58.00')
+        self.assertEqual(response.data['pending_payouts'], '27.84')
+        self.assertEqual(
+            (response.data['transaction_count'], response.data['successful_transactions'], response.data['failed_transactions']),
+            (2, 1, 1)
+        )
+        self.assertEqual(len(response.data['daily']), 1)
+        self.assertEqual(response.data['daily'][0]['sales'], '29.00')
+
+
+class TestLocalStripeBackend(PaymentsTestBase):
+    """The local Stripe stand-in serves the checkout flow and the load test."""
+
+    def setUp(self):
+        super().setUp()
+        # Back to the live backend once the override is gone
+        self.addCleanup(configure_stripe)
+        settings_override = override_settings(STRIPE_BACKEND='local')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_payment_element_checkout_round_trips(self):
+        base = f'/api/storefront/links/{self.link.id}'
+
+        payment_intent_id = self.client.post(f'{base}/initialize-payment/').data['payment_intent_id']
+        response = self.client.post(f'{base}/finalize-order/', {
+            'payment_intent_id': payment_intent_id,
+            'customer_name': 'Cas Customer',
+            'customer_email': 'cas@example.com',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        transaction = PaymentTransaction.objects.get(payment_intent_id=payment_intent_id)
+        self.assertEqual(
+            (transaction.total_amount, transaction.platform_fee, transaction.seller_amount),
+            (2900, 116, 2784)
+        )
+        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        self.assertEqual(payment_intent.metadata.order_id, response.data['order']['order_id'])
+        self.assertEqual(payment_intent.metadata.custom_link_id, str(self.link.id))
+
+    def test_missing_objects_raise_like_stripe(self):
+        configure_stripe()
+
+        with self.assertRaises(stripe.error.InvalidRequestError) as raised:
+            stripe.PaymentIntent.retrieve('pi_missing')
+
+        self.assertEqual(raised.exception.code, 'resource_missing')
+
+    def test_load_test_reports_each_endpoint(self):
+        out = io.StringIO()
+
+        call_command('load_test_checkout', checkouts=3, rps=1000, concurrency=1, stdout=out)
+
+        output = out.getvalue()
+        for endpoint in ('create-order', 'create-payment-intent', 'initialize-payment', 'finalize-order'):
+            self.assertIn(endpoint, output)
+        self.assertIn('3 checkouts', output)
+        self.assertNotIn('failed requests', output)
+        self.assertEqual(PaymentTransaction.objects.filter(order__custom_link__title='Load Test Course').count(), 3)
+
+    def test_load_test_refuses_live_stripe(self):
+        with self.settings(STRIPE_BACKEND='live'):
+            with self.assertRaises(CommandError):
+                call_command('load_test_checkout', checkouts=1, stdout=io.StringIO())
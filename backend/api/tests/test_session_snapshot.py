@@ -0,0 +1,121 @@
+"""
+Test cases for the cached dashboard session snapshot.
+"""
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ..models import IframeMenuItem, Plan, PlanFeature, UserPermissions
+
+User = get_user_model()
+
+URL = '/api/users/session/'
+
+
+@pytest.mark.django_db
+class TestSessionSnapshot(TestCase):
+    """One request returns the dashboard shell's data, from cache when warm."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='dana',
+            email='dana@example.com',
+            password='testpass123',
+            first_name='Dana'
+        )
+        self.menu_item = IframeMenuItem.objects.create(title='Academy', link='https://example.com/academy', order=1)
+        self.hidden_item = IframeMenuItem.objects.create(title='Hidden', link='https://example.com/hidden', order=2)
+        self.inactive_item = IframeMenuItem.objects.create(
+            title='Retired', link='https://example.com/retired', order=3, is_active=False
+        )
+        self.user.permissions.accessible_iframe_menu_items.add(self.menu_item, self.inactive_item)
+        self.plan = Plan.objects.create(name='Pro', price=Decimal('29.00'))
+        self.feature = PlanFeature.objects.create(
+            plan=self.plan, feature_key='max_links', feature_name='Links', feature_value='10'
+        )
+        Plan.objects.create(name='Legacy', price=Decimal('9.00'), is_active=False)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def get(self, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(URL, **headers)
+
+    def test_warm_snapshot_runs_no_queries(self):
+        self.get()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['me'], {'username': 'dana', 'first_name': 'Dana', 'last_name': ''})
+        self.assertEqual(response.data['permissions']['accessible_sections'], ['overview', 'linkinbio'])
+        self.assertEqual([item['title'] for item in response.data['iframe_menu_items']], ['Academy'])
+        self.assertEqual([plan['name'] for plan in response.data['plans']], ['Pro'])
+        self.assertEqual(response.data['plans'][0]['features'][0]['feature_value'], '10')
+
+    def test_unchanged_snapshot_is_not_modified(self):
+        etag = self.get()['ETag']
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_permission_changes_invalidate_the_user_snapshot(self):
+        version = self.get().data['version']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            permissions = self.user.permissions
+            permissions.can_access_content = True
+            permissions.save()
+        response = self.get()
+        self.assertNotEqual(response.data['version'], version)
+        self.assertIn('content', response.data['permissions']['accessible_sections'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hidden_item.users_with_access.add(permissions)
+        self.assertEqual([item['title'] for item in self.get().data['iframe_menu_items']], ['Academy', 'Hidden'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu_item.users_with_access.clear()
+        self.assertEqual([item['title'] for item in self.get().data['iframe_menu_items']], ['Hidden'])
+
+    def test_menu_and_plan_changes_invalidate_every_snapshot(self):
+        self.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu_item.title = 'Academy 2'
+            self.menu_item.save()
+            self.feature.feature_value = 'unlimited'
+            self.feature.save()
+
+        response = self.get()
+        self.assertEqual(response.data['iframe_menu_items'][0]['title'], 'Academy 2')
+        self.assertEqual(response.data['plans'][0]['features'][0]['feature_value'], 'unlimited')
+
+    def test_reading_never_creates_permissions(self):
+        UserPermissions.objects.filter(user=self.user).delete()
+
+        response = self.get()
+
+        self.assertIsNone(response.data['permissions'])
+        self.assertEqual(response.data['iframe_menu_items'], [])
+        self.assertFalse(UserPermissions.objects.filter(user=self.user).exists())
+
+    def test_deactivated_user_is_rejected(self):
+        self.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
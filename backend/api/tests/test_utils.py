@@ -9,7 +9,8 @@ from django.http import HttpRequest
 
 from ..utils import (
     get_client_ip, anonymize_ip, is_rate_limited,
-    should_track_analytics, sanitize_referrer
+    should_track_analytics, sanitize_referrer,
+    generate_ulid, generate_order_id
 )
 
 
@@ -287,6 +288,42 @@ class TestSanitizeReferrer(TestCase):
         self.assertTrue(invalid_url in result)
 
 
+class TestGenerateUlid(TestCase):
+    """Test time-ordered identifier generation."""
+
+    def test_ulid_format(self):
+        """ULIDs are 26 Crockford base32 characters."""
+        ulid = generate_ulid()
+
+        self.assertEqual(len(ulid), 26)
+        self.assertTrue(set(ulid) <= set('0123456789ABCDEFGHJKMNPQRSTVWXYZ'))
+
+    def test_ulids_increase_within_a_millisecond(self):
+        """ULIDs generated in the same millisecond still sort in creation order."""
+        with patch('api.utils.time.time', return_value=1700000000.0):
+            ulids = [generate_ulid() for _ in range(100)]
+
+        self.assertEqual(ulids, sorted(ulids))
+        self.assertEqual(len(set(ulids)), 100)
+        self.assertEqual(len({ulid[:10] for ulid in ulids}), 1)
+
+    def test_ulids_sort_by_time(self):
+        """A later timestamp always sorts after an earlier one."""
+        with patch('api.utils.time.time', return_value=1800000000.0):
+            earlier = generate_ulid()
+        with patch('api.utils.time.time', return_value=1800000000.001):
+            later = generate_ulid()
+
+        self.assertLess(earlier, later)
+
+    def test_order_id(self):
+        """Order ids keep the ORD- prefix."""
+        order_id = generate_order_id()
+
+        self.assertTrue(order_id.startswith('ORD-'))
+        self.assertEqual(len(order_id), 30)
+
+
 @pytest.mark.django_db
 class TestUtilsIntegration(TestCase):
     """Integration tests for utility functions."""
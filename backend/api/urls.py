@@ -126,6 +126,7 @@ from .apis.upload import (
     delete_from_cloudinary,
 )
 from .apis.orders import OrderViewSet
+from .apis.exports import DataExportViewSet
 from .apis.milo import MiloPromptViewSet
 from .apis.email import (
     GmailAuthUrlView,
@@ -140,6 +141,8 @@ from .apis.email import (
     EmailDeleteView,
     EmailDraftListView,
     EmailDraftDetailView,
+    GmailPushView,
+    EmailSearchView,
 )
 from .apis.iframe_menu import IframeMenuItemViewSet
 from .apis.system_config import SystemConfigViewSet
@@ -150,6 +153,7 @@ router.register("profiles", UserProfileViewSet, basename="api-profiles")
 router.register("plans", PlanViewSet, basename="api-plans")
 router.register("ai", OpenAIViewSet, basename="api-ai")
 router.register("orders", OrderViewSet, basename="api-orders")
+router.register("exports", DataExportViewSet, basename="api-exports")
 router.register("milo-prompts", MiloPromptViewSet, basename="api-milo-prompts")
 router.register("iframe-menu-items", IframeMenuItemViewSet, basename="api-iframe-menu-items")
 router.register("system-config", SystemConfigViewSet, basename="api-system-config")
@@ -176,6 +180,7 @@ urlpatterns = [
     path("api/auth/login/", CustomTokenObtainPairView.as_view(), name="auth_login"),
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/auth/me/", UserViewSet.as_view({'get': 'me', 'put': 'me', 'patch': 'me'}), name="auth_me"),
+    path("api/auth/session/", UserViewSet.as_view({'get': 'session'}), name="auth_session"),
     path("api/auth/change-password/", UserViewSet.as_view({'post': 'change_password'}), name="auth_change_password"),
     path("api/auth/check-username/", UserViewSet.as_view({'post': 'check_username'}), name="auth_check_username"),
     path("api/auth/verify-user/", UserViewSet.as_view({'get': 'verify_user'}), name="auth_verify_user"),
@@ -322,11 +327,13 @@ urlpatterns = [
     path("api/email/accounts/", EmailAccountListView.as_view(), name="email_accounts_list"),
     path("api/email/accounts/<int:account_id>/disconnect/", EmailAccountDisconnectView.as_view(), name="email_account_disconnect"),
     path("api/email/messages/", EmailMessageListView.as_view(), name="email_messages_list"),
+    path("api/email/messages/search/", EmailSearchView.as_view(), name="email_messages_search"),
     path("api/email/messages/<int:message_id>/", EmailMessageDetailView.as_view(), name="email_message_detail"),
     path("api/email/messages/<int:message_id>/read/", EmailMarkReadView.as_view(), name="email_mark_read"),
     path("api/email/messages/<int:message_id>/delete/", EmailDeleteView.as_view(), name="email_delete"),
     path("api/email/send/", EmailSendView.as_view(), name="email_send"),
     path("api/email/sync/", EmailSyncView.as_view(), name="email_sync"),
+    path("api/email/push/", GmailPushView.as_view(), name="gmail_push"),
     path("api/email/drafts/", EmailDraftListView.as_view(), name="email_drafts_list"),
     path("api/email/drafts/<int:draft_id>/", EmailDraftDetailView.as_view(), name="email_draft_detail"),
 
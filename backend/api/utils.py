@@ -1,5 +1,7 @@
 import base64
 import os
+import threading
+import time
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
@@ -196,3 +198,45 @@ def sanitize_referrer(referrer: str) -> str:
         return referrer[:500]
 
 
+# Time-ordered identifiers (ULID)
+_CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ulid_lock = threading.Lock()
+_ulid_last = (0, 0)  # (millisecond timestamp, 80 random bits) of the last ULID
+
+
+def _encode_base32(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_CROCKFORD_BASE32[index])
+    return ''.join(reversed(chars))
+
+
+def generate_ulid() -> str:
+    """
+    Generate a ULID: 48 bits of millisecond timestamp followed by 80 random
+    bits, as 26 Crockford base32 characters. ULIDs sort by creation time, so
+    new rows land at the right-hand edge of an index instead of on random
+    pages. Within one millisecond the random part is incremented, so ULIDs
+    from this process are strictly increasing.
+    """
+    global _ulid_last
+    with _ulid_lock:
+        timestamp = int(time.time() * 1000)
+        last_timestamp, last_random = _ulid_last
+        if timestamp <= last_timestamp:
+            timestamp = last_timestamp
+            randomness = last_random + 1
+            if randomness >> 80:
+                # Random part exhausted in this millisecond: move to the next one
+                timestamp += 1
+                randomness = int.from_bytes(os.urandom(10), 'big')
+        else:
+            randomness = int.from_bytes(os.urandom(10), 'big')
+        _ulid_last = (timestamp, randomness)
+    return _encode_base32((timestamp << 80) | randomness, 26)
+
+
+def generate_order_id() -> str:
+    """Public order number: 'ORD-' and a ULID."""
+    return f"ORD-{generate_ulid()}"